@@ -1,4 +1,31 @@
+import os
+import re
+import bisect
+import io
+import csv
+import json
+import zlib
+import gzip
+import mimetypes
+import base64
 import sqlite3
+import threading
+import time
+import queue
+import importlib.util
+import logging
+import multiprocessing
+import signal
+import socket
+from logging.handlers import RotatingFileHandler
+import secrets
+import hashlib
+import itertools
+import unicodedata
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import click
 from flask import (
     Flask,
     render_template,
@@ -7,10 +34,33 @@ from flask import (
     url_for,
     session,
     abort,
+    g,
+    Response,
+    stream_with_context,
+    stream_template,
+    jsonify,
+    send_from_directory,
+    before_render_template,
+    template_rendered,
 )
+from flask.cli import AppGroup
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
+from werkzeug.datastructures import CallbackDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import is_resource_modified
+from markupsafe import Markup
 from werkzeug.security import generate_password_hash, check_password_hash
 import datetime as dt
 
+try:
+    import brotli  # optionnel : variantes .br des fichiers statiques
+except ImportError:
+    brotli = None
+try:
+    from PIL import Image  # optionnel : images redimensionnées par `flask assets build`
+except ImportError:
+    Image = None
+
 app = Flask(__name__)
 
 # Configuration
@@ -18,153 +68,2572 @@ app.config["SECRET_KEY"] = "change-this-secret-key"
 
 DB_NAME = "pet_clinic.db"
 
+app.config["DATABASE"] = os.environ.get("PET_CLINIC_DB", DB_NAME)
+app.config["DB_POOL_SIZE"] = 8          # connexions SQLite maximum
+app.config["DB_POOL_TIMEOUT"] = 5.0     # secondes d'attente avant erreur
+app.config["DB_JOURNAL_MODE"] = "WAL"
+app.config["DB_SYNCHRONOUS"] = "NORMAL"
+app.config["DB_MMAP_SIZE"] = 64 * 1024 * 1024   # octets, 0 pour désactiver
+app.config["DB_CACHE_SIZE"] = -16000            # négatif = Kio (ici ~16 Mo)
+app.config["DB_BUSY_TIMEOUT_MS"] = 5000
+app.config["DB_WRITER_QUEUE"] = True    # toutes les écritures passent par un seul thread
+
 
 # ---------- DB UTILS ----------
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+def apply_pragmas(conn):
+    """Per-connection tuning, journal_mode included (a no-op once the file is in WAL)."""
+    conn.execute("PRAGMA busy_timeout = %d" % int(app.config["DB_BUSY_TIMEOUT_MS"]))
+    conn.execute("PRAGMA journal_mode = %s" % app.config["DB_JOURNAL_MODE"])
+    conn.execute("PRAGMA synchronous = %s" % app.config["DB_SYNCHRONOUS"])
+    conn.execute("PRAGMA cache_size = %d" % int(app.config["DB_CACHE_SIZE"]))
+    conn.execute("PRAGMA mmap_size = %d" % int(app.config["DB_MMAP_SIZE"]))
+
+
+def _connect(database=None):
+    """Open a raw SQLite connection (no pool)."""
+    conn = sqlite3.connect(
+        database or app.config["DATABASE"],
+        timeout=app.config["DB_BUSY_TIMEOUT_MS"] / 1000.0,
+        check_same_thread=False,
+        factory=(
+            InstrumentedConnection
+            if app.config["METRICS_ENABLED"] or app.config["SLOW_QUERY_MS"] is not None
+            else sqlite3.Connection
+        ),
+    )
     conn.row_factory = sqlite3.Row
+    apply_pragmas(conn)
     return conn
 
 
-def init_db():
-    conn = get_db_connection()
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by every request thread.
+
+    A connection is checked out once per request (see get_db()) and handed
+    back by the teardown_appcontext hook, so the connect/close cycle and the
+    schema parsing happen only when the pool grows.
+    """
+
+    def __init__(self, database, size=8, timeout=5.0):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.stats = {"hits": 0, "waits": 0, "opened": 0, "discarded": 0}
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._open -= 1
+            self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+
+            if conn is None:
+                with self._lock:
+                    can_open = self._open < self.size
+                    if can_open:
+                        self._open += 1
+                        self.stats["opened"] += 1
+                if can_open:
+                    try:
+                        return _connect(self.database)
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._open -= 1
+                        raise
+                # Pool plein : on attend qu'une connexion soit rendue
+                with self._lock:
+                    self.stats["waits"] += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeout(
+                        "No SQLite connection available after %.1fs" % self.timeout
+                    )
+            else:
+                with self._lock:
+                    self.stats["hits"] += 1
+
+            if self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data["open"] = self._open
+        data["idle"] = self._idle.qsize()
+        data["size"] = self.size
+        return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None or _pool.database != app.config["DATABASE"]:
+        ensure_schema()
+        with _pool_lock:
+            if _pool is None or _pool.database != app.config["DATABASE"]:
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(
+                    app.config["DATABASE"],
+                    size=app.config["DB_POOL_SIZE"],
+                    timeout=app.config["DB_POOL_TIMEOUT"],
+                )
+    return _pool
+
+
+def get_db():
+    """Connection bound to the current app context (one per request)."""
+    if "db" not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def pooled(fn):
+    """fn(conn) on a connection borrowed from the pool, outside any request."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        return fn(conn)
+    finally:
+        pool.release(conn)
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop("db", None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+class DbWriter:
+    """Single thread owning the only write connection.
+
+    Routes hand it a callable (see db_write()); jobs run one after the other
+    inside BEGIN IMMEDIATE ... COMMIT, so writers never contend for the lock
+    and, with WAL, readers on pooled connections never wait for them.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "errors": 0, "max_queue": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="sqlite-writer", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        conn = _connect(self.database)
+        conn.isolation_level = None  # on gère BEGIN/COMMIT nous-mêmes
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                work, done, stats = job
+                _request_metrics.stats = stats  # requêtes SQL comptées pour la route appelante
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    result = work(conn)
+                    conn.execute("COMMIT")
+                    done["result"] = result
+                except BaseException as exc:  # renvoyé au thread appelant
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    self.stats["errors"] += 1
+                    done["error"] = exc
+                _request_metrics.stats = None
+                self.stats["jobs"] += 1
+                done["event"].set()
+        finally:
+            conn.close()
+
+    def submit(self, work):
+        self.start()
+        done = {"event": threading.Event()}
+        self._jobs.put((work, done, getattr(_request_metrics, "stats", None)))
+        depth = self._jobs.qsize()
+        if depth > self.stats["max_queue"]:
+            self.stats["max_queue"] = depth
+        done["event"].wait()
+        if "error" in done:
+            raise done["error"]
+        return done.get("result")
+
+
+_writer = None
+
+
+def get_writer():
+    global _writer
+    if _writer is None or _writer.database != app.config["DATABASE"]:
+        ensure_schema()
+        with _pool_lock:
+            if _writer is None or _writer.database != app.config["DATABASE"]:
+                if _writer is not None:
+                    _writer.stop()
+                _writer = DbWriter(app.config["DATABASE"])
+    return _writer
 
-    # Table users
+
+def db_write(work):
+    """Run work(conn) in one write transaction and return its result.
+
+    With DB_WRITER_QUEUE the job is serialized through the writer thread;
+    otherwise it runs on the request connection and is committed here.
+    """
+    if app.config["DB_WRITER_QUEUE"]:
+        return get_writer().submit(work)
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        result = work(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def db_execute(sql, params=()):
+    """Single write statement through db_write(); returns (lastrowid, rowcount)."""
+    def work(conn):
+        cur = conn.execute(sql, params)
+        return cur.lastrowid, cur.rowcount
+    return db_write(work)
+
+
+# ---------- METRICS ----------
+# Latence par route, nombre et durée des requêtes SQL, lignes lues et temps
+# de rendu des templates ; exposés au format Prometheus sur /metrics.
+
+app.config["METRICS_ENABLED"] = True    # lu à l'ouverture des connexions et à chaque requête
+app.config["METRICS_TOKEN"] = os.environ.get("PET_CLINIC_METRICS_TOKEN")  # "Bearer <token>" pour un scraper
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# [requêtes SQL, secondes SQL, lignes lues, secondes de rendu, endpoint] de la requête HTTP en cours
+_request_metrics = threading.local()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that charges statement time and fetched rows to the current request.
+
+    With SLOW_QUERY_MS set, execute + fetch time is also summed per statement
+    and the statement is handed to the slow-query log once it crosses the
+    threshold.
+    """
+
+    _statement = None
+    _elapsed = 0.0
+
+    def _track(self, seconds, rows, queries):
+        stats = getattr(_request_metrics, "stats", None)
+        if stats is not None:
+            stats[0] += queries
+            stats[1] += seconds
+            stats[2] += rows
+        if self._statement is not None:
+            self._elapsed += seconds
+            threshold = app.config["SLOW_QUERY_MS"]
+            if threshold is not None and self._elapsed * 1000 >= threshold:
+                sql, parameters = self._statement
+                self._statement = None  # une seule entrée par exécution
+                get_slow_query_log().record(self.connection, sql, parameters, self._elapsed)
+
+    def _begin(self, sql, parameters):
+        if app.config["SLOW_QUERY_MS"] is None:
+            self._statement = None
+        else:
+            self._statement = (sql, parameters)
+            self._elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._track(time.perf_counter() - t0, 0, 1)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._track(time.perf_counter() - t0, 0, 1)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._track(time.perf_counter() - t0, row is not None, 0)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._track(time.perf_counter() - t0, len(rows), 0)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._track(time.perf_counter() - t0, len(rows), 0)
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose execute() shortcuts go through InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class RouteMetrics:
+    """Per-endpoint latency histogram and SQL/template totals."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, endpoint, status, seconds, stats):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = {
+                    "buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "statuses": {},
+                    "sql_queries": 0, "sql_seconds": 0.0, "sql_rows": 0, "template_seconds": 0.0,
+                }
+            route["buckets"][index] += 1
+            route["sum"] += seconds
+            route["statuses"][status] = route["statuses"].get(status, 0) + 1
+            route["sql_queries"] += stats[0]
+            route["sql_seconds"] += stats[1]
+            route["sql_rows"] += stats[2]
+            route["template_seconds"] += stats[3]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: dict(route, buckets=list(route["buckets"]), statuses=dict(route["statuses"]))
+                for endpoint, route in self._routes.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_metrics = RouteMetrics()
+
+
+def _observe_body(body, environ, status, started, stats):
+    try:
+        yield from body
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+        if getattr(_request_metrics, "stats", None) is stats:
+            _request_metrics.stats = None
+        if app.config["METRICS_ENABLED"]:
+            route_metrics.observe(
+                environ.get("clinic.endpoint") or "unmatched",
+                status[0] if status else "500",
+                time.perf_counter() - started,
+                stats,
+            )
+
+
+class MetricsMiddleware:
+    """WSGI wrapper timing each request, streamed body included."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if not app.config["METRICS_ENABLED"] and app.config["SLOW_QUERY_MS"] is None:
+            return self.wsgi_app(environ, start_response)
+        stats = [0, 0.0, 0, 0.0, None]
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(" ", 1)[0]]
+            return start_response(status_line, headers, exc_info)
+
+        _request_metrics.stats = stats
+        started = time.perf_counter()
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            _request_metrics.stats = None
+            if app.config["METRICS_ENABLED"]:
+                route_metrics.observe(environ.get("clinic.endpoint") or "unmatched", "500",
+                                      time.perf_counter() - started, stats)
+            raise
+        return _observe_body(body, environ, status, started, stats)
+
+
+app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+
+
+@app.before_request
+def tag_request_endpoint():
+    request.environ["clinic.endpoint"] = request.endpoint
+    stats = getattr(_request_metrics, "stats", None)
+    if stats is not None:
+        stats[4] = request.endpoint
+
+
+@before_render_template.connect_via(app)
+def _template_started(sender, template, context, **extra):
+    _request_metrics.template_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def _template_finished(sender, template, context, **extra):
+    stats = getattr(_request_metrics, "stats", None)
+    if stats is not None:
+        stats[3] += time.perf_counter() - _request_metrics.template_started
+
+
+def render_metrics():
+    """Prometheus text exposition of route_metrics and the component stats."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s %s" % (name, kind))
+
+    routes = sorted(route_metrics.snapshot().items())
+
+    family("clinic_request_duration_seconds", "histogram", "Request latency by endpoint.")
+    for endpoint, route in routes:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), route["buckets"]):
+            cumulative += count
+            lines.append('clinic_request_duration_seconds_bucket{endpoint="%s",le="%s"} %d'
+                         % (endpoint, bound, cumulative))
+        lines.append('clinic_request_duration_seconds_sum{endpoint="%s"} %.6f' % (endpoint, route["sum"]))
+        lines.append('clinic_request_duration_seconds_count{endpoint="%s"} %d' % (endpoint, cumulative))
+
+    family("clinic_requests_total", "counter", "Requests by endpoint and HTTP status.")
+    for endpoint, route in routes:
+        for status, count in sorted(route["statuses"].items()):
+            lines.append('clinic_requests_total{endpoint="%s",status="%s"} %d' % (endpoint, status, count))
+
+    for name, key, fmt, help_text in (
+        ("clinic_sql_queries_total", "sql_queries", "%d", "SQL statements executed."),
+        ("clinic_sql_seconds_total", "sql_seconds", "%.6f", "Time spent executing and fetching SQL."),
+        ("clinic_sql_rows_total", "sql_rows", "%d", "Rows fetched from SQLite."),
+        ("clinic_template_seconds_total", "template_seconds", "%.6f", "Time spent rendering templates."),
+    ):
+        family(name, "counter", help_text)
+        for endpoint, route in routes:
+            lines.append(('%s{endpoint="%s"} ' + fmt) % (name, endpoint, route[key]))
+
+    components = (
+        ("db_pool", get_pool().snapshot()),
+        ("db_writer", get_writer().stats),
+        ("dashboard_cache", dashboard_cache.stats),
+        ("schedule_cache", schedule_cache.stats),
+        ("schedule_index", schedule_index.stats),
+        ("auth_cache", user_cache.stats),
+        ("fragment_cache", fragment_cache.stats),
+        ("pet_cache", pet_cache.stats),
+        ("jobs", pooled(job_stats)),
+        ("password_hasher", get_hasher().snapshot()),
+    )
+    for component, values in components:
+        for key, value in sorted(values.items()):
+            name = "clinic_%s_%s" % (component, key)
+            family(name, "gauge", "%s %s." % (component, key))
+            lines.append("%s %s" % (name, value))
+
+    return "\n".join(lines) + "\n"
+
+
+# ---------- SLOW QUERY LOG ----------
+# Journal opt-in des requêtes lentes : SQL normalisé, forme des paramètres
+# (jamais leurs valeurs), durée, route appelante et EXPLAIN QUERY PLAN.
+# Voir /admin/slow-queries pour le classement par SQL normalisé.
+
+_slow_ms = os.environ.get("PET_CLINIC_SLOW_QUERY_MS")
+app.config["SLOW_QUERY_MS"] = float(_slow_ms) if _slow_ms else None  # seuil en ms, None = désactivé
+app.config["SLOW_QUERY_LOG"] = "table"          # "table" (slow_queries) ou chemin d'un fichier JSON lines
+app.config["SLOW_QUERY_TABLE_MAX"] = 10000      # lignes gardées dans slow_queries
+app.config["SLOW_QUERY_FILE_MAX_BYTES"] = 5 * 1024 * 1024
+app.config["SLOW_QUERY_FILE_BACKUPS"] = 3
+
+_SLOW_LOG_ENDPOINT = "_slow_query_log"  # les écritures du journal ne sont pas journalisées
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def normalize_sql(sql):
+    """Collapse literals, IN lists and whitespace so similar statements group together."""
+    sql = " ".join(_SQL_LITERAL.sub("?", sql).split())
+    return _SQL_IN_LIST.sub("(?, ...)", sql)
+
+
+def params_shape(parameters):
+    if parameters is None:
+        return "executemany"
+    if isinstance(parameters, dict):
+        return "{%s}" % ", ".join("%s: %s" % (k, type(v).__name__) for k, v in parameters.items())
+    return "(%s)" % ", ".join(type(v).__name__ for v in parameters)
+
+
+def explain_query_plan(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN as an indented tree, or None when it cannot be explained."""
+    if parameters is None or not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        rows = conn.cursor(sqlite3.Cursor).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return "\n".join(lines)
+
+
+class SlowQueryLog:
+    """Queue of slow statements written by a background thread.
+
+    The caller only runs EXPLAIN QUERY PLAN on its own connection and
+    enqueues the record; rows go to the slow_queries table through
+    db_write(), or to a rotating JSON-lines file.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._records = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"logged": 0, "dropped": 0}
+
+    def record(self, conn, sql, parameters, seconds):
+        stats = getattr(_request_metrics, "stats", None)
+        endpoint = stats[4] if stats is not None else None
+        if endpoint == _SLOW_LOG_ENDPOINT:
+            return
+        entry = {
+            "logged_at": dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "endpoint": endpoint,
+            "duration_ms": round(seconds * 1000, 3),
+            "normalized_sql": normalize_sql(sql),
+            "sql_text": sql.strip(),
+            "params_shape": params_shape(parameters),
+            "query_plan": explain_query_plan(conn, sql, parameters),
+        }
+        try:
+            self._records.put_nowait(entry)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return
+        self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        _request_metrics.stats = [0, 0.0, 0, 0.0, _SLOW_LOG_ENDPOINT]
+        if self.target == "table":
+            write = self._write_table
+        else:
+            handler = RotatingFileHandler(
+                self.target,
+                maxBytes=app.config["SLOW_QUERY_FILE_MAX_BYTES"],
+                backupCount=app.config["SLOW_QUERY_FILE_BACKUPS"],
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            write = lambda entry: handler.emit(  # noqa: E731
+                logging.makeLogRecord({"msg": json.dumps(entry), "levelno": logging.WARNING})
+            )
+        while True:
+            entry = self._records.get()
+            try:
+                write(entry)
+                self.stats["logged"] += 1
+            except Exception:
+                app.logger.exception("Could not write slow query record")
+            finally:
+                self._records.task_done()
+
+    def _write_table(self, entry):
+        keep = app.config["SLOW_QUERY_TABLE_MAX"]
+
+        def work(conn):
+            cur = conn.execute(
+                """
+                INSERT INTO slow_queries (logged_at, endpoint, duration_ms, normalized_sql,
+                                          sql_text, params_shape, query_plan)
+                VALUES (:logged_at, :endpoint, :duration_ms, :normalized_sql,
+                        :sql_text, :params_shape, :query_plan)
+                """,
+                entry,
+            )
+            if cur.lastrowid % 100 == 0:
+                conn.execute("DELETE FROM slow_queries WHERE id <= ?", (cur.lastrowid - keep,))
+
+        with app.app_context():
+            db_write(work)
+
+    def flush(self, timeout=2.0):
+        """Wait (bounded) until queued records are written."""
+        deadline = time.monotonic() + timeout
+        while self._records.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_slow_query_log = None
+
+
+def get_slow_query_log():
+    global _slow_query_log
+    target = app.config["SLOW_QUERY_LOG"]
+    if _slow_query_log is None or _slow_query_log.target != target:
+        with _pool_lock:
+            if _slow_query_log is None or _slow_query_log.target != target:
+                _slow_query_log = SlowQueryLog(target)
+    return _slow_query_log
+
+
+def slow_query_report(limit=50):
+    """Worst offenders grouped by normalized SQL, most total time first."""
+    log = get_slow_query_log()
+    log.flush()
+    if log.target == "table":
+        rows = get_db().execute(
+            """
+            SELECT normalized_sql,
+                   COUNT(*) AS calls,
+                   SUM(duration_ms) AS total_ms,
+                   AVG(duration_ms) AS avg_ms,
+                   MAX(duration_ms) AS max_ms,
+                   MAX(logged_at) AS last_seen,
+                   GROUP_CONCAT(DISTINCT endpoint) AS endpoints,
+                   (SELECT s2.query_plan FROM slow_queries s2
+                    WHERE s2.normalized_sql = s.normalized_sql
+                    ORDER BY s2.id DESC LIMIT 1) AS query_plan
+            FROM slow_queries s
+            GROUP BY normalized_sql
+            ORDER BY total_ms DESC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    groups = {}
+    if os.path.exists(log.target):
+        with open(log.target, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                group = groups.setdefault(entry["normalized_sql"], {
+                    "normalized_sql": entry["normalized_sql"], "calls": 0, "total_ms": 0.0,
+                    "max_ms": 0.0, "last_seen": "", "endpoints": set(), "query_plan": None,
+                })
+                group["calls"] += 1
+                group["total_ms"] += entry["duration_ms"]
+                group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+                group["last_seen"] = max(group["last_seen"], entry["logged_at"])
+                if entry["endpoint"]:
+                    group["endpoints"].add(entry["endpoint"])
+                group["query_plan"] = entry["query_plan"] or group["query_plan"]
+    report = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:limit]
+    for group in report:
+        group["avg_ms"] = group["total_ms"] / group["calls"]
+        group["endpoints"] = ",".join(sorted(group["endpoints"]))
+    return report
+
+
+# ---------- MIGRATIONS ----------
+# Le schéma est décrit par les fichiers de migrations/ (NNNN_nom.sql ou
+# NNNN_nom.py avec une fonction upgrade(conn)), appliqués dans l'ordre.
+# La table schema_version garde la trace de chaque version appliquée.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_MIGRATION_FILE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.(sql|py)$")
+
+app.config["DB_AUTO_MIGRATE"] = True    # False : les workers exigent `flask db upgrade`
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def list_migrations():
+    """[(version, name, path)] sorted by version."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            found.append(
+                (int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename))
+            )
+    found.sort()
+    versions = [version for version, _name, _path in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version in %s" % MIGRATIONS_DIR)
+    return found
+
+
+def latest_migration_version():
+    migrations = list_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def current_schema_version(conn):
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # table absente : base neuve ou antérieure aux migrations
+    return row[0] or 0
+
+
+def _split_sql(script):
+    """Split a script into complete statements (trigger bodies stay intact)."""
+    statements = []
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip():
+                statements.append(buffer.strip())
+            buffer = ""
+    leftover = [l for l in buffer.splitlines() if l.strip() and not l.strip().startswith("--")]
+    if leftover:
+        raise ValueError("Incomplete SQL statement at end of migration")
+    return statements
+
+
+def _apply_migration(conn, version, name, path):
+    if path.endswith(".sql"):
+        with open(path, encoding="utf-8") as fh:
+            statements = _split_sql(fh.read())
+
+        def upgrade(c):
+            for statement in statements:
+                c.execute(statement)
+    else:
+        spec = importlib.util.spec_from_file_location("migration_%04d" % version, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        upgrade = module.upgrade
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Un autre processus a pu appliquer la migration pendant qu'on attendait
+        if conn.execute(
+            "SELECT 1 FROM schema_version WHERE version = ?", (version,)
+        ).fetchone():
+            conn.rollback()
+            return False
+        upgrade(conn)
+        conn.execute(
+            "INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations up to target (default: latest); returns versions applied."""
     conn.execute(
         """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            full_name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('pet_owner','clinic_staff','admin')),
-            is_approved INTEGER NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """
     )
+    current = current_schema_version(conn)
+    applied = []
+    for version, name, path in list_migrations():
+        if version <= current or (target is not None and version > target):
+            continue
+        if _apply_migration(conn, version, name, path):
+            applied.append(version)
+    return applied
 
-    # Table appointments
-    conn.execute(
+
+def init_db():
+    """Startup check. Fast path: one SELECT when the schema is up to date."""
+    conn = _connect()
+    try:
+        if current_schema_version(conn) >= latest_migration_version():
+            return
+        if not app.config["DB_AUTO_MIGRATE"]:
+            raise SchemaOutOfDate(
+                "Database schema is out of date; run `flask db upgrade` first."
+            )
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+_schema_checked = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_schema():
+    """init_db() once per process and database, before the first connection is served.
+
+    gunicorn (app:app) and uvicorn (asgi:application) never run the __main__
+    block, so the pool, the writer and AsyncDB call this instead: an old
+    schema is migrated, or refused with SchemaOutOfDate, before any query.
+    """
+    database = app.config["DATABASE"]
+    if database in _schema_checked:
+        return
+    with _schema_lock:
+        if database not in _schema_checked:
+            init_db()
+            _schema_checked.add(database)
+
+
+db_cli = AppGroup("db", help="Database schema management.")
+
+
+@db_cli.command("upgrade")
+@click.option("--to", "target", type=int, default=None, help="Stop at this version.")
+def db_upgrade_command(target):
+    """Apply pending migrations (run once per deploy, before the workers)."""
+    conn = _connect()
+    try:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        applied = migrate(conn, target)
+        version = current_schema_version(conn)
+    finally:
+        conn.close()
+    for v in applied:
+        click.echo("applied migration %04d" % v)
+    click.echo("schema version %d (journal_mode=%s)" % (version, mode))
+
+
+@db_cli.command("current")
+def db_current_command():
+    """Show the applied and the latest available schema version."""
+    conn = _connect()
+    try:
+        version = current_schema_version(conn)
+    finally:
+        conn.close()
+    click.echo("current %d, latest %d" % (version, latest_migration_version()))
+
+
+app.cli.add_command(db_cli)
+
+
+# ---------- REPORTING ROLLUPS ----------
+# Tables de cumul maintenues par triggers (migrations 0005 et 0006).
+# (table, colonnes clé, colonnes valeur, requête source qui les recalcule)
+
+ROLLUPS = [
+    (
+        "invoice_revenue_monthly",
+        ("month", "status"),
+        ("total_amount", "invoice_count"),
         """
-        CREATE TABLE IF NOT EXISTS appointments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            owner_id INTEGER NOT NULL,
-            pet_name TEXT NOT NULL,
-            appointment_date TEXT NOT NULL,  -- YYYY-MM-DD
-            appointment_time TEXT NOT NULL,  -- HH:MM
-            reason TEXT,
-            status TEXT NOT NULL CHECK(status IN ('pending','confirmed','rescheduled','cancelled')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(owner_id) REFERENCES users(id)
-        )
+        SELECT strftime('%Y-%m', issued_at), status, SUM(total_amount), COUNT(*)
+        FROM invoices
+        GROUP BY 1, 2
+        """,
+    ),
+    (
+        "invoice_revenue_daily",
+        ("day", "status"),
+        ("total_amount", "invoice_count"),
         """
-    )
+        SELECT date(issued_at), status, SUM(total_amount), COUNT(*)
+        FROM invoices
+        GROUP BY 1, 2
+        """,
+    ),
+    (
+        "appointment_counts_daily",
+        ("day", "status"),
+        ("appointment_count",),
+        """
+        SELECT appointment_date, status, COUNT(*)
+        FROM appointments
+        GROUP BY 1, 2
+        """,
+    ),
+]
 
-    # Table pets
-    conn.execute(
+
+def rebuild_rollups(conn):
+    """Recompute every rollup table from scratch in one transaction."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table, keys, values, source in ROLLUPS:
+            conn.execute("DELETE FROM %s" % table)
+            conn.execute(
+                "INSERT INTO %s (%s) %s" % (table, ", ".join(keys + values), source)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def check_rollups(conn):
+    """Compare rollups with their source tables; returns a list of mismatches."""
+    mismatches = []
+    for table, keys, values, source in ROLLUPS:
+        width = len(keys)
+        expected = {tuple(row[:width]): tuple(row[width:]) for row in conn.execute(source)}
+        actual = {
+            tuple(row[:width]): tuple(row[width:])
+            for row in conn.execute(
+                "SELECT %s FROM %s WHERE %s != 0"
+                % (", ".join(keys + values), table, values[-1])
+            )
+        }
+        for key in sorted(set(expected) | set(actual), key=str):
+            want = expected.get(key)
+            got = actual.get(key)
+            if want is None or got is None or any(
+                abs((a or 0) - (b or 0)) > 0.005 for a, b in zip(want, got)
+            ):
+                mismatches.append((table, key, want, got))
+    return mismatches
+
+
+reports_cli = AppGroup("reports", help="Reporting rollup maintenance.")
+
+
+@reports_cli.command("rebuild")
+@click.option("--background", is_flag=True, help="Queue the rebuild for `flask jobs work`.")
+def reports_rebuild_command(background):
+    """Recompute the rollup tables from invoices and appointments."""
+    conn = _connect()
+    try:
+        if background:
+            # Après les notifications en attente
+            job_id = enqueue(conn, "rebuild_rollups", priority=50)
+            conn.commit()
+            click.echo("queued job %d" % job_id)
+            return
+        rebuild_rollups(conn)
+    finally:
+        conn.close()
+    dashboard_cache.invalidate()
+    click.echo("rollups rebuilt")
+
+
+@reports_cli.command("check")
+def reports_check_command():
+    """Exit with status 1 if a rollup disagrees with its source table."""
+    conn = _connect()
+    try:
+        mismatches = check_rollups(conn)
+    finally:
+        conn.close()
+    for table, key, want, got in mismatches:
+        click.echo("%s %s: expected %s, found %s" % (table, key, want, got))
+    if mismatches:
+        raise SystemExit(1)
+    click.echo("rollups consistent")
+
+
+app.cli.add_command(reports_cli)
+
+
+# ---------- CACHE ----------
+
+app.config["DASHBOARD_CACHE_TTL"] = 30  # secondes
+
+
+class LRUCache:
+    """Bounded thread-safe LRU with expiry; get(key, load) calls load(key) on a miss.
+
+    Callers invalidate(key) after their write; the generation counter keeps
+    a load that raced with the invalidation from storing the stale value.
+    """
+
+    def __init__(self, size=4096, ttl=30):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            generation = self._generation
+        value = load(key)
+        with self._lock:
+            if generation == self._generation:
+                self._data[key] = (value, now + self.ttl)
+                self._data.move_to_end(key)
+                while len(self._data) > self.size:
+                    self._data.popitem(last=False)
+                    self.stats["evictions"] += 1
+        return value
+
+    def get_many(self, keys, load):
+        """{key: value} for all keys; load(missing) returns a dict of the misses.
+
+        One load call for every miss (e.g. one IN query); keys absent from
+        its result are cached as None.
         """
-        CREATE TABLE IF NOT EXISTS pets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            owner_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            species TEXT,
-            breed TEXT,
-            age INTEGER,
-            sex TEXT,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(owner_id) REFERENCES users(id)
-        )
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._data.get(key)
+                if entry is not None and entry[1] > now:
+                    self._data.move_to_end(key)
+                    found[key] = entry[0]
+                else:
+                    missing.append(key)
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(missing)
+            generation = self._generation
+        if not missing:
+            return found
+        loaded = load(missing)
+        with self._lock:
+            if generation == self._generation:
+                for key in missing:
+                    self._data[key] = (loaded.get(key), now + self.ttl)
+                    self._data.move_to_end(key)
+                while len(self._data) > self.size:
+                    self._data.popitem(last=False)
+                    self.stats["evictions"] += 1
+        for key in missing:
+            found[key] = loaded.get(key)
+        return found
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+            self.stats["invalidations"] += 1
+
+
+class TTLCache:
+    """Small thread-safe read-through cache with expiry and explicit invalidation.
+
+    Entries are local to the process; the TTL bounds how stale another
+    worker's copy can get after a write.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+        value = loader()
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+            self.stats["invalidations"] += 1
+
+
+dashboard_cache = TTLCache(app.config["DASHBOARD_CACHE_TTL"])
+
+
+# ---------- FRAGMENT CACHE ----------
+# HTML déjà rendu des tableaux (dashboards, historiques), indexé par
+# (template, entité, version). La version vient de change_stamps (0011, 0016),
+# incrémentée par triggers dans la transaction même de l'écriture : une
+# écriture faite par un autre process (worker, ASGI, import en CLI) change la
+# clé aussitôt. Les anciennes clés ne sont plus demandées et sortent du LRU.
+
+app.config["FRAGMENT_CACHE_SIZE"] = 2048    # fragments gardés en mémoire
+app.config["FRAGMENT_CACHE_TTL"] = 60       # secondes
+
+fragment_cache = LRUCache(app.config["FRAGMENT_CACHE_SIZE"], app.config["FRAGMENT_CACHE_TTL"])
+
+
+def day_stamp_id(day_str):
+    """change_stamps entity_id of a 'staff_day' (YYYY-MM-DD -> YYYYMMDD)."""
+    return int(day_str.replace("-", ""))
+
+
+def staff_day_versions(conn, first, last):
+    """{YYYYMMDD: version} of the days from first to last, in one range read."""
+    return dict(conn.execute(
         """
+        SELECT entity_id, version FROM change_stamps
+        WHERE scope = 'staff_day' AND entity_id BETWEEN ? AND ?
+        """,
+        (day_stamp_id(first), day_stamp_id(last)),
+    ).fetchall())
+
+
+def cached_fragment(template, kind, key, load, *extra, version):
+    """`template` rendered for one entity, load() giving its context on a miss.
+
+    A hit is a dictionary lookup: neither the SQL in load() nor Jinja run.
+    extra holds whatever else the markup depends on (date, cursor args).
+    version is the entity's change_stamps version, read in the same request.
+    Needs a request context for url_for.
+    """
+    cache_key = (template, kind, key, version) + extra
+    return fragment_cache.get(cache_key, lambda _: Markup(render_template(template, **load())))
+
+
+# ---------- CONDITIONAL REQUESTS ----------
+# ETag / Last-Modified des vues propriétaire en lecture seule. La version de
+# l'entité vient de change_stamps (triggers, migration 0011) : un rafraîchissement
+# sans changement coûte une recherche par clé primaire et répond 304.
+
+app.config["CONDITIONAL_GET"] = True
+
+_render_stamp = None
+
+
+def render_stamp():
+    """(digest, mtime) of app.py, the templates and the asset manifest.
+
+    A deploy or an asset build changes every ETag.
+    """
+    global _render_stamp
+    if _render_stamp is None:
+        digest = hashlib.sha1()
+        mtime = 0
+        paths = [os.path.abspath(__file__)]
+        for root, _dirs, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+            paths.extend(os.path.join(root, name) for name in sorted(files))
+        if os.path.isfile(assets_manifest_path()):
+            paths.append(assets_manifest_path())
+        for path in paths:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+            mtime = max(mtime, int(os.path.getmtime(path)))
+        _render_stamp = (digest.hexdigest()[:12], mtime)
+    return _render_stamp
+
+
+def change_stamp(conn, scope, entity_id):
+    """(version, modified_at) of an entity; (0, None) if unchanged since the migration."""
+    row = conn.execute(
+        "SELECT version, modified_at FROM change_stamps WHERE scope = ? AND entity_id = ?",
+        (scope, entity_id),
+    ).fetchone()
+    return (row["version"], row["modified_at"]) if row else (0, None)
+
+
+def check_conditional(conn, scope, entity_id, stamp=None):
+    """A 304 response if the client's copy of the page is current, else None.
+
+    The validators are kept on g; add_validators() puts them on the full
+    response. Pass stamp when the caller already joined change_stamps.
+    """
+    if not app.config["CONDITIONAL_GET"]:
+        return None
+    version, modified_at = stamp if stamp is not None else change_stamp(conn, scope, entity_id)
+    digest, mtime = render_stamp()
+    g.validators = (
+        "%s-%s-%s-%s" % (digest, scope, entity_id, version or 0),
+        dt.datetime.fromtimestamp(max(modified_at or 0, mtime), dt.timezone.utc),
     )
+    etag, last_modified = g.validators
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return add_validators(Response(status=304))
+
+
+@app.after_request
+def add_validators(response):
+    validators = g.get("validators")
+    if validators is not None and response.status_code in (200, 304):
+        response.set_etag(validators[0], weak=True)
+        response.last_modified = validators[1]
+        # Page propre à la session : le navigateur revalide à chaque affichage
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+    return response
+
+
+# ---------- STATIC ASSETS ----------
+# `flask assets build` copie static/ sous des noms contenant l'empreinte du
+# contenu (static/dist/), avec variantes .gz / .br et images redimensionnées.
+# url_for('static') pointe alors vers ces copies, servies avec un cache d'un an :
+# une page revisitée ne refait aucune requête statique. Sans build, rien ne change.
+# Relancer le serveur après un build ; les anciennes copies restent servies.
+
+app.config["ASSETS_DIR"] = "dist"                   # sous static/
+app.config["ASSETS_MAX_AGE"] = 365 * 24 * 3600      # secondes
+app.config["ASSET_IMAGE_WIDTHS"] = {                # px, 2x la taille affichée
+    "assets/images/logo.png": 240,
+    "assets/images/pet.jpg": 800,
+}
+
+ASSET_COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html")
+
+_assets_manifest = None
+
+
+def assets_manifest_path():
+    return os.path.join(app.static_folder, app.config["ASSETS_DIR"], "manifest.json")
+
+
+def assets_manifest():
+    """Logical path -> built path, {} until `flask assets build` has run."""
+    global _assets_manifest
+    path = assets_manifest_path()
+    if _assets_manifest is None or _assets_manifest[0] != path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        _assets_manifest = (path, manifest)
+    return _assets_manifest[1]
+
+
+def _optimized_image(logical, source):
+    """Resized / re-encoded image bytes, or None to keep the original."""
+    width = app.config["ASSET_IMAGE_WIDTHS"].get(logical)
+    if Image is None or width is None:
+        return None
+    with Image.open(source) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        if image.format == "JPEG" or logical.lower().endswith((".jpg", ".jpeg")):
+            image.convert("RGB").save(out, "JPEG", quality=82, optimize=True, progressive=True)
+        else:
+            image.save(out, "PNG", optimize=True)
+    data = out.getvalue()
+    return data if len(data) < os.path.getsize(source) else None
+
+
+def build_assets():
+    """Write content-hashed copies of static/ and their manifest; returns the manifest."""
+    static = app.static_folder
+    out_dir = os.path.join(static, app.config["ASSETS_DIR"])
+    encoders = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        encoders.append((".br", lambda data: brotli.compress(data, quality=11)))
+
+    manifest = {}
+    for root, dirs, files in os.walk(static):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != out_dir)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static).replace(os.sep, "/")
+            data = _optimized_image(logical, source)
+            if data is None:
+                with open(source, "rb") as f:
+                    data = f.read()
+            stem, ext = os.path.splitext(logical)
+            built = "%s/%s.%s%s" % (
+                app.config["ASSETS_DIR"], stem, hashlib.sha256(data).hexdigest()[:12], ext
+            )
+            target = os.path.join(static, built)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            variants = [("", data)]
+            if ext.lower() in ASSET_COMPRESSIBLE:
+                variants += [(suffix, encode(data)) for suffix, encode in encoders]
+            for suffix, payload in variants:
+                if suffix and len(payload) >= len(data):
+                    continue
+                with open(target + suffix, "wb") as f:
+                    f.write(payload)
+            manifest[logical] = built
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = assets_manifest_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, assets_manifest_path())
+
+    global _assets_manifest, _render_stamp
+    _assets_manifest = _render_stamp = None
+    return manifest
+
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == "static":
+        built = assets_manifest().get(values.get("filename"))
+        if built is not None:
+            values["filename"] = built
+
+
+def serve_static(filename):
+    """Flask's static view; built assets get a year of caching and .br/.gz variants."""
+    prefix = app.config["ASSETS_DIR"] + "/"
+    if not filename.startswith(prefix) or filename == prefix + "manifest.json":
+        return app.send_static_file(filename)
+
+    max_age = app.config["ASSETS_MAX_AGE"]
+    response = None
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(
+            os.path.join(app.static_folder, filename + suffix)
+        ):
+            response = send_from_directory(
+                app.static_folder, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0], max_age=max_age,
+            )
+            response.content_encoding = encoding
+            break
+    if response is None:
+        response = send_from_directory(app.static_folder, filename, max_age=max_age)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add("Accept-Encoding")
+    return response
 
-    # Table medical_records
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS medical_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pet_id INTEGER NOT NULL,
-            appointment_id INTEGER,
-            staff_id INTEGER NOT NULL,
-            weight REAL,
-            temperature REAL,
-            diagnosis TEXT NOT NULL,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(pet_id) REFERENCES pets(id),
-            FOREIGN KEY(appointment_id) REFERENCES appointments(id),
-            FOREIGN KEY(staff_id) REFERENCES users(id)
+
+app.view_functions["static"] = serve_static
+
+
+assets_cli = AppGroup("assets", help="Static asset pipeline.")
+
+
+@assets_cli.command("build")
+def assets_build_command():
+    """Fingerprint, compress and resize static files into static/dist."""
+    if brotli is None:
+        click.echo("brotli not installed: gzip variants only")
+    if Image is None:
+        click.echo("Pillow not installed: images copied unchanged")
+    static = app.static_folder
+    for logical, built in sorted(build_assets().items()):
+        path = os.path.join(static, built)
+        sizes = [os.path.getsize(os.path.join(static, logical)), os.path.getsize(path)]
+        sizes += [os.path.getsize(path + s) if os.path.exists(path + s) else 0 for s in (".gz", ".br")]
+        click.echo("%-52s %8d -> %8d  gz %8d  br %8d" % ((built,) + tuple(sizes)))
+
+
+app.cli.add_command(assets_cli)
+
+
+# ---------- PAGINATION ----------
+# Pagination par curseur (keyset) : la page suivante reprend après le dernier
+# couple (date, id) affiché, donc le coût ne dépend pas de la profondeur.
+
+app.config["PAGE_SIZE"] = 25
+app.config["MAX_PAGE_SIZE"] = 100
+
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    # Curseur forgé : seules des valeurs que SQLite sait lier passent
+    if not _cursor_int(row_id):
+        return None
+    if not (sort_value is None or isinstance(sort_value, (str, float)) or _cursor_int(sort_value)):
+        return None
+    return sort_value, row_id
+
+
+def _cursor_int(value):
+    return type(value) is int and -2 ** 63 <= value < 2 ** 63
+
+
+def read_page_args():
+    """(size, after, before) from the query string, size clamped to MAX_PAGE_SIZE."""
+    try:
+        size = int(request.args.get("size", app.config["PAGE_SIZE"]))
+    except ValueError:
+        size = app.config["PAGE_SIZE"]
+    size = max(1, min(size, app.config["MAX_PAGE_SIZE"]))
+    return (
+        size,
+        decode_cursor(request.args.get("after")),
+        decode_cursor(request.args.get("before")),
+    )
+
+
+def keyset_page(conn, sql, params, sort_column, id_column, size, after=None, before=None):
+    """One page of `sql` (a SELECT ending in a WHERE clause), newest first.
+
+    sort_column/id_column are the SQL expressions of the keyset; the rows
+    must expose them under their last dotted name (e.g. created_at, id).
+    Returns {"rows", "next", "prev", "size"} where next/prev are cursors.
+    """
+    sort_key = sort_column.split(".")[-1]
+    id_key = id_column.split(".")[-1]
+    params = list(params)
+    if before is not None:
+        sql += " AND (%s, %s) > (?, ?)" % (sort_column, id_column)
+        params += list(before)
+        order = "ASC"
+    else:
+        if after is not None:
+            sql += " AND (%s, %s) < (?, ?)" % (sort_column, id_column)
+            params += list(after)
+        order = "DESC"
+    sql += " ORDER BY %s %s, %s %s LIMIT ?" % (sort_column, order, id_column, order)
+    params.append(size + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    more = len(rows) > size
+    rows = rows[:size]
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+
+    def cursor(row):
+        return encode_cursor(row[sort_key], row[id_key])
+
+    return {
+        "rows": rows,
+        "next": cursor(rows[-1]) if rows and has_next else None,
+        "prev": cursor(rows[0]) if rows and has_prev else None,
+        "size": size,
+    }
+
+
+@app.template_global()
+def page_url(**changes):
+    """Current URL with after/before replaced (filters are kept)."""
+    args = request.args.to_dict()
+    args.pop("after", None)
+    args.pop("before", None)
+    args.update({k: v for k, v in changes.items() if v is not None})
+    return url_for(request.endpoint, **dict(request.view_args or {}, **args))
+
+
+
+# ---------- SCHEDULING ----------
+# Créneaux fixes pendant les heures d'ouverture. Chaque créneau accepte
+# (staff approuvé × SLOT_CAPACITY_PER_STAFF) rendez-vous non annulés.
+# L'index en mémoire sert aux lectures ; la vérification qui fait foi est
+# refaite en SQL dans la transaction d'écriture.
+
+app.config["CLINIC_HOURS"] = {
+    0: ("08:00", "18:00"),  # lundi
+    1: ("08:00", "18:00"),
+    2: ("08:00", "18:00"),
+    3: ("08:00", "18:00"),
+    4: ("08:00", "18:00"),
+    5: ("09:00", "13:00"),  # samedi
+    6: None,                # dimanche : fermé
+}
+app.config["SLOT_MINUTES"] = 30
+app.config["SLOT_CAPACITY_PER_STAFF"] = 1
+app.config["SCHEDULE_INDEX_TTL"] = 60   # secondes avant de relire un jour en base
+
+
+# Compteurs de l'index sur 16 bits : la capacité est plafonnée à cette valeur
+SLOT_COUNT_MAX = 65535
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def time_to_minutes(value):
+    try:
+        hours, minutes = value.split(":")[:2]
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
+def minutes_to_time(value):
+    return "%02d:%02d" % divmod(value, 60)
+
+
+def day_slots(day):
+    """Slot start times (minutes since midnight) for a datetime.date."""
+    hours = app.config["CLINIC_HOURS"].get(day.weekday())
+    if not hours:
+        return []
+    opening, closing = time_to_minutes(hours[0]), time_to_minutes(hours[1])
+    step = app.config["SLOT_MINUTES"]
+    return list(range(opening, closing - step + 1, step))
+
+
+def validate_slot(day, time_value):
+    """Error message if time_value is not a slot start on that day, else None."""
+    minutes = time_to_minutes(time_value)
+    if minutes is None:
+        return "Invalid time format."
+    slots = day_slots(day)
+    if not slots:
+        return "The clinic is closed on this day."
+    if minutes not in slots:
+        return "Please choose a %d-minute slot between %s and %s." % (
+            app.config["SLOT_MINUTES"],
+            minutes_to_time(slots[0]),
+            minutes_to_time(slots[-1] + app.config["SLOT_MINUTES"]),
         )
+    return None
+
+
+schedule_cache = TTLCache(60)
+
+
+def slot_capacity():
+    def load():
+        staff = get_db().execute(
+            "SELECT COUNT(*) FROM users WHERE role='clinic_staff' AND is_approved=1"
+        ).fetchone()[0]
+        return min(SLOT_COUNT_MAX, max(staff, 1) * app.config["SLOT_CAPACITY_PER_STAFF"])
+    return schedule_cache.get_or_load("capacity", load)
+
+
+class ScheduleIndex:
+    """Booked count per slot, one array("H") per day (16 bits per slot).
+
+    A range of days is loaded with a single grouped query, then kept up to
+    date incrementally by the write routes (apply()). Days are reloaded
+    after SCHEDULE_INDEX_TTL so bookings made by other processes show up.
+    Conflict checks and availability lookups are O(1) per slot.
+    """
+
+    def __init__(self):
+        self._days = {}
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "days_loaded": 0}
+
+    @staticmethod
+    def _offset(day, minutes):
+        slots = day_slots(day)
+        if not slots or minutes is None:
+            return None
+        offset = (minutes - slots[0]) // app.config["SLOT_MINUTES"]
+        return offset if 0 <= offset < len(slots) else None
+
+    def _load(self, start, days):
+        end = start + dt.timedelta(days=days)
+        counts = {}
+        for n in range(days):
+            day = start + dt.timedelta(days=n)
+            counts[day.isoformat()] = array("H", bytes(2 * len(day_slots(day))))
+        rows = get_db().execute(
+            """
+            SELECT appointment_date, appointment_time, COUNT(*) AS c
+            FROM appointments
+            WHERE appointment_date >= ? AND appointment_date < ?
+              AND status != 'cancelled'
+            GROUP BY appointment_date, appointment_time
+            """,
+            (start.isoformat(), end.isoformat()),
+        ).fetchall()
+        for row in rows:
+            day_counts = counts.get(row["appointment_date"])
+            try:
+                day = dt.date.fromisoformat(row["appointment_date"])
+            except ValueError:
+                continue
+            offset = self._offset(day, time_to_minutes(row["appointment_time"]))
+            if day_counts is not None and offset is not None:
+                day_counts[offset] = min(SLOT_COUNT_MAX, day_counts[offset] + row["c"])
+        loaded = time.monotonic()
+        with self._lock:
+            for key, value in counts.items():
+                self._days[key] = (loaded, value)
+            self.stats["loads"] += 1
+            self.stats["days_loaded"] += days
+        return counts
+
+    def _ensure(self, start, days):
+        """Counts of each day from start, the missing or stale ones loaded.
+
+        The arrays are returned rather than looked up again: an
+        invalidate() in between may already have dropped them.
         """
+        ttl = app.config["SCHEDULE_INDEX_TTL"]
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for n in range(days):
+                key = (start + dt.timedelta(days=n)).isoformat()
+                entry = self._days.get(key)
+                if entry is None or now - entry[0] >= ttl:
+                    missing.append(n)
+                else:
+                    found[key] = entry[1]
+        if missing:
+            # Une seule requête pour toute la plage manquante
+            found.update(self._load(start + dt.timedelta(days=missing[0]), missing[-1] - missing[0] + 1))
+        return [found[(start + dt.timedelta(days=n)).isoformat()] for n in range(days)]
+
+    def booked(self, day_str, start):
+        """Number of active appointments in the slot starting at `start` minutes."""
+        day = dt.date.fromisoformat(day_str)
+        counts, = self._ensure(day, 1)
+        offset = self._offset(day, start)
+        with self._lock:
+            return counts[offset] if offset is not None else 0
+
+    def free_slots(self, start, days, capacity):
+        """{date: [HH:MM, ...]} of slots that still have room."""
+        loaded = self._ensure(start, days)
+        step = app.config["SLOT_MINUTES"]
+        result = {}
+        with self._lock:
+            for n, counts in enumerate(loaded):
+                day = start + dt.timedelta(days=n)
+                slots = day_slots(day)
+                result[day.isoformat()] = [
+                    minutes_to_time(slots[0] + i * step)
+                    for i, booked in enumerate(counts)
+                    if booked < capacity
+                ]
+        return result
+
+    def apply(self, day_str, time_value, delta):
+        """Record a booking (+1) or a freed place (-1) in a loaded day."""
+        try:
+            day = dt.date.fromisoformat(day_str)
+        except (TypeError, ValueError):
+            return
+        offset = self._offset(day, time_to_minutes(time_value))
+        with self._lock:
+            entry = self._days.get(day_str)
+            if entry is None or offset is None:
+                return
+            counts = entry[1]
+            counts[offset] = max(0, min(SLOT_COUNT_MAX, counts[offset] + delta))
+
+    def invalidate(self, day_str=None):
+        with self._lock:
+            if day_str is None:
+                self._days.clear()
+            else:
+                self._days.pop(day_str, None)
+
+
+schedule_index = ScheduleIndex()
+
+
+def claim_slot(work, day_str, time_value, capacity, exclude_id=None):
+    """Run work(conn) only if the slot still has room, atomically.
+
+    The count is repeated inside the write transaction (BEGIN IMMEDIATE),
+    so two concurrent requests can never both take the last place.
+    """
+    start = time_to_minutes(time_value)
+    end = minutes_to_time(start + app.config["SLOT_MINUTES"])
+
+    def guarded(conn):
+        taken = conn.execute(
+            """
+            SELECT COUNT(*) FROM appointments
+            WHERE appointment_date = ?
+              AND appointment_time >= ? AND appointment_time < ?
+              AND status != 'cancelled' AND id != ?
+            """,
+            (day_str, minutes_to_time(start), end, exclude_id or 0),
+        ).fetchone()[0]
+        if taken >= capacity:
+            raise SlotUnavailable("This time slot is fully booked.")
+        return work(conn)
+
+    return db_write(guarded)
+
+
+# ---------- PASSWORD HASHING ----------
+# scrypt coûte ~50 ms de CPU et 32 Mo de RAM par appel : on le sort des
+# threads de requête et on plafonne le nombre de hachages simultanés.
+
+app.config["PASSWORD_HASH_METHOD"] = "scrypt:32768:8:1"  # forme complète, comme stockée en base
+app.config["PASSWORD_HASH_WORKERS"] = 2        # 0 = hachage directement dans la requête
+app.config["PASSWORD_HASH_MAX_PENDING"] = 32   # au-delà, login/register répondent 503
+app.config["PASSWORD_HASH_TIMEOUT"] = 10.0     # secondes
+
+
+class HasherBusy(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    """Bounded thread pool for generate/check_password_hash.
+
+    hashlib releases the GIL while it runs scrypt/pbkdf2, so the request
+    threads keep serving pages while at most `workers` hashes burn CPU.
+    Requests beyond `max_pending` fail fast with HasherBusy instead of
+    piling up behind a login rush.
+    """
+
+    def __init__(self, workers=2, max_pending=32, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pw-hash") if workers else None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {
+            "hashes": 0, "checks": 0, "rehashes": 0, "rejected": 0,
+            "max_pending": 0, "wait_ms": 0.0, "hash_ms": 0.0,
+        }
+
+    def _done(self, kind, queued_at, started):
+        with self._lock:
+            self._pending -= 1
+            self.stats[kind] += 1
+            self.stats["wait_ms"] += (started - queued_at) * 1000
+            self.stats["hash_ms"] += (time.perf_counter() - started) * 1000
+
+    def _run(self, kind, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise HasherBusy("Password hashing queue is full")
+            self._pending += 1
+            if self._pending > self.stats["max_pending"]:
+                self.stats["max_pending"] = self._pending
+        queued_at = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._done(kind, queued_at, started)
+
+        if self._executor is None:
+            return job()
+        future = self._executor.submit(job)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if future.cancel():  # jamais démarré : job() ne décomptera pas
+                with self._lock:
+                    self._pending -= 1
+                    self.stats["rejected"] += 1
+            raise HasherBusy("Password hashing timed out after %.1fs" % self.timeout)
+
+    def hash(self, password, kind="hashes"):
+        return self._run(kind, generate_password_hash, password, app.config["PASSWORD_HASH_METHOD"])
+
+    def check(self, pwhash, password):
+        return self._run("checks", check_password_hash, pwhash, password)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data["pending"] = self._pending
+        data["workers"] = self.workers
+        return data
+
+    def shutdown(self):
+        """Let the threads exit once their queued hashes are done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def needs_rehash(pwhash):
+    """True when the stored hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    return pwhash.split("$", 1)[0] != app.config["PASSWORD_HASH_METHOD"]
+
+
+_hasher = None
+
+
+def get_hasher():
+    global _hasher
+    settings = (
+        app.config["PASSWORD_HASH_WORKERS"],
+        app.config["PASSWORD_HASH_MAX_PENDING"],
+        app.config["PASSWORD_HASH_TIMEOUT"],
     )
+    if _hasher is None or (_hasher.workers, _hasher.max_pending, _hasher.timeout) != settings:
+        with _pool_lock:
+            if _hasher is None or (_hasher.workers, _hasher.max_pending, _hasher.timeout) != settings:
+                old, _hasher = _hasher, PasswordHasher(*settings)
+                if old is not None:
+                    old.shutdown()
+    return _hasher
+
+
+# ---------- SESSIONS ----------
+# Le cookie ne contient plus qu'un identifiant ; les données de session sont
+# stockées côté serveur, ce qui permet de révoquer les sessions d'un compte.
+
+app.config["SESSION_BACKEND"] = "sqlite"       # "sqlite", "memory" (un seul process) ou "cookie" (signé, ancien mode)
+app.config["SESSION_PURGE_INTERVAL"] = 3600    # secondes entre deux purges des sessions expirées
+app.config["SESSION_TOUCH_INTERVAL"] = 300     # secondes ; l'expiration d'une session lue est repoussée au plus une fois par intervalle
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.loaded_user = self.get("user_id")
+        self.modified = False
+
+
+class MemorySessionStore:
+    """Sessions in a dict; only valid with a single server process."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """(data, expires_at), or None for an unknown or expired id."""
+        entry = self._data.get(sid)
+        if entry is None or entry[2] < time.time():
+            return None
+        return json.loads(entry[1]), entry[2]
+
+    def save(self, sid, data, user_id, expires_at):
+        with self._lock:
+            self._data[sid] = (user_id, json.dumps(data), expires_at)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is not None:
+                self._data[sid] = (entry[0], entry[1], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for sid in [s for s, entry in self._data.items() if entry[0] == user_id]:
+                del self._data[sid]
+
+    def purge(self, now):
+        with self._lock:
+            for sid in [s for s, entry in self._data.items() if entry[2] < now]:
+                del self._data[sid]
+
+
+class SqliteSessionStore:
+    """Sessions in the `sessions` table (migration 0009); writes go through db_write()."""
+
+    def load(self, sid):
+        """(data, expires_at), or None for an unknown or expired id."""
+        row = get_db().execute(
+            "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at >= ?", (sid, time.time())
+        ).fetchone()
+        return (json.loads(row["data"]), row["expires_at"]) if row else None
 
-    # Table prescriptions
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS prescriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pet_id INTEGER NOT NULL,
-            appointment_id INTEGER,
-            medical_record_id INTEGER,
-            staff_id INTEGER NOT NULL,
-            drug_name TEXT NOT NULL,
-            dosage TEXT NOT NULL,
-            frequency TEXT,
-            duration TEXT,
-            instructions TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(pet_id) REFERENCES pets(id),
-            FOREIGN KEY(appointment_id) REFERENCES appointments(id),
-            FOREIGN KEY(medical_record_id) REFERENCES medical_records(id),
-            FOREIGN KEY(staff_id) REFERENCES users(id)
+    def save(self, sid, data, user_id, expires_at):
+        db_execute(
+            "INSERT OR REPLACE INTO sessions (id, user_id, data, expires_at) VALUES (?, ?, ?, ?)",
+            (sid, user_id, json.dumps(data), expires_at),
         )
-        """
+
+    def touch(self, sid, expires_at):
+        db_execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (expires_at, sid))
+
+    def delete(self, sid):
+        db_execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def delete_user(self, user_id):
+        db_execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    def purge(self, now):
+        db_execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+
+
+SESSION_STORES = {"sqlite": SqliteSessionStore, "memory": MemorySessionStore}
+_session_store = None
+
+
+def get_session_store():
+    """Store for the configured backend, or None with SESSION_BACKEND = "cookie"."""
+    global _session_store
+    backend = app.config["SESSION_BACKEND"]
+    if backend not in SESSION_STORES:
+        return None
+    if not isinstance(_session_store, SESSION_STORES[backend]):
+        with _pool_lock:
+            if not isinstance(_session_store, SESSION_STORES[backend]):
+                _session_store = SESSION_STORES[backend]()
+    return _session_store
+
+
+class ClinicSessionInterface(SessionInterface):
+    """Server-side sessions keyed by a random id, or Flask's signed cookie.
+
+    Static files get a null session: the store is not read for them, as
+    refresh_session_user() already skips them. A session that is only read
+    has its expiry pushed back at most once per SESSION_TOUCH_INTERVAL, so
+    an active user is not logged out after permanent_session_lifetime.
+    """
+
+    cookie_interface = SecureCookieSessionInterface()
+
+    def __init__(self):
+        self._last_purge = 0.0
+
+    def open_session(self, app, request):
+        store = get_session_store()
+        if store is None:
+            return self.cookie_interface.open_session(app, request)
+        # open_session() passe avant le routage : request.endpoint est encore vide
+        if app.static_url_path and request.path.startswith(app.static_url_path + "/"):
+            return self.make_null_session(app)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = store.load(sid)
+            if loaded is not None:
+                return ServerSession(loaded[0], sid=sid, expires_at=loaded[1])
+        return ServerSession()
+
+    def needs_touch(self, app, session):
+        """True when a session that was only read should get a new expiry."""
+        if not isinstance(session, ServerSession) or session.sid is None or not session:
+            return False
+        if session.expires_at is None:
+            return False
+        if not app.config["SESSION_REFRESH_EACH_REQUEST"]:
+            return False
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        return session.expires_at - time.time() < lifetime - app.config["SESSION_TOUCH_INTERVAL"]
+
+    def save_session(self, app, session, response):
+        if self.is_null_session(session):
+            return
+        store = get_session_store()
+        if store is None or not isinstance(session, ServerSession):
+            return self.cookie_interface.save_session(app, session, response)
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        response.vary.add("Cookie")
+
+        if not session:
+            if session.sid is not None:
+                store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            if self.needs_touch(app, session):
+                session.expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+                store.touch(session.sid, session.expires_at)
+                self._set_cookie(app, session, response)
+            return
+
+        # Nouvel identifiant à chaque changement d'utilisateur (fixation de session)
+        if session.sid is not None and session.get("user_id") != session.loaded_user:
+            store.delete(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+
+        now = time.time()
+        if now - self._last_purge > app.config["SESSION_PURGE_INTERVAL"]:
+            self._last_purge = now
+            store.purge(now)
+        session.expires_at = now + app.permanent_session_lifetime.total_seconds()
+        store.save(session.sid, dict(session), session.get("user_id"), session.expires_at)
+        self._set_cookie(app, session, response)
+
+    def _set_cookie(self, app, session, response):
+        response.set_cookie(
+            self.get_cookie_name(app),
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=self.get_cookie_domain(app),
+            path=self.get_cookie_path(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+app.session_interface = ClinicSessionInterface()
+
+
+def end_user_sessions(user_id):
+    """Log a user out everywhere (no-op with cookie sessions)."""
+    store = get_session_store()
+    if store is not None:
+        store.delete_user(user_id)
+
+
+# ---------- AUTH CACHE ----------
+# Rôle et validation de chaque utilisateur connecté, relus à chaque requête
+# depuis un LRU borné : un changement de rôle ou une suppression prend effet
+# immédiatement, sans requête SQL par page.
+
+app.config["AUTH_CACHE_SIZE"] = 4096    # utilisateurs gardés en mémoire
+app.config["AUTH_CACHE_TTL"] = 30       # secondes ; borne l'écart entre plusieurs process
+
+# user_id -> (role, is_approved), None pour un compte supprimé
+user_cache = LRUCache(app.config["AUTH_CACHE_SIZE"], app.config["AUTH_CACHE_TTL"])
+
+
+def load_user_auth(user_id):
+    row = get_db().execute(
+        "SELECT role, is_approved FROM users WHERE id = ?", (user_id,)
+    ).fetchone()
+    return (row["role"], row["is_approved"]) if row else None
+
+
+def sync_session_user(sess):
+    """Align the session's role with the users table.
+
+    Returns False (and empties the session) when the account was deleted
+    or is a staff account that is not approved.
+    """
+    user_id = sess.get("user_id")
+    if user_id is None:
+        return True
+    auth = user_cache.get(user_id, load_user_auth)
+    if auth is None or (auth[0] == "clinic_staff" and not auth[1]):
+        sess.clear()
+        return False
+    if sess.get("user_role") != auth[0]:
+        sess["user_role"] = auth[0]
+    return True
+
+
+@app.before_request
+def refresh_session_user():
+    if request.endpoint != "static":
+        sync_session_user(session)
+
+
+# ---------- PET CACHE ----------
+# Nom, espèce et propriétaire de chaque animal, par id. Les rendez-vous ne
+# renvoient que pet_id : les tableaux résolvent les noms ici (une requête IN
+# pour tous les absents), donc un animal renommé l'est partout.
+# add_pet / edit_pet / delete_pet invalident leur entrée.
+
+app.config["PET_CACHE_SIZE"] = 16384    # animaux gardés en mémoire
+app.config["PET_CACHE_TTL"] = 300       # secondes ; borne l'écart entre plusieurs process
+
+# pet_id -> Row(id, name, species, owner_id), None pour un animal supprimé
+pet_cache = LRUCache(app.config["PET_CACHE_SIZE"], app.config["PET_CACHE_TTL"])
+
+
+def load_pets(conn, pet_ids):
+    rows = conn.execute(
+        "SELECT id, name, species, owner_id FROM pets WHERE id IN (%s)"
+        % ", ".join("?" * len(pet_ids)),
+        pet_ids,
     )
+    return {row["id"]: row for row in rows}
 
-    # Table invoices (simple : total + statut)
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS invoices (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            owner_id INTEGER NOT NULL,
-            appointment_id INTEGER,
-            total_amount REAL NOT NULL,
-            status TEXT NOT NULL CHECK(status IN ('unpaid','paid','cancelled')),
-            issued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            paid_at TIMESTAMP,
-            notes TEXT,
-            FOREIGN KEY(owner_id) REFERENCES users(id),
-            FOREIGN KEY(appointment_id) REFERENCES appointments(id)
+
+def lookup_pets(conn, pet_ids):
+    """{pet_id: row or None} through pet_cache; NULL ids are skipped."""
+    ids = [pet_id for pet_id in pet_ids if pet_id is not None]
+    if not ids:
+        return {}
+    return pet_cache.get_many(ids, lambda missing: load_pets(conn, missing))
+
+
+def appointment_pet_names(conn, rows):
+    """{appointment id: pet name} for rows exposing id and pet_id.
+
+    Names come from pets through pet_cache. Only appointments without a pet
+    (legacy rows, deleted pet) read the name stored at booking, in one query.
+    """
+    pets = lookup_pets(conn, (row["pet_id"] for row in rows))
+    names, unlinked = {}, []
+    for row in rows:
+        pet = pets.get(row["pet_id"])
+        if pet is None:
+            unlinked.append(row["id"])
+        else:
+            names[row["id"]] = pet["name"]
+    if unlinked:
+        names.update(conn.execute(
+            "SELECT id, pet_name FROM appointments WHERE id IN (%s)"
+            % ", ".join("?" * len(unlinked)),
+            unlinked,
+        ).fetchall())
+    return names
+
+
+# ---------- JOB QUEUE ----------
+# Travail différé hors du chemin de la requête (table jobs, 0015). Les routes
+# appellent enqueue() dans leur propre transaction d'écriture : la tâche
+# n'existe que si l'écriture qui la motive a été validée. Les workers sont
+# des processus séparés (`flask jobs work`), chacun avec sa connexion ; une
+# tâche réclamée est cachée aux autres pendant JOBS_VISIBILITY_TIMEOUT, puis
+# reprise si son worker ne l'a pas terminée (exécution au moins une fois).
+
+app.config["JOBS_WORKERS"] = 2                  # processus lancés par `flask jobs work`
+app.config["JOBS_POLL_INTERVAL"] = 1.0          # secondes d'attente quand rien n'est dû
+app.config["JOBS_VISIBILITY_TIMEOUT"] = 300     # secondes avant qu'une tâche réclamée soit reprise
+app.config["JOBS_MAX_ATTEMPTS"] = 5
+app.config["JOBS_BACKOFF_BASE"] = 30            # secondes, doublées à chaque nouvel échec
+app.config["JOBS_BACKOFF_MAX"] = 3600
+app.config["JOBS_KEEP_DAYS"] = 7                # tâches terminées gardées par `flask jobs purge`
+app.config["REMINDER_LEAD_HOURS"] = 24          # rappel envoyé avant le rendez-vous
+
+JOBS_LOG_FORMAT = "%(asctime)s %(processName)s %(name)s: %(message)s"
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register fn(conn, payload) as the handler of a job kind."""
+    def register(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(conn, kind, payload=None, priority=10, run_at=None, dedupe_key=None):
+    """Add a job in the caller's write transaction and return its id.
+
+    Lower priorities run first; run_at is an epoch time (default: now).
+    A job still waiting with the same dedupe_key is replaced.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError("unknown job kind %r" % kind)
+    now = time.time()
+    if dedupe_key is not None:
+        conn.execute(
+            "DELETE FROM jobs WHERE dedupe_key = ? AND status = 'queued' AND locked_by IS NULL",
+            (dedupe_key,),
         )
+    return conn.execute(
         """
+        INSERT INTO jobs (kind, payload, priority, run_at, max_attempts, dedupe_key, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            kind, json.dumps(payload or {}), priority, now if run_at is None else run_at,
+            app.config["JOBS_MAX_ATTEMPTS"], dedupe_key, now,
+        ),
+    ).lastrowid
+
+
+def claim_job(conn, worker):
+    """Take the most urgent due job, hidden from other workers until the
+    visibility timeout; None when nothing is due.
+
+    One UPDATE ... RETURNING: the choice and the claim hold the same write lock.
+    """
+    now = time.time()
+    rows = conn.execute(
+        """
+        UPDATE jobs
+        SET run_at = ?, attempts = attempts + 1, locked_by = ?
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE status = 'queued' AND run_at <= ?
+            ORDER BY priority, run_at, id
+            LIMIT 1
+        )
+        RETURNING id, kind, payload, attempts, max_attempts
+        """,
+        (now + app.config["JOBS_VISIBILITY_TIMEOUT"], worker, now),
+    ).fetchall()
+    return rows[0] if rows else None
+
+
+def job_backoff(attempts):
+    """Seconds before the next try after `attempts` failed ones."""
+    return min(app.config["JOBS_BACKOFF_BASE"] * 2 ** (attempts - 1), app.config["JOBS_BACKOFF_MAX"])
+
+
+def finish_job(conn, job, worker, error=None, retry=True):
+    """Record the outcome of a claimed job.
+
+    Ignored when the claim expired and the job was taken again since
+    (locked_by and attempts identify the claim).
+    """
+    now = time.time()
+    claim = (job["id"], worker, job["attempts"])
+    if error is None:
+        sql, params = "status = 'done', last_error = NULL, finished_at = ?", (now,)
+    elif retry and job["attempts"] < job["max_attempts"]:
+        sql, params = "run_at = ?, last_error = ?", (now + job_backoff(job["attempts"]), error)
+    else:
+        sql, params = "status = 'failed', last_error = ?, finished_at = ?", (error, now)
+    conn.execute(
+        "UPDATE jobs SET locked_by = NULL, %s WHERE id = ? AND locked_by = ? AND attempts = ?" % sql,
+        params + claim,
     )
 
-    # Ajouter pet_id à appointments si la colonne n'existe pas encore
+
+def run_next_job(conn, worker):
+    """Claim and run one due job; False when none is due."""
+    job = claim_job(conn, worker)
+    if job is None:
+        return False
+    handler = JOB_HANDLERS.get(job["kind"])
+    error, retry = None, True
+    if job["attempts"] > job["max_attempts"]:
+        # Le worker précédent n'a jamais rendu sa dernière tentative
+        error = "visibility timeout on the last attempt"
+    elif handler is None:
+        error, retry = "no handler for %r" % job["kind"], False
+    else:
+        try:
+            handler(conn, json.loads(job["payload"]))
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            app.logger.warning("job %d (%s) attempt %d failed", job["id"], job["kind"], job["attempts"], exc_info=True)
+            error = "%s: %s" % (type(exc).__name__, exc)
+    finish_job(conn, job, worker, error, retry)
+    return True
+
+
+def work_jobs(database, stop, drain=False):
+    """Run due jobs until stop is set, or with drain until none is due."""
+    worker = "%s:%d" % (socket.gethostname(), os.getpid())
+    conn = _connect(database)
+    conn.isolation_level = None  # une instruction = une transaction, les handlers font leurs BEGIN
     try:
-        conn.execute(
-            "ALTER TABLE appointments ADD COLUMN pet_id INTEGER REFERENCES pets(id)"
+        with app.app_context():
+            while not stop.is_set():
+                if not run_next_job(conn, worker):
+                    if drain:
+                        break
+                    stop.wait(app.config["JOBS_POLL_INTERVAL"])
+    finally:
+        conn.close()
+
+
+def _job_worker_process(database, stop):
+    # Ctrl-C et SIGTERM : la tâche en cours se termine, puis le worker sort
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    logging.basicConfig(level=logging.INFO, format=JOBS_LOG_FORMAT)  # sans effet si hérité du parent
+    work_jobs(database, stop)
+
+
+def run_job_workers(database, processes):
+    """Pool of worker processes; a worker that dies is replaced, SIGINT or
+    SIGTERM stop them all once their current job is done."""
+    stop = multiprocessing.Event()
+
+    def start(n):
+        process = multiprocessing.Process(
+            target=_job_worker_process, args=(database, stop), name="jobs-%d" % n
         )
-    except sqlite3.OperationalError:
-        # Colonne déjà présente
+        process.start()
+        return process
+
+    workers = [start(n) for n in range(processes)]
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        while not stop.is_set():
+            for n, process in enumerate(workers):
+                if not process.is_alive():
+                    app.logger.warning("job worker %s exited with %s, restarting", process.name, process.exitcode)
+                    workers[n] = start(n)
+            stop.wait(1.0)
+    except KeyboardInterrupt:
         pass
+    finally:
+        stop.set()
+        for process in workers:
+            process.join()
 
-    # Admin par défaut
-    cur = conn.execute("SELECT id FROM users WHERE role='admin' LIMIT 1")
-    if cur.fetchone() is None:
-        admin_password = generate_password_hash("admin123")
-        conn.execute(
+
+def job_stats(conn):
+    """Jobs per state, for /metrics and `flask jobs status`."""
+    queued, due = conn.execute(
+        "SELECT COUNT(*), TOTAL(run_at <= ?) FROM jobs WHERE status = 'queued'", (time.time(),)
+    ).fetchone()
+    stats = {"queued": queued, "due": int(due), "done": 0, "failed": 0}
+    stats.update(conn.execute(
+        "SELECT status, COUNT(*) FROM jobs WHERE finished_at IS NOT NULL GROUP BY status"
+    ).fetchall())
+    return stats
+
+
+jobs_cli = AppGroup("jobs", help="Background job queue.")
+
+
+@jobs_cli.command("work")
+@click.option("--processes", type=int, default=None, help="Worker processes (default: JOBS_WORKERS).")
+@click.option("--drain", is_flag=True, help="Run the due jobs in this process, then exit.")
+def jobs_work_command(processes, drain):
+    """Run queued jobs until interrupted."""
+    logging.basicConfig(level=logging.INFO, format=JOBS_LOG_FORMAT)
+    if drain:
+        work_jobs(app.config["DATABASE"], threading.Event(), drain=True)
+        return
+    processes = processes or app.config["JOBS_WORKERS"]
+    click.echo("%d job workers on %s" % (processes, app.config["DATABASE"]))
+    run_job_workers(app.config["DATABASE"], processes)
+
+
+@jobs_cli.command("status")
+def jobs_status_command():
+    """Jobs per state, and the last failures."""
+    conn = _connect()
+    try:
+        for state, count in sorted(job_stats(conn).items()):
+            click.echo("%-7s %d" % (state, count))
+        for row in conn.execute(
             """
-            INSERT INTO users (full_name, email, password_hash, role, is_approved)
-            VALUES (?, ?, ?, ?, 1)
-            """,
-            ("System Admin", "admin@petclinic.local", admin_password, "admin"),
-        )
+            SELECT id, kind, attempts, last_error FROM jobs
+            WHERE status = 'failed' AND finished_at IS NOT NULL
+            ORDER BY finished_at DESC
+            LIMIT 10
+            """
+        ):
+            click.echo("failed job %d (%s, %d attempts): %s" % tuple(row))
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
 
+@jobs_cli.command("retry")
+@click.argument("job_ids", type=int, nargs=-1)
+def jobs_retry_command(job_ids):
+    """Queue failed jobs again (all of them without JOB_IDS)."""
+    conn = _connect()
+    try:
+        sql = """
+            UPDATE jobs
+            SET status = 'queued', attempts = 0, run_at = ?, finished_at = NULL
+            WHERE status = 'failed'
+        """
+        params = [time.time()]
+        if job_ids:
+            sql += " AND id IN (%s)" % ", ".join("?" * len(job_ids))
+            params += job_ids
+        count = conn.execute(sql, params).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo("%d jobs queued again" % count)
+
+
+@jobs_cli.command("purge")
+@click.option("--days", type=int, default=None, help="Default: JOBS_KEEP_DAYS.")
+def jobs_purge_command(days):
+    """Delete done and failed jobs finished more than --days ago."""
+    days = app.config["JOBS_KEEP_DAYS"] if days is None else days
+    conn = _connect()
+    try:
+        count = conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - days * 86400,),
+        ).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo("%d jobs deleted" % count)
+
+
+app.cli.add_command(jobs_cli)
+
+
+# Tâches de l'application
+
+notifications_log = logging.getLogger("pet_clinic.notifications")
+
+
+def send_notification(email, subject, body):
+    """Deliver a message to a user.
+
+    No mail transport is configured yet: messages go to the
+    pet_clinic.notifications logger, where a handler can forward them.
+    """
+    notifications_log.info("To: %s\nSubject: %s\n\n%s", email, subject, body)
+
+
+def appointment_start(appointment_date, appointment_time):
+    return dt.datetime.combine(
+        dt.date.fromisoformat(appointment_date), dt.time.fromisoformat(appointment_time)
+    )
+
+
+def enqueue_reminder(conn, appointment_id, appointment_date, appointment_time):
+    """Reminder REMINDER_LEAD_HOURS before the appointment; replaces the one
+    of the previous slot when the appointment moves."""
+    run_at = appointment_start(appointment_date, appointment_time) - dt.timedelta(
+        hours=app.config["REMINDER_LEAD_HOURS"]
+    )
+    return enqueue(
+        conn,
+        "appointment_reminder",
+        {"appointment_id": appointment_id, "date": appointment_date, "time": appointment_time},
+        run_at=run_at.timestamp(),
+        dedupe_key="appointment_reminder:%d" % appointment_id,
+    )
+
+
+@job_handler("appointment_reminder")
+def appointment_reminder_job(conn, payload):
+    appt = conn.execute(
+        """
+        SELECT a.appointment_date, a.appointment_time, a.status, a.reason,
+               COALESCE(p.name, a.pet_name) AS pet_name, u.email, u.full_name
+        FROM appointments a
+        JOIN users u ON a.owner_id = u.id
+        LEFT JOIN pets p ON p.id = a.pet_id
+        WHERE a.id = ?
+        """,
+        (payload["appointment_id"],),
+    ).fetchone()
+    # Annulé, déplacé (le nouveau créneau a son rappel) ou déjà passé
+    if (
+        appt is None
+        or appt["status"] == "cancelled"
+        or (appt["appointment_date"], appt["appointment_time"]) != (payload["date"], payload["time"])
+        or appointment_start(payload["date"], payload["time"]) < dt.datetime.now()
+    ):
+        return
+    send_notification(
+        appt["email"],
+        "Appointment reminder: %s on %s at %s" % (appt["pet_name"], payload["date"], payload["time"]),
+        "Hello %s,\n\n%s is expected at the clinic on %s at %s%s.\n" % (
+            appt["full_name"], appt["pet_name"], payload["date"], payload["time"],
+            " (%s)" % appt["reason"] if appt["reason"] else "",
+        ),
+    )
+
+
+@job_handler("invoice_issued")
+def invoice_issued_job(conn, payload):
+    invoice = conn.execute(
+        """
+        SELECT i.total_amount, i.status, a.appointment_date,
+               COALESCE(p.name, a.pet_name) AS pet_name, u.email, u.full_name
+        FROM invoices i
+        JOIN users u ON i.owner_id = u.id
+        LEFT JOIN appointments a ON a.id = i.appointment_id
+        LEFT JOIN pets p ON p.id = a.pet_id
+        WHERE i.id = ?
+        """,
+        (payload["invoice_id"],),
+    ).fetchone()
+    if invoice is None or invoice["status"] == "cancelled":
+        return
+    send_notification(
+        invoice["email"],
+        "Invoice for %s: $ %.2f" % (invoice["pet_name"] or "your visit", invoice["total_amount"]),
+        "Hello %s,\n\nAn invoice of $ %.2f (%s) was issued for the visit of %s.\n" % (
+            invoice["full_name"], invoice["total_amount"], invoice["status"],
+            invoice["appointment_date"] or "-",
+        ),
+    )
+
+
+@job_handler("rebuild_rollups")
+def rebuild_rollups_job(conn, payload):
+    rebuild_rollups(conn)
 
 
 # ---------- PUBLIC ROUTES ----------
@@ -212,11 +2681,10 @@ def register():
 
         # Email already used?
         if not errors.get("email") and email:
-            conn = get_db_connection()
+            conn = get_db()
             existing = conn.execute(
                 "SELECT id FROM users WHERE email = ?", (email,)
             ).fetchone()
-            conn.close()
             if existing:
                 errors["email"] = "An account with this email already exists."
 
@@ -231,19 +2699,26 @@ def register():
             )
 
         # Data OK insert user
-        password_hash = generate_password_hash(password)
+        release_db(None)
+        try:
+            password_hash = get_hasher().hash(password)
+        except HasherBusy:
+            return render_template(
+                "register.html",
+                errors={},
+                error_message="The server is busy, please try again in a moment.",
+                success_message=None,
+            ), 503
         is_approved = 1 if user_role == "pet_owner" else 0
 
-        conn = get_db_connection()
-        conn.execute(
+        db_execute(
             """
             INSERT INTO users (full_name, email, password_hash, role, is_approved)
             VALUES (?, ?, ?, ?, ?)
             """,
             (full_name, email, password_hash, user_role, is_approved),
         )
-        conn.commit()
-        conn.close()
+        dashboard_cache.invalidate("admin")
 
         # After registration, redirect to login
         return redirect(url_for("login"))
@@ -286,11 +2761,10 @@ def login():
                 success_message=None,
             )
 
-        conn = get_db_connection()
+        conn = get_db()
         user = conn.execute(
             "SELECT * FROM users WHERE email = ?", (email,)
         ).fetchone()
-        conn.close()
 
         if not user:
             error_message = "Invalid email or password."
@@ -309,9 +2783,22 @@ def login():
                 errors=errors,
                 error_message=error_message,
                 success_message=None,
-            )
+            )
+
+        # Ne pas garder une connexion du pool pendant le hachage
+        release_db(None)
+        hasher = get_hasher()
+        try:
+            password_ok = hasher.check(user["password_hash"], password)
+        except HasherBusy:
+            return render_template(
+                "login.html",
+                errors={},
+                error_message="The server is busy, please try again in a moment.",
+                success_message=None,
+            ), 503
 
-        if not check_password_hash(user["password_hash"], password):
+        if not password_ok:
             error_message = "Invalid email or password."
             errors["password"] = "Incorrect password."
             return render_template(
@@ -321,6 +2808,16 @@ def login():
                 success_message=None,
             )
 
+        # Hash fait avec d'anciens paramètres : on le remplace tant qu'on a le mot de passe
+        if needs_rehash(user["password_hash"]):
+            try:
+                db_execute(
+                    "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                    (hasher.hash(password, kind="rehashes"), user["id"], user["password_hash"]),
+                )
+            except HasherBusy:
+                pass  # ce sera pour la prochaine connexion
+
         if user["role"] == "clinic_staff" and not user["is_approved"]:
             error_message = "Your account is pending approval by an admin."
             return render_template(
@@ -354,23 +2851,18 @@ def login():
 
 # ---------- DASHBOARD ADMIN ----------
 
-@app.route("/dashboard")
-def dashboard():
-    if "user_id" not in session:
-        return redirect(url_for("login"))
-    if session.get("user_role") != "admin":
-        abort(403)
-
-    conn = get_db_connection()
-    total_pet_owners = conn.execute(
-        "SELECT COUNT(*) AS c FROM users WHERE role='pet_owner'"
-    ).fetchone()["c"]
-    approved_staff = conn.execute(
-        "SELECT COUNT(*) AS c FROM users WHERE role='clinic_staff' AND is_approved=1"
-    ).fetchone()["c"]
-    pending_staff_count = conn.execute(
-        "SELECT COUNT(*) AS c FROM users WHERE role='clinic_staff' AND is_approved=0"
-    ).fetchone()["c"]
+def load_dashboard_stats():
+    """Admin counters: one pass over users + the monthly revenue rollup."""
+    conn = get_db()
+    counts = conn.execute(
+        """
+        SELECT
+            COALESCE(SUM(role='pet_owner'), 0) AS total_pet_owners,
+            COALESCE(SUM(role='clinic_staff' AND is_approved=1), 0) AS approved_staff,
+            COALESCE(SUM(role='clinic_staff' AND is_approved=0), 0) AS pending_staff_count
+        FROM users
+        """
+    ).fetchone()
     pending_staff = conn.execute(
         """
         SELECT id, full_name, email, created_at
@@ -379,19 +2871,42 @@ def dashboard():
         ORDER BY created_at DESC
         """
     ).fetchall()
-    conn.close()
+    # Factures du mois (hors annulées), lues dans le cumul maintenu par triggers
+    monthly_revenue = conn.execute(
+        """
+        SELECT COALESCE(SUM(total_amount), 0)
+        FROM invoice_revenue_monthly
+        WHERE month = strftime('%Y-%m', 'now') AND status != 'cancelled'
+        """
+    ).fetchone()[0]
+
+    return {
+        "total_pet_owners": counts["total_pet_owners"],
+        "approved_staff": counts["approved_staff"],
+        "pending_staff_count": counts["pending_staff_count"],
+        "pending_staff": [dict(row) for row in pending_staff],
+        "monthly_revenue": round(monthly_revenue, 2),
+    }
+
+
+@app.route("/dashboard")
+def dashboard():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "admin":
+        abort(403)
 
-    monthly_revenue = 0  # Placeholder for future feature
+    stats = dashboard_cache.get_or_load("admin", load_dashboard_stats)
 
     return render_template(
         "admin-dashboard.html",
         user_name=session.get("user_name"),
         user_role=session.get("user_role"),
-        total_pet_owners=total_pet_owners,
-        approved_staff=approved_staff,
-        pending_staff_count=pending_staff_count,
-        pending_staff=pending_staff,
-        monthly_revenue=monthly_revenue,
+        total_pet_owners=stats["total_pet_owners"],
+        approved_staff=stats["approved_staff"],
+        pending_staff_count=stats["pending_staff_count"],
+        pending_staff=stats["pending_staff"],
+        monthly_revenue=stats["monthly_revenue"],
     )
 
 
@@ -401,12 +2916,12 @@ def dashboard():
 def approve_staff(user_id):
     if "user_id" not in session or session.get("user_role") != "admin":
         abort(403)
-    conn = get_db_connection()
-    conn.execute(
+    db_execute(
         "UPDATE users SET is_approved=1 WHERE id=? AND role='clinic_staff'", (user_id,)
     )
-    conn.commit()
-    conn.close()
+    dashboard_cache.invalidate("admin")
+    user_cache.invalidate(user_id)
+    schedule_cache.invalidate("capacity")
     return redirect(url_for("dashboard"))
 
 
@@ -414,35 +2929,28 @@ def approve_staff(user_id):
 def reject_staff(user_id):
     if "user_id" not in session or session.get("user_role") != "admin":
         abort(403)
-    conn = get_db_connection()
-    conn.execute("DELETE FROM users WHERE id=? AND role='clinic_staff'", (user_id,))
-    conn.commit()
-    conn.close()
+    db_execute("DELETE FROM users WHERE id=? AND role='clinic_staff'", (user_id,))
+    dashboard_cache.invalidate("admin")
+    user_cache.invalidate(user_id)
+    end_user_sessions(user_id)
+    schedule_cache.invalidate("capacity")
     return redirect(url_for("dashboard"))
 
 
 # ---------- DASHBOARD PET OWNER ----------
 
-@app.route("/dashboard/pet-owner")
-def pet_owner_dashboard():
-    if "user_id" not in session:
-        return redirect(url_for("login"))
-    if session.get("user_role") != "pet_owner":
-        abort(403)
-
-    today = dt.date.today().isoformat()
-
-    conn = get_db_connection()
+def load_pet_owner_dashboard(conn, owner_id, today):
+    """Template data for pet_owner_dashboard (shared with the ASGI variant)."""
     rows = conn.execute(
         """
-        SELECT pet_name, appointment_date, appointment_time, reason, status
+        SELECT id, pet_id, appointment_date, appointment_time, reason, status
         FROM appointments
         WHERE owner_id = ?
         ORDER BY appointment_date, appointment_time
         """,
-        (session["user_id"],),
+        (owner_id,),
     ).fetchall()
-    conn.close()
+    pet_names = appointment_pet_names(conn, rows)
 
     upcoming_appointments = []
     past_appointments = []
@@ -461,7 +2969,7 @@ def pet_owner_dashboard():
             badge_class = "badge-pending"
 
         appt_dict = {
-            "pet_name": row["pet_name"],
+            "pet_name": pet_names[row["id"]],
             "appointment_date": row["appointment_date"],
             "appointment_time": row["appointment_time"],
             "reason": row["reason"],
@@ -476,23 +2984,40 @@ def pet_owner_dashboard():
         else:
             past_appointments.append(appt_dict)
 
-    return render_template(
-        "pet-owner-dashboard.html",
-        user_name=session.get("user_name"),
-        upcoming_appointments=upcoming_appointments,
-        past_appointments=past_appointments,
-        today_str=today,
+    return {
+        "upcoming_appointments": upcoming_appointments,
+        "past_appointments": past_appointments,
+    }
+
+
+def pet_owner_appointments(conn, owner_id, today):
+    """Upcoming / past tables of the owner dashboard, from the fragment cache."""
+    return cached_fragment(
+        "pet-owner-appointments.html", "owner", owner_id,
+        lambda: dict(load_pet_owner_dashboard(conn, owner_id, today), today_str=today),
+        today,
+        version=change_stamp(conn, "owner_appointments", owner_id)[0],
     )
 
-# ---------- MY PETS ----------
-@app.route("/owner/pets")
-def my_pets():
+
+@app.route("/dashboard/pet-owner")
+def pet_owner_dashboard():
     if "user_id" not in session:
         return redirect(url_for("login"))
     if session.get("user_role") != "pet_owner":
         abort(403)
 
-    conn = get_db_connection()
+    today = dt.date.today().isoformat()
+
+    return render_template(
+        "pet-owner-dashboard.html",
+        user_name=session.get("user_name"),
+        today_str=today,
+        appointments=pet_owner_appointments(get_db(), session["user_id"], today),
+    )
+
+# ---------- MY PETS ----------
+def load_my_pets(conn, owner_id):
     pets = conn.execute(
         """
         SELECT id, name, species, breed, age, sex, notes, created_at
@@ -500,14 +3025,27 @@ def my_pets():
         WHERE owner_id = ?
         ORDER BY created_at DESC
         """,
-        (session["user_id"],),
+        (owner_id,),
     ).fetchall()
-    conn.close()
+    return {"pets": pets}
+
+
+@app.route("/owner/pets")
+def my_pets():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "pet_owner":
+        abort(403)
+
+    conn = get_db()
+    not_modified = check_conditional(conn, "owner_pets", session["user_id"])
+    if not_modified is not None:
+        return not_modified
 
     return render_template(
         "my-pets.html",
         user_name=session.get("user_name"),
-        pets=pets,
+        **load_my_pets(conn, session["user_id"]),
     )
 
 # ---------- ADD PET ----------
@@ -573,16 +3111,14 @@ def add_pet():
             )
 
         # Insert
-        conn = get_db_connection()
-        conn.execute(
+        pet_id, _ = db_execute(
             """
             INSERT INTO pets (owner_id, name, species, breed, age, sex, notes)
             VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
             (session["user_id"], name, species, breed, age, sex, notes),
         )
-        conn.commit()
-        conn.close()
+        pet_cache.invalidate(pet_id)
 
         return redirect(url_for("my_pets"))
 
@@ -606,7 +3142,7 @@ def edit_pet(pet_id):
     if session.get("user_role") != "pet_owner":
         abort(403)
 
-    conn = get_db_connection()
+    conn = get_db()
     pet = conn.execute(
         """
         SELECT id, owner_id, name, species, breed, age, sex, notes
@@ -615,7 +3151,6 @@ def edit_pet(pet_id):
         """,
         (pet_id,),
     ).fetchone()
-    conn.close()
 
     if not pet or pet["owner_id"] != session["user_id"]:
         abort(404)
@@ -677,8 +3212,7 @@ def edit_pet(pet_id):
             )
 
         # Update
-        conn = get_db_connection()
-        conn.execute(
+        db_execute(
             """
             UPDATE pets
             SET name = ?, species = ?, breed = ?, age = ?, sex = ?, notes = ?
@@ -686,8 +3220,7 @@ def edit_pet(pet_id):
             """,
             (name, species, breed, age, sex, notes, pet_id, session["user_id"]),
         )
-        conn.commit()
-        conn.close()
+        pet_cache.invalidate(pet_id)
 
         return redirect(url_for("my_pets"))
 
@@ -712,74 +3245,262 @@ def delete_pet(pet_id):
     if session.get("user_role") != "pet_owner":
         abort(403)
 
-    conn = get_db_connection()
-    conn.execute(
-        "DELETE FROM pets WHERE id = ? AND owner_id = ?",
-        (pet_id, session["user_id"]),
-    )
-    conn.commit()
-    conn.close()
+    owner_id = session["user_id"]
+
+    def work(conn):
+        # Les rendez-vous gardent le dernier nom de l'animal, sans lien
+        conn.execute(
+            """
+            UPDATE appointments
+            SET pet_name = (SELECT name FROM pets WHERE id = ?), pet_id = NULL
+            WHERE pet_id = ? AND owner_id = ?
+              AND EXISTS (SELECT 1 FROM pets WHERE id = ? AND owner_id = ?)
+            """,
+            (pet_id, pet_id, owner_id, pet_id, owner_id),
+        )
+        return conn.execute(
+            "DELETE FROM pets WHERE id = ? AND owner_id = ?", (pet_id, owner_id)
+        ).rowcount
+
+    if db_write(work):
+        pet_cache.invalidate(pet_id)
 
     return redirect(url_for("my_pets"))
 
 # ---------- DASHBOARD STAFF ----------
 
-@app.route("/dashboard/staff")
-def staff_dashboard():
-    if "user_id" not in session:
-        return redirect(url_for("login"))
-    if session.get("user_role") != "clinic_staff":
-        abort(403)
+def staff_appointment(row, pet_name):
+    """One row of the staff tables (dashboard and schedule)."""
+    status = row["status"]
+    if status == "pending":
+        badge_class = "badge-pending"
+    elif status == "confirmed":
+        badge_class = "badge-confirmed"
+    elif status == "rescheduled":
+        badge_class = "badge-rescheduled"
+    else:
+        badge_class = "badge-pending"
+    return {
+        "id": row["id"],
+        "pet_id": row["pet_id"],
+        "pet_name": pet_name,
+        "owner_name": row["owner_name"],
+        "appointment_date": row["appointment_date"],
+        "appointment_time": row["appointment_time"],
+        "reason": row["reason"],
+        "status": status,
+        "badge_class": badge_class,
+        "status_label": status.capitalize(),
+    }
+
+
+def iso_days(first, last):
+    """ISO dates from first to last, both included (no step past date.max)."""
+    start = dt.date.fromisoformat(first)
+    count = (dt.date.fromisoformat(last) - start).days + 1
+    return [(start + dt.timedelta(days=n)).isoformat() for n in range(count)]
 
-    today = dt.date.today().isoformat()
 
-    conn = get_db_connection()
+def load_staff_days(conn, first, last):
+    """(day, appointments) for each day from first to last (ISO dates), in order,
+    days without appointments included.
+
+    One range scan of idx_appointments_date_time, grouped as the cursor
+    advances: a day is yielded before the next one is read.
+    """
     rows = conn.execute(
         """
-        SELECT a.id, a.pet_name, a.appointment_date, a.appointment_time,
+        SELECT a.id, a.pet_id, a.appointment_date, a.appointment_time,
                a.reason, a.status, u.full_name AS owner_name
         FROM appointments a
         JOIN users u ON a.owner_id = u.id
-        WHERE a.appointment_date = ?
-        ORDER BY a.appointment_time
+        WHERE a.appointment_date BETWEEN ? AND ?
+        ORDER BY a.appointment_date, a.appointment_time
         """,
-        (today,),
-    ).fetchall()
-    conn.close()
-
-    today_appointments = []
-    for row in rows:
-        status = row["status"]
-        if status == "pending":
-            badge_class = "badge-pending"
-        elif status == "confirmed":
-            badge_class = "badge-confirmed"
-        elif status == "rescheduled":
-            badge_class = "badge-rescheduled"
-        else:
-            badge_class = "badge-pending"
-        today_appointments.append(
-            {
-                "id": row["id"],
-                "pet_name": row["pet_name"],
-                "owner_name": row["owner_name"],
-                "appointment_date": row["appointment_date"],
-                "appointment_time": row["appointment_time"],
-                "reason": row["reason"],
-                "status": status,
-                "badge_class": badge_class,
-                "status_label": status.capitalize(),
-            }
+        (first, last),
+    )
+    days = iter(iso_days(first, last))
+    for date_str, group in itertools.groupby(rows, key=lambda row: row["appointment_date"]):
+        for day in days:
+            if day == date_str:
+                break
+            yield day, []
+        group = list(group)
+        pet_names = appointment_pet_names(conn, group)
+        yield date_str, [staff_appointment(row, pet_names[row["id"]]) for row in group]
+    for day in days:
+        yield day, []
+
+
+def load_staff_dashboard(conn, today):
+    """Template data for staff_dashboard (shared with the ASGI variant)."""
+    (_, today_appointments), = load_staff_days(conn, today, today)
+    return {"today_appointments": today_appointments}
+
+
+def staff_schedule(conn, first, last, today):
+    """(day, table rows) for each day from first to last, from the fragment cache.
+
+    The range scan starts at the first day missing from the cache and feeds
+    the later misses too; days already cached are not queried.
+    """
+    pending = None
+    versions = staff_day_versions(conn, first, last)
+    for day_str in iso_days(first, last):
+
+        def load():
+            nonlocal pending
+            if pending is None:
+                pending = load_staff_days(conn, day_str, last)
+            for loaded_day, appointments in pending:
+                if loaded_day == day_str:
+                    return {"today_appointments": appointments, "day_str": day_str, "today_str": today}
+
+        yield day_str, cached_fragment(
+            "staff-appointments.html", "day", day_str, load, today,
+            version=versions.get(day_stamp_id(day_str), 0),
         )
 
+
+def staff_appointments(conn, today):
+    """Rows of the staff dashboard table, from the fragment cache."""
+    (_, rows), = staff_schedule(conn, today, today, today)
+    return rows
+
+
+def batch_status_message():
+    """Outcome of batch_appointment_status, passed back in the redirect URL."""
+    updated = request.args.get("updated", type=int)
+    if updated is None:
+        return None
+    message = "%d appointment(s) updated." % updated
+    conflicts = request.args.get("conflicts", 0, type=int)
+    if conflicts:
+        message += " %d skipped: their time slot is fully booked." % conflicts
+    return message
+
+
+@app.route("/dashboard/staff")
+def staff_dashboard():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "clinic_staff":
+        abort(403)
+
+    today = dt.date.today().isoformat()
+
     return render_template(
         "staff-dashboard.html",
         user_name=session.get("user_name"),
-        today_appointments=today_appointments,
         today_str=today,
+        batch_message=batch_status_message(),
+        appointments=staff_appointments(get_db(), today),
+    )
+
+
+# ---------- STAFF SCHEDULE ----------
+# Planning sur plusieurs jours (/staff/schedule?from=&to=) : un seul parcours
+# de l'index (appointment_date, appointment_time) sur la plage, regroupé par
+# jour au fil du curseur (load_staff_days). La page est envoyée en flux, jour
+# par jour ; chaque jour rendu est le fragment du dashboard staff, invalidé
+# par sa version "staff_day" dans change_stamps (triggers de 0016).
+
+app.config["SCHEDULE_DAYS"] = 7         # fenêtre par défaut
+app.config["SCHEDULE_MAX_DAYS"] = 31
+
+SCHEDULE_API_FIELDS = (
+    "id", "appointment_time", "pet_id", "pet_name", "owner_name", "reason", "status",
+)
+
+
+def read_schedule_range():
+    """(first, last) dates from ?from=&to=, both included; ValueError if invalid."""
+    first = dt.date.fromisoformat(request.args.get("from") or dt.date.today().isoformat())
+    if request.args.get("to"):
+        last = dt.date.fromisoformat(request.args["to"])
+    else:
+        # Fenêtre par défaut, coupée au dernier jour représentable
+        last = first + min(
+            dt.timedelta(days=app.config["SCHEDULE_DAYS"] - 1), dt.date.max - first
+        )
+    if last < first:
+        raise ValueError("to is before from")
+    if (last - first).days >= app.config["SCHEDULE_MAX_DAYS"]:
+        raise ValueError("at most %d days" % app.config["SCHEDULE_MAX_DAYS"])
+    return first, last
+
+
+def shifted_range(first, last, direction):
+    """Adjacent window of the same length (ISO dates), None past date.min / date.max."""
+    span = (last - first + dt.timedelta(days=1)) * direction
+    try:
+        return (first + span).isoformat(), (last + span).isoformat()
+    except OverflowError:
+        return None
+
+
+@app.template_filter("weekday")
+def weekday(value):
+    return dt.date.fromisoformat(value).strftime("%A")
+
+
+@app.route("/staff/schedule")
+def staff_schedule_view():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "clinic_staff":
+        abort(403)
+
+    try:
+        first, last = read_schedule_range()
+    except ValueError:
+        abort(400)
+    today = dt.date.today().isoformat()
+
+    # Les jours sont rendus pendant l'envoi : le début du planning part
+    # avant que la fin de la plage soit lue.
+    return stream_template(
+        "staff-schedule.html",
+        user_name=session.get("user_name"),
+        today_str=today,
+        first=first.isoformat(),
+        last=last.isoformat(),
+        previous=shifted_range(first, last, -1),
+        following=shifted_range(first, last, 1),
+        batch_message=batch_status_message(),
+        days=staff_schedule(get_db(), first.isoformat(), last.isoformat(), today),
     )
 
 
+@app.route("/api/staff/schedule")
+def api_staff_schedule():
+    """?from=&to= -> {"from", "to", "days": [{"date", "appointments"}]}, sent day by day."""
+    if "user_id" not in session:
+        return jsonify({"error": "authentication required"}), 401
+    if session.get("user_role") != "clinic_staff":
+        return jsonify({"error": "staff only"}), 403
+
+    try:
+        first, last = read_schedule_range()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    conn = get_db()
+
+    def generate():
+        yield '{"from": "%s", "to": "%s", "days": [' % (first.isoformat(), last.isoformat())
+        days = load_staff_days(conn, first.isoformat(), last.isoformat())
+        for n, (day, appointments) in enumerate(days):
+            yield ("," if n else "") + json.dumps({
+                "date": day,
+                "appointments": [
+                    {key: appt[key] for key in SCHEDULE_API_FIELDS} for appt in appointments
+                ],
+            })
+        yield "]}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
 # ---------- CREATE MEDICAL RECORD ----------
 @app.route("/staff/appointments/<int:appointment_id>/record", methods=["GET", "POST"])
 def create_medical_record(appointment_id):
@@ -788,19 +3509,19 @@ def create_medical_record(appointment_id):
 
     today = dt.date.today().isoformat()
 
-    conn = get_db_connection()
+    conn = get_db()
     appt = conn.execute(
         """
-        SELECT a.id, a.owner_id, a.pet_id, a.pet_name, a.appointment_date,
-               a.appointment_time, a.reason, a.status,
+        SELECT a.id, a.owner_id, a.pet_id, COALESCE(p.name, a.pet_name) AS pet_name,
+               a.appointment_date, a.appointment_time, a.reason, a.status,
                u.full_name AS owner_name
         FROM appointments a
         JOIN users u ON a.owner_id = u.id
+        LEFT JOIN pets p ON p.id = a.pet_id
         WHERE a.id = ?
         """,
         (appointment_id,),
     ).fetchone()
-    conn.close()
 
     if not appt:
         abort(404)
@@ -868,33 +3589,35 @@ def create_medical_record(appointment_id):
             )
 
         # Insert medical record
-        conn = get_db_connection()
-        conn.execute(
-            """
-            INSERT INTO medical_records (
-                pet_id, appointment_id, staff_id,
-                weight, temperature, diagnosis, notes
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                appt["pet_id"],
-                appt["id"],
-                session["user_id"],
-                weight,
-                temperature,
-                diagnosis,
-                notes,
-            ),
-        )
-        # Option : marquer le rendez-vous comme confirmé si ce n'est pas déjà le cas
-        if appt["status"] == "pending":
+        staff_id = session["user_id"]
+
+        def write(conn):
             conn.execute(
-                "UPDATE appointments SET status = 'confirmed' WHERE id = ?",
-                (appt["id"],),
+                """
+                INSERT INTO medical_records (
+                    pet_id, appointment_id, staff_id,
+                    weight, temperature, diagnosis, notes
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    appt["pet_id"],
+                    appt["id"],
+                    staff_id,
+                    weight,
+                    temperature,
+                    diagnosis,
+                    notes,
+                ),
             )
-        conn.commit()
-        conn.close()
+            # Option : marquer le rendez-vous comme confirmé si ce n'est pas déjà le cas
+            if appt["status"] == "pending":
+                conn.execute(
+                    "UPDATE appointments SET status = 'confirmed' WHERE id = ?",
+                    (appt["id"],),
+                )
+
+        db_write(write)
 
         return redirect(url_for("staff_dashboard"))
 
@@ -919,41 +3642,58 @@ def pet_medical_history(pet_id):
     if session.get("user_role") != "pet_owner":
         abort(403)
 
-    conn = get_db_connection()
+    conn = get_db()
     pet = conn.execute(
         """
-        SELECT id, owner_id, name, species, breed, age, sex, notes
-        FROM pets
-        WHERE id = ?
+        SELECT p.id, p.owner_id, p.name, p.species, p.breed, p.age, p.sex, p.notes,
+               cs.version, cs.modified_at
+        FROM pets p
+        LEFT JOIN change_stamps cs ON cs.scope = 'pet' AND cs.entity_id = p.id
+        WHERE p.id = ?
         """,
         (pet_id,),
     ).fetchone()
 
     if not pet or pet["owner_id"] != session["user_id"]:
-        conn.close()
         abort(404)
 
-    records = conn.execute(
-        """
-        SELECT mr.id,
-               mr.weight, mr.temperature, mr.diagnosis, mr.notes, mr.created_at,
-               a.appointment_date, a.appointment_time,
-               s.full_name AS staff_name
-        FROM medical_records mr
-        LEFT JOIN appointments a ON mr.appointment_id = a.id
-        JOIN users s ON mr.staff_id = s.id
-        WHERE mr.pet_id = ?
-        ORDER BY mr.created_at DESC
-        """,
-        (pet_id,),
-    ).fetchall()
-    conn.close()
+    not_modified = check_conditional(
+        conn, "pet", pet_id, stamp=(pet["version"], pet["modified_at"])
+    )
+    if not_modified is not None:
+        return not_modified
+
+    size, after, before = read_page_args()
+
+    def load():
+        page = keyset_page(
+            conn,
+            """
+            SELECT mr.id,
+                   mr.weight, mr.temperature, mr.diagnosis, mr.notes, mr.created_at,
+                   a.appointment_date, a.appointment_time,
+                   s.full_name AS staff_name
+            FROM medical_records mr
+            LEFT JOIN appointments a ON mr.appointment_id = a.id
+            JOIN users s ON mr.staff_id = s.id
+            WHERE mr.pet_id = ?
+            """,
+            (pet_id,),
+            "mr.created_at", "mr.id", size, after, before,
+        )
+        return {"records": page["rows"], "page": page}
+
+    # Lignes historiques : même version que l'ETag ci-dessus
+    records_table = cached_fragment(
+        "pet-medical-history-table.html", "pet", pet_id, load, request.query_string,
+        version=(pet["version"], pet["modified_at"]),
+    )
 
     return render_template(
         "pet-medical-history.html",
         user_name=session.get("user_name"),
         pet=pet,
-        records=records,
+        records_table=records_table,
     )
 
 
@@ -970,7 +3710,7 @@ def book_appointment():
     today_str = today.isoformat()
 
     # Get user pets
-    conn = get_db_connection()
+    conn = get_db()
     pets = conn.execute(
         """
         SELECT id, name, species, breed
@@ -980,7 +3720,6 @@ def book_appointment():
         """,
         (session["user_id"],),
     ).fetchall()
-    conn.close()
 
     errors = {}
     error_message = None
@@ -1044,6 +3783,18 @@ def book_appointment():
         # Validation time
         if not appointment_time:
             errors["appointment_time"] = "Time is required."
+        elif not errors.get("appointment_date"):
+            slot_error = validate_slot(date_obj, appointment_time)
+            if slot_error:
+                errors["appointment_time"] = slot_error
+            else:
+                # Forme canonique (YYYY-MM-DD, HH:MM) pour l'index, le SQL et la ligne stockée
+                appointment_date = date_obj.isoformat()
+                appointment_time = minutes_to_time(time_to_minutes(appointment_time))
+                if schedule_index.booked(
+                    appointment_date, time_to_minutes(appointment_time)
+                ) >= slot_capacity():
+                    errors["appointment_time"] = "This time slot is fully booked."
 
         if errors:
             error_message = "Please correct the errors below."
@@ -1059,7 +3810,7 @@ def book_appointment():
             )
 
         # Verify pet belongs to owner
-        conn = get_db_connection()
+        conn = get_db()
         pet = conn.execute(
             """
             SELECT id, name
@@ -1070,7 +3821,6 @@ def book_appointment():
         ).fetchone()
 
         if not pet:
-            conn.close()
             errors["pet_id"] = "Please select a valid pet."
             error_message = "Please correct the errors below."
             return render_template(
@@ -1084,26 +3834,46 @@ def book_appointment():
                 pets=pets,
             )
 
-        # Insert appointment
-        conn.execute(
-            """
-            INSERT INTO appointments (
-                owner_id, pet_id, pet_name,
-                appointment_date, appointment_time, reason, status
-            )
-            VALUES (?, ?, ?, ?, ?, ?, 'pending')
-            """,
-            (
-                session["user_id"],
-                pet["id"],
-                pet["name"],
-                appointment_date,
-                appointment_time,
-                reason,
-            ),
+        # Insert appointment (si le créneau est toujours libre)
+        values = (
+            session["user_id"],
+            pet["id"],
+            pet["name"],
+            appointment_date,
+            appointment_time,
+            reason,
         )
-        conn.commit()
-        conn.close()
+
+        def insert(conn):
+            appointment_id = conn.execute(
+                """
+                INSERT INTO appointments (
+                    owner_id, pet_id, pet_name,
+                    appointment_date, appointment_time, reason, status
+                )
+                VALUES (?, ?, ?, ?, ?, ?, 'pending')
+                """,
+                values,
+            ).lastrowid
+            enqueue_reminder(conn, appointment_id, appointment_date, appointment_time)
+            return appointment_id
+
+        try:
+            claim_slot(insert, appointment_date, appointment_time, slot_capacity())
+        except SlotUnavailable as exc:
+            schedule_index.invalidate(appointment_date)
+            errors["appointment_time"] = str(exc)
+            return render_template(
+                "book-appointment.html",
+                errors=errors,
+                error_message="Please correct the errors below.",
+                success_message=None,
+                form_data=form_data,
+                today_str=today_str,
+                user_name=session.get("user_name"),
+                pets=pets,
+            )
+        schedule_index.apply(appointment_date, appointment_time, +1)
 
         # Redirect to dashboard
         return redirect(url_for("pet_owner_dashboard"))
@@ -1121,6 +3891,229 @@ def book_appointment():
     )
 
 
+# ---------- AVAILABILITY API ----------
+AVAILABILITY_MAX_DAYS = 60
+
+
+@app.route("/api/availability")
+def api_availability():
+    """Free slots for ?date=YYYY-MM-DD&days=N, answered from ScheduleIndex."""
+    if "user_id" not in session:
+        return jsonify({"error": "authentication required"}), 401
+
+    try:
+        start = dt.date.fromisoformat(request.args.get("date") or dt.date.today().isoformat())
+        days = int(request.args.get("days", 1))
+    except ValueError:
+        return jsonify({"error": "invalid date or days"}), 400
+    if not 1 <= days <= AVAILABILITY_MAX_DAYS:
+        return jsonify({"error": "days must be between 1 and %d" % AVAILABILITY_MAX_DAYS}), 400
+
+    capacity = slot_capacity()
+    free = schedule_index.free_slots(start, days, capacity)
+    return jsonify(
+        {
+            "slot_minutes": app.config["SLOT_MINUTES"],
+            "capacity": capacity,
+            "days": [
+                {
+                    "date": day,
+                    "open": bool(day_slots(dt.date.fromisoformat(day))),
+                    "free": slots,
+                }
+                for day, slots in free.items()
+            ],
+        }
+    )
+
+
+# ---------- STAFF SEARCH ----------
+# Recherche plein texte (FTS5, migration 0012) sur les animaux, propriétaires,
+# diagnostics et ordonnances. Chaque mot est cherché comme préfixe :
+# "bel lab" trouve "Bella", "Labrador".
+
+app.config["SEARCH_LIMIT"] = 25             # résultats de /staff/search
+app.config["SEARCH_SUGGEST_LIMIT"] = 8      # suggestions de /api/staff/search
+# Correspondances classées au plus par requête. bm25 coûte ~2 µs par ligne :
+# un préfixe très large ("he" à 1M lignes) ne classe que les plus récentes.
+app.config["SEARCH_CANDIDATES"] = 2000
+
+SEARCH_KINDS = ("pet", "owner", "record", "prescription")   # rowid % 4
+
+
+def search_words(text):
+    """Lower-cased words of the query, accents removed like the tokenizer."""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return re.findall(r"\w+", folded)[:8]
+
+
+def search_match(text):
+    """FTS5 query for free text (every word as a prefix), None if too short."""
+    words = search_words(text)
+    if not words or sum(len(w) for w in words) < 2:
+        return None
+    # Un préfixe d'une lettre n'a pas d'index (prefix '2 3') : FTS5 fusionnerait
+    # tous les termes commençant par "a" ou "1". Ces mots-là sont cherchés tels quels.
+    return " ".join('"%s"*' % w if len(w) > 1 else '"%s"' % w for w in words)
+
+
+def search_excerpt(text, words, width=10):
+    """About `width` words of text around the first match, each matching
+    word between \\x02 and \\x03 (see search_snippet)."""
+    tokens = re.findall(r"\w+|\W+", text)
+    folded = {i: search_words(token) for i, token in enumerate(tokens)}
+    positions = [i for i in range(len(tokens)) if folded[i]]
+    if not positions:
+        return text
+    matched = {i for i in positions if any(folded[i][0].startswith(w) for w in words)}
+    first = min((n for n, i in enumerate(positions) if i in matched), default=0)
+    start = max(0, min(first - width // 2, len(positions) - width))
+    kept = positions[start:start + width]
+    excerpt = "".join(
+        "\x02%s\x03" % tokens[i] if i in matched else tokens[i]
+        for i in range(kept[0], kept[-1] + 1)
+    )
+    return ("…" if start else "") + excerpt + ("…" if kept[-1] != positions[-1] else "")
+
+
+def search(conn, text, limit):
+    """Ranked hits as dicts: kind, id, pet_id, label, detail, snippet (plain text)."""
+    match = search_match(text)
+    if match is None:
+        return []
+    # Classement sur les SEARCH_CANDIDATES correspondances les plus récentes,
+    # puis lecture du texte indexé par rowid, en une requête (sans MATCH : accès direct).
+    hits = conn.execute(
+        """
+        SELECT rowid FROM (
+            SELECT rowid, rank FROM search_index
+            WHERE search_index MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        )
+        ORDER BY rank
+        LIMIT ?
+        """,
+        (match, app.config["SEARCH_CANDIDATES"], limit),
+    ).fetchall()
+    hits = [hit["rowid"] for hit in hits]
+    words = search_words(text)
+    snippets = {}
+    if hits:
+        for row in conn.execute(
+            "SELECT rowid, name, body FROM search_index WHERE rowid IN (%s)" % ", ".join("?" * len(hits)),
+            hits,
+        ):
+            snippets[row["rowid"]] = search_excerpt(" ".join(filter(None, [row["name"], row["body"]])), words)
+
+    ids = {kind: [] for kind in SEARCH_KINDS}
+    for rowid in hits:
+        ids[SEARCH_KINDS[rowid % 4]].append(rowid // 4)
+
+    # Une requête par type pour l'affichage (noms, propriétaire, date)
+    details = {}
+
+    def fetch(kind, sql):
+        if ids[kind]:
+            for row in conn.execute(sql % ", ".join("?" * len(ids[kind])), ids[kind]):
+                details[(kind, row["id"])] = row
+
+    fetch("pet", """
+        SELECT p.id, p.id AS pet_id, p.name, p.species, p.breed, u.full_name AS owner_name
+        FROM pets p JOIN users u ON u.id = p.owner_id
+        WHERE p.id IN (%s)
+    """)
+    fetch("owner", """
+        SELECT u.id, u.full_name, u.email,
+               (SELECT group_concat(name, ', ') FROM pets WHERE owner_id = u.id) AS pet_names
+        FROM users u
+        WHERE u.id IN (%s)
+    """)
+    fetch("record", """
+        SELECT mr.id, mr.pet_id, mr.diagnosis, mr.created_at, p.name AS pet_name,
+               u.full_name AS owner_name
+        FROM medical_records mr
+        JOIN pets p ON p.id = mr.pet_id
+        JOIN users u ON u.id = p.owner_id
+        WHERE mr.id IN (%s)
+    """)
+    fetch("prescription", """
+        SELECT pr.id, pr.pet_id, pr.drug_name, pr.dosage, pr.created_at,
+               p.name AS pet_name, u.full_name AS owner_name
+        FROM prescriptions pr
+        JOIN pets p ON p.id = pr.pet_id
+        JOIN users u ON u.id = p.owner_id
+        WHERE pr.id IN (%s)
+    """)
+
+    results = []
+    for rowid in hits:
+        kind, entity_id = SEARCH_KINDS[rowid % 4], rowid // 4
+        row = details.get((kind, entity_id))
+        if row is None:
+            continue
+        if kind == "pet":
+            label = row["name"]
+            detail = " · ".join(filter(None, [row["species"], row["breed"], "owner: %s" % row["owner_name"]]))
+        elif kind == "owner":
+            label = row["full_name"]
+            detail = " · ".join(filter(None, [row["email"], row["pet_names"]]))
+        elif kind == "record":
+            label = "%s: %s" % (row["pet_name"], row["diagnosis"])
+            detail = "%s · %s" % (row["owner_name"], (row["created_at"] or "")[:10])
+        else:
+            label = "%s %s" % (row["drug_name"], row["dosage"])
+            detail = "%s (%s) · %s" % (row["pet_name"], row["owner_name"], (row["created_at"] or "")[:10])
+        results.append({
+            "kind": kind,
+            "id": entity_id,
+            "pet_id": row["pet_id"] if kind != "owner" else None,
+            "label": label,
+            "detail": detail,
+            "snippet": snippets.get(rowid, ""),
+        })
+    return results
+
+
+@app.template_filter("search_snippet")
+def search_snippet(snippet):
+    """Snippet with the matched words in <mark>, everything else escaped."""
+    return Markup(
+        str(Markup.escape(snippet)).replace("\x02", "<mark>").replace("\x03", "</mark>")
+    )
+
+
+@app.route("/staff/search")
+def staff_search():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "clinic_staff":
+        abort(403)
+
+    q = request.args.get("q", "").strip()
+    return render_template(
+        "staff-search.html",
+        q=q,
+        results=search(get_db(), q, app.config["SEARCH_LIMIT"]) if q else [],
+        user_name=session.get("user_name"),
+    )
+
+
+@app.route("/api/staff/search")
+def api_staff_search():
+    """Typeahead: ?q=... -> best matches as JSON."""
+    if "user_id" not in session:
+        return jsonify({"error": "authentication required"}), 401
+    if session.get("user_role") != "clinic_staff":
+        return jsonify({"error": "staff only"}), 403
+
+    results = search(get_db(), request.args.get("q", ""), app.config["SEARCH_SUGGEST_LIMIT"])
+    for result in results:
+        result["snippet"] = result["snippet"].replace("\x02", "").replace("\x03", "")
+    return jsonify({"results": results})
+
+
 # ---------- ADMIN USERS ----------
 @app.route("/admin/users")
 def admin_users():
@@ -1133,7 +4126,9 @@ def admin_users():
     role_filter = request.args.get("role_filter", "all")
     approval_filter = request.args.get("approval_filter", "all")
 
-    conn = get_db_connection()
+    size, after, before = read_page_args()
+
+    conn = get_db()
 
     query = """
         SELECT id, full_name, email, role, is_approved, created_at
@@ -1153,15 +4148,13 @@ def admin_users():
     elif approval_filter == "pending":
         query += " AND is_approved = 0"
 
-    query += " ORDER BY created_at DESC"
-
-    all_users = conn.execute(query, params).fetchall()
-    conn.close()
+    page = keyset_page(conn, query, params, "created_at", "id", size, after, before)
 
     return render_template(
         "admin-users.html",
         user_name=session.get("user_name"),
-        all_users=all_users,
+        all_users=page["rows"],
+        page=page,
         role_filter=role_filter,
         approval_filter=approval_filter,
     )
@@ -1182,25 +4175,222 @@ def update_user_role(user_id):
         # Invalid role
         return redirect(url_for("admin_users"))
 
-    conn = get_db_connection()
+    conn = get_db()
     user = conn.execute(
         "SELECT id FROM users WHERE id = ?", (user_id,)
     ).fetchone()
 
     if not user:
-        conn.close()
         abort(404)
 
-    conn.execute(
+    db_execute(
         "UPDATE users SET role = ? WHERE id = ?",
         (new_role, user_id),
     )
-    conn.commit()
-    conn.close()
+    dashboard_cache.invalidate("admin")
+    user_cache.invalidate(user_id)
+    schedule_cache.invalidate("capacity")
 
     return redirect(url_for("admin_users"))
 
 
+# ---------- ADMIN REPORTS ----------
+@app.route("/admin/reports")
+def admin_reports():
+    """Revenus et rendez-vous du mois, lus uniquement dans les tables de cumul."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "admin":
+        abort(403)
+
+    month = request.args.get("month", "")
+    try:
+        first_day = dt.date.fromisoformat(month + "-01")
+    except ValueError:
+        first_day = dt.date.today().replace(day=1)
+    month = first_day.strftime("%Y-%m")
+    next_month = (first_day + dt.timedelta(days=32)).replace(day=1)
+    prev_month = (first_day - dt.timedelta(days=1)).replace(day=1)
+
+    conn = get_db()
+    revenue_by_status = conn.execute(
+        """
+        SELECT status, total_amount, invoice_count
+        FROM invoice_revenue_monthly
+        WHERE month = ? AND invoice_count > 0
+        ORDER BY status
+        """,
+        (month,),
+    ).fetchall()
+    daily_revenue = conn.execute(
+        """
+        SELECT day,
+               SUM(CASE WHEN status != 'cancelled' THEN total_amount ELSE 0 END) AS revenue,
+               SUM(CASE WHEN status = 'paid' THEN total_amount ELSE 0 END) AS paid,
+               SUM(invoice_count) AS invoice_count
+        FROM invoice_revenue_daily
+        WHERE day >= ? AND day < ?
+        GROUP BY day
+        HAVING SUM(invoice_count) > 0
+        ORDER BY day
+        """,
+        (first_day.isoformat(), next_month.isoformat()),
+    ).fetchall()
+    appointments_by_status = conn.execute(
+        """
+        SELECT status, SUM(appointment_count) AS appointment_count
+        FROM appointment_counts_daily
+        WHERE day >= ? AND day < ?
+        GROUP BY status
+        HAVING SUM(appointment_count) > 0
+        ORDER BY status
+        """,
+        (first_day.isoformat(), next_month.isoformat()),
+    ).fetchall()
+    revenue_trend = conn.execute(
+        """
+        SELECT month,
+               SUM(CASE WHEN status != 'cancelled' THEN total_amount ELSE 0 END) AS revenue
+        FROM invoice_revenue_monthly
+        WHERE month <= ?
+        GROUP BY month
+        ORDER BY month DESC
+        LIMIT 12
+        """,
+        (month,),
+    ).fetchall()
+
+    return render_template(
+        "admin-reports.html",
+        user_name=session.get("user_name"),
+        month=month,
+        month_end=(next_month - dt.timedelta(days=1)).isoformat(),
+        prev_month=prev_month.strftime("%Y-%m"),
+        next_month=next_month.strftime("%Y-%m"),
+        revenue_by_status=revenue_by_status,
+        daily_revenue=daily_revenue,
+        appointments_by_status=appointments_by_status,
+        revenue_trend=revenue_trend,
+    )
+
+
+# ---------- ADMIN EXPORTS ----------
+# Export comptable en flux : les lignes sont lues par lots sur un curseur et
+# écrites au fil de l'eau, la mémoire reste constante quel que soit le volume.
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORTS = {
+    "invoices": (
+        [
+            "id", "owner_id", "owner_name", "owner_email", "appointment_id",
+            "total_amount", "status", "issued_at", "paid_at", "notes",
+        ],
+        """
+        SELECT inv.id, inv.owner_id, u.full_name AS owner_name, u.email AS owner_email,
+               inv.appointment_id, inv.total_amount, inv.status,
+               inv.issued_at, inv.paid_at, inv.notes
+        FROM invoices inv
+        LEFT JOIN users u ON inv.owner_id = u.id
+        WHERE inv.issued_at >= ? AND inv.issued_at < ?
+        ORDER BY inv.issued_at, inv.id
+        """,
+    ),
+    "appointments": (
+        [
+            "id", "appointment_date", "appointment_time", "owner_id", "owner_name",
+            "pet_id", "pet_name", "reason", "status", "created_at",
+        ],
+        """
+        SELECT a.id, a.appointment_date, a.appointment_time, a.owner_id,
+               u.full_name AS owner_name, a.pet_id, COALESCE(p.name, a.pet_name), a.reason,
+               a.status, a.created_at
+        FROM appointments a
+        LEFT JOIN users u ON a.owner_id = u.id
+        LEFT JOIN pets p ON p.id = a.pet_id
+        WHERE a.appointment_date >= ? AND a.appointment_date < ?
+        ORDER BY a.appointment_date, a.appointment_time, a.id
+        """,
+    ),
+}
+
+
+def _export_chunks(cursor, columns, fmt):
+    """Yield text chunks (CSV or NDJSON), one per batch of rows."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n"
+                for row in rows
+            )
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = en-tête gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.route("/admin/export/<dataset>.<fmt>")
+def admin_export(dataset, fmt):
+    """Stream invoices or appointments as CSV or NDJSON (?from=YYYY-MM-DD&to=YYYY-MM-DD)."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "admin":
+        abort(403)
+    if dataset not in EXPORTS or fmt not in ("csv", "ndjson"):
+        abort(404)
+
+    # Bornes incluses ; `to` est converti en borne exclusive (lendemain),
+    # d'où le plafond à la veille de dt.date.max
+    try:
+        date_from = dt.date.fromisoformat(request.args.get("from") or "0001-01-01")
+        date_to = dt.date.fromisoformat(request.args.get("to") or "9999-12-30")
+    except ValueError:
+        abort(400)
+    date_to = min(date_to, dt.date.max - dt.timedelta(days=1))
+    if date_to < date_from:
+        abort(400)
+
+    columns, sql = EXPORTS[dataset]
+    cursor = get_db().execute(
+        sql, (date_from.isoformat(), (date_to + dt.timedelta(days=1)).isoformat())
+    )
+
+    body = _export_chunks(cursor, columns, fmt)
+    headers = {
+        "Content-Disposition": 'attachment; filename="%s_%s_%s.%s"'
+        % (dataset, date_from.isoformat(), date_to.isoformat(), fmt),
+        "Vary": "Accept-Encoding",
+    }
+    if request.args.get("gzip") != "0" and request.accept_encodings["gzip"]:
+        body = _gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
 # ---------- MODIFY APPOINTMENT STATUS ----------
 @app.route("/staff/appointments/<int:appointment_id>/status", methods=["POST"])
 def update_appointment_status(appointment_id):
@@ -1211,16 +4401,393 @@ def update_appointment_status(appointment_id):
     if new_status not in ("pending", "confirmed", "rescheduled", "cancelled"):
         return redirect(url_for("staff_dashboard"))
 
-    conn = get_db_connection()
-    conn.execute(
-        "UPDATE appointments SET status = ? WHERE id = ?",
-        (new_status, appointment_id),
-    )
-    conn.commit()
-    conn.close()
+    def update(conn):
+        row = conn.execute(
+            """
+            SELECT owner_id, appointment_date, appointment_time, status
+            FROM appointments WHERE id = ?
+            """,
+            (appointment_id,),
+        ).fetchone()
+        conn.execute(
+            "UPDATE appointments SET status = ? WHERE id = ?",
+            (new_status, appointment_id),
+        )
+        return row
+
+    current = get_db().execute(
+        "SELECT appointment_date, appointment_time, status FROM appointments WHERE id = ?",
+        (appointment_id,),
+    ).fetchone()
+    if current is not None and current["status"] == "cancelled" and new_status != "cancelled":
+        # Un rendez-vous annulé qui revient reprend une place : même règle que la réservation
+        try:
+            old = claim_slot(
+                update, current["appointment_date"], current["appointment_time"],
+                slot_capacity(), exclude_id=appointment_id,
+            )
+        except SlotUnavailable:
+            schedule_index.invalidate(current["appointment_date"])
+            return redirect(url_for("staff_dashboard", updated=0, conflicts=1))
+    else:
+        old = db_write(update)
+    if old is not None:
+        # Une annulation libère le créneau (et inversement)
+        was_active = old["status"] != "cancelled"
+        is_active = new_status != "cancelled"
+        if was_active != is_active:
+            schedule_index.apply(
+                old["appointment_date"], old["appointment_time"], 1 if is_active else -1
+            )
 
     return redirect(url_for("staff_dashboard"))
 
+# ---------- BATCH APPOINTMENT STATUS ----------
+# Confirmer / annuler plusieurs rendez-vous cochés sur le dashboard staff :
+# une seule transaction, un seul executemany.
+
+app.config["BATCH_STATUS_MAX"] = 500    # rendez-vous par envoi
+
+
+@app.route("/staff/appointments/status", methods=["POST"])
+def batch_appointment_status():
+    if "user_id" not in session or session.get("user_role") != "clinic_staff":
+        abort(403)
+
+    new_status = request.form.get("status")
+    ids = sorted({
+        int(value) for value in request.form.getlist("appointment_ids") if value.isdigit()
+    })[: app.config["BATCH_STATUS_MAX"]]
+    if new_status not in ("pending", "confirmed", "rescheduled", "cancelled") or not ids:
+        return batch_status_redirect()
+
+    capacity = slot_capacity()
+
+    def update(conn):
+        rows = conn.execute(
+            """
+            SELECT id, owner_id, appointment_date, appointment_time, status
+            FROM appointments
+            WHERE id IN (%s)
+            """ % ", ".join("?" * len(ids)),
+            ids,
+        ).fetchall()
+        conflicts = set()
+        reactivated = [r for r in rows if r["status"] == "cancelled" and new_status != "cancelled"]
+        if reactivated:
+            # Un rendez-vous annulé qui revient reprend une place : même règle que claim_slot
+            days = sorted({r["appointment_date"] for r in reactivated})
+            taken = {}
+            for r in conn.execute(
+                """
+                SELECT appointment_date, appointment_time, COUNT(*) AS c
+                FROM appointments
+                WHERE appointment_date IN (%s) AND status != 'cancelled'
+                GROUP BY appointment_date, appointment_time
+                """ % ", ".join("?" * len(days)),
+                days,
+            ):
+                key = (r["appointment_date"], time_to_minutes(r["appointment_time"]))
+                taken[key] = taken.get(key, 0) + r["c"]
+            for r in reactivated:
+                key = (r["appointment_date"], time_to_minutes(r["appointment_time"]))
+                if taken.get(key, 0) >= capacity:
+                    conflicts.add(r["id"])
+                else:
+                    taken[key] = taken.get(key, 0) + 1
+        changed = [r for r in rows if r["status"] != new_status and r["id"] not in conflicts]
+        conn.executemany(
+            "UPDATE appointments SET status = ? WHERE id = ?",
+            [(new_status, r["id"]) for r in changed],
+        )
+        return changed, len(conflicts)
+
+    changed, conflicts = db_write(update)
+    for row in changed:
+        was_active = row["status"] != "cancelled"
+        is_active = new_status != "cancelled"
+        if was_active != is_active:
+            schedule_index.apply(
+                row["appointment_date"], row["appointment_time"], 1 if is_active else -1
+            )
+
+    return batch_status_redirect(updated=len(changed), conflicts=conflicts)
+
+
+def batch_status_redirect(**outcome):
+    """Back to the page that posted the batch: the schedule (same range) or the dashboard."""
+    if request.form.get("return_to") == "schedule":
+        return redirect(url_for(
+            "staff_schedule_view",
+            **{"from": request.form.get("from"), "to": request.form.get("to")},
+            **outcome,
+        ))
+    return redirect(url_for("staff_dashboard", **outcome))
+
+
+# ---------- APPOINTMENT IMPORT ----------
+# Reprise de données (ancien logiciel) depuis un CSV avec en-tête ou du NDJSON :
+#   owner_email, pet_name, appointment_date, appointment_time, reason, status
+# Les lignes sont validées puis insérées par paquets (un executemany par
+# transaction) ; créneaux pleins, doublons, propriétaires ou animaux inconnus
+# sont rejetés ligne par ligne. `flask appointments import` pour les gros fichiers.
+
+app.config["IMPORT_CHUNK_SIZE"] = 500       # lignes par transaction
+app.config["IMPORT_MAX_ERRORS"] = 100       # erreurs détaillées gardées dans le rapport
+app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # octets par requête (toutes routes) ; au-delà 413, la CLI n'a pas de limite
+
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def read_import_rows(stream, fmt):
+    """Yield (line number, row) from a text stream; row is None if unreadable."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_num, text in enumerate(stream, 1):
+        if text.strip():
+            try:
+                yield line_num, json.loads(text)
+            except ValueError:
+                yield line_num, None
+
+
+def parse_import_row(row):
+    """(values, None) for a well-formed row, (None, error message) otherwise."""
+    if not isinstance(row, dict):
+        return None, "Unreadable row."
+    fields = {
+        key: str(row.get(key) if row.get(key) is not None else "").strip()
+        for key in ("owner_email", "pet_name", "appointment_date", "appointment_time", "reason", "status")
+    }
+    if not fields["owner_email"]:
+        return None, "owner_email is required."
+    if not fields["pet_name"]:
+        return None, "pet_name is required."
+    try:
+        day = dt.date.fromisoformat(fields["appointment_date"])
+    except ValueError:
+        return None, "Invalid date format."
+    error = validate_slot(day, fields["appointment_time"])
+    if error:
+        return None, error
+    status = fields["status"] or "pending"
+    if status not in ("pending", "confirmed", "rescheduled", "cancelled"):
+        return None, "Invalid status."
+    return (
+        fields["owner_email"].lower(),
+        fields["pet_name"],
+        day.isoformat(),
+        minutes_to_time(time_to_minutes(fields["appointment_time"])),
+        fields["reason"] or None,
+        status,
+    ), None
+
+
+def _import_chunk(conn, rows, capacity):
+    """Insert the valid (line, values) rows of one chunk in the current transaction.
+
+    Lookups are done once per chunk: owners by email, their pets, and the
+    appointments already booked on the chunk's days (capacity and duplicates).
+    Returns (inserted values, [(line, error)]).
+    """
+    def placeholders(values):
+        return ", ".join("?" * len(values))
+
+    emails = sorted({values[0] for _line, values in rows})
+    owners = dict(conn.execute(
+        "SELECT email, id FROM users WHERE role = 'pet_owner' AND email IN (%s)" % placeholders(emails),
+        emails,
+    ).fetchall())
+    pets = {}
+    owner_ids = sorted(set(owners.values()))
+    if owner_ids:
+        for pet in conn.execute(
+            "SELECT id, owner_id, name FROM pets WHERE owner_id IN (%s) ORDER BY id" % placeholders(owner_ids),
+            owner_ids,
+        ):
+            pets.setdefault((pet["owner_id"], pet["name"].lower()), pet["id"])
+
+    days = sorted({values[2] for _line, values in rows})
+    taken = {}
+    booked = set()
+    for appt in conn.execute(
+        """
+        SELECT pet_id, appointment_date, appointment_time, status
+        FROM appointments
+        WHERE appointment_date IN (%s)
+        """ % placeholders(days),
+        days,
+    ):
+        key = (appt["appointment_date"], time_to_minutes(appt["appointment_time"]))
+        booked.add((appt["pet_id"],) + key)
+        if appt["status"] != "cancelled":
+            taken[key] = taken.get(key, 0) + 1
+
+    inserted, errors = [], []
+    for line, (email, pet_name, day, time_value, reason, status) in rows:
+        owner_id = owners.get(email)
+        if owner_id is None:
+            errors.append((line, "Unknown pet owner %s." % email))
+            continue
+        pet_id = pets.get((owner_id, pet_name.lower()))
+        if pet_id is None:
+            errors.append((line, "Unknown pet %s for %s." % (pet_name, email)))
+            continue
+        key = (day, time_to_minutes(time_value))
+        if (pet_id,) + key in booked:
+            errors.append((line, "Duplicate appointment."))
+            continue
+        if status != "cancelled":
+            if taken.get(key, 0) >= capacity:
+                errors.append((line, "This time slot is fully booked."))
+                continue
+            taken[key] = taken.get(key, 0) + 1
+        booked.add((pet_id,) + key)
+        inserted.append((owner_id, pet_id, pet_name, day, time_value, reason, status))
+
+    conn.executemany(
+        """
+        INSERT INTO appointments (
+            owner_id, pet_id, pet_name,
+            appointment_date, appointment_time, reason, status
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        inserted,
+    )
+    return inserted, errors
+
+
+def import_appointments(rows, chunk_size=None, progress=None):
+    """Validate and insert (line, row) pairs, one write transaction per chunk.
+
+    Returns a report: rows, inserted, rejected, errors (first
+    IMPORT_MAX_ERRORS as (line, message)), seconds and rows_per_second.
+    progress(report) is called after each chunk.
+    """
+    chunk_size = chunk_size or app.config["IMPORT_CHUNK_SIZE"]
+    capacity = slot_capacity()
+    report = {"rows": 0, "inserted": 0, "rejected": 0, "errors": [], "seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+    days = set()
+
+    def reject(line, message):
+        report["rejected"] += 1
+        if len(report["errors"]) < app.config["IMPORT_MAX_ERRORS"]:
+            report["errors"].append((line, message))
+
+    def flush(chunk):
+        if chunk:
+            inserted, errors = db_write(lambda conn: _import_chunk(conn, chunk, capacity))
+            report["inserted"] += len(inserted)
+            for line, message in errors:
+                reject(line, message)
+            days.update(values[3] for values in inserted)
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["rows"] / elapsed, 1) if elapsed else 0.0
+        if progress is not None:
+            progress(report)
+
+    chunk = []
+    for line, row in rows:
+        report["rows"] += 1
+        values, error = parse_import_row(row)
+        if error:
+            reject(line, error)
+            continue
+        chunk.append((line, values))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+
+    for day in days:
+        schedule_index.invalidate(day)
+    return report
+
+
+appointments_cli = AppGroup("appointments", help="Appointment data maintenance.")
+
+
+@appointments_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Default: from the file extension.")
+@click.option("--chunk-size", type=int, default=None, help="Rows per transaction.")
+def appointments_import_command(path, fmt, chunk_size):
+    """Bulk-load appointments from a CSV or NDJSON file."""
+    fmt = fmt or IMPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise click.UsageError("cannot guess the format of %s, use --format" % path)
+
+    def progress(report):
+        click.echo("%(rows)d rows, %(inserted)d inserted, %(rejected)d rejected, "
+                   "%(rows_per_second).0f rows/s" % report)
+
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        report = import_appointments(read_import_rows(stream, fmt), chunk_size, progress)
+    for line, message in report["errors"]:
+        click.echo("line %d: %s" % (line, message))
+    if report["rejected"] > len(report["errors"]):
+        click.echo("... %d more rejected rows" % (report["rejected"] - len(report["errors"])))
+    click.echo("imported %(inserted)d of %(rows)d rows in %(seconds).1fs" % report)
+
+
+app.cli.add_command(appointments_cli)
+
+
+@app.route("/staff/appointments/import", methods=["GET", "POST"])
+def import_appointments_view():
+    if "user_id" not in session or session.get("user_role") != "clinic_staff":
+        abort(403)
+
+    report = None
+    error_message = None
+    if request.method == "POST":
+        try:
+            upload = request.files.get("file")
+        except RequestEntityTooLarge:
+            return render_template(
+                "staff-import.html",
+                report=None,
+                error_message="The file is larger than %d MB, use flask appointments import."
+                % (app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)),
+                user_name=session.get("user_name"),
+            ), 413
+        fmt = request.form.get("format") or (
+            IMPORT_FORMATS.get(os.path.splitext(upload.filename or "")[1].lower()) if upload else None
+        )
+        if not upload or not upload.filename:
+            error_message = "Please choose a file."
+        elif fmt not in ("csv", "ndjson"):
+            error_message = "Unsupported file type, use .csv or .ndjson."
+        else:
+            # Décodé au fil de la lecture : chaque paquet est inséré avant de lire
+            # la suite. Une erreur d'encodage arrête l'import après le dernier
+            # paquet complet, dont le rapport est gardé.
+            done = {}
+            stream = io.TextIOWrapper(upload.stream, "utf-8-sig", newline="")
+            try:
+                report = import_appointments(read_import_rows(stream, fmt), progress=done.update)
+            except (UnicodeDecodeError, csv.Error) as exc:
+                report = done or None
+                error_message = (
+                    "The file is not valid UTF-8" if isinstance(exc, UnicodeDecodeError)
+                    else "Invalid CSV: %s" % exc
+                )
+                error_message += "; only the first %d rows were processed." % done.get("rows", 0)
+
+    return render_template(
+        "staff-import.html",
+        report=report,
+        error_message=error_message,
+        user_name=session.get("user_name"),
+    )
+
+
 # ---------- RESCHEDULE APPOINTMENT ----------
 @app.route("/staff/appointments/<int:appointment_id>/reschedule", methods=["GET", "POST"])
 def reschedule_appointment(appointment_id):
@@ -1230,18 +4797,19 @@ def reschedule_appointment(appointment_id):
     today = dt.date.today()
     today_str = today.isoformat()
 
-    conn = get_db_connection()
+    conn = get_db()
     row = conn.execute(
         """
-        SELECT a.id, a.pet_name, a.appointment_date, a.appointment_time,
-               a.reason, a.status, u.full_name AS owner_name
+        SELECT a.id, a.owner_id, a.pet_id, COALESCE(p.name, a.pet_name) AS pet_name,
+               a.appointment_date, a.appointment_time, a.reason, a.status,
+               u.full_name AS owner_name
         FROM appointments a
         JOIN users u ON a.owner_id = u.id
+        LEFT JOIN pets p ON p.id = a.pet_id
         WHERE a.id = ?
         """,
         (appointment_id,),
     ).fetchone()
-    conn.close()
 
     if not row:
         abort(404)
@@ -1279,38 +4847,56 @@ def reschedule_appointment(appointment_id):
 
         if not appointment_time:
             errors["appointment_time"] = "Time is required."
+        elif not errors.get("appointment_date"):
+            slot_error = validate_slot(date_obj, appointment_time)
+            if slot_error:
+                errors["appointment_time"] = slot_error
+            else:
+                # Forme canonique (YYYY-MM-DD, HH:MM), comme à la réservation
+                appointment_date = date_obj.isoformat()
+                appointment_time = minutes_to_time(time_to_minutes(appointment_time))
 
         
         # if not reason:
         #     errors["reason"] = "Please provide a reason.
 
-        if errors:
-            error_message = "Please correct the errors below."
-            return render_template(
-                "staff-reschedule.html",
-                appointment=row,
-                form_data=form_data,
-                errors=errors,
-                error_message=error_message,
-                success_message=None,
-                today_str=today_str,
-                user_name=session.get("user_name"),
-            )
+        if not errors:
+            # Update appointment (le rendez-vous lui-même ne compte pas dans le créneau)
+            def update(conn):
+                conn.execute(
+                    """
+                    UPDATE appointments
+                    SET appointment_date = ?, appointment_time = ?, reason = ?, status = 'rescheduled'
+                    WHERE id = ?
+                    """,
+                    (appointment_date, appointment_time, reason, appointment_id),
+                )
+                enqueue_reminder(conn, appointment_id, appointment_date, appointment_time)
 
-        # Update appointment
-        conn = get_db_connection()
-        conn.execute(
-            """
-            UPDATE appointments
-            SET appointment_date = ?, appointment_time = ?, reason = ?, status = 'rescheduled'
-            WHERE id = ?
-            """,
-            (appointment_date, appointment_time, reason, appointment_id),
+            try:
+                claim_slot(
+                    update, appointment_date, appointment_time, slot_capacity(),
+                    exclude_id=appointment_id,
+                )
+            except SlotUnavailable as exc:
+                errors["appointment_time"] = str(exc)
+            else:
+                if row["status"] != "cancelled":
+                    schedule_index.apply(row["appointment_date"], row["appointment_time"], -1)
+                schedule_index.apply(appointment_date, appointment_time, +1)
+                return redirect(url_for("staff_dashboard"))
+
+        error_message = "Please correct the errors below."
+        return render_template(
+            "staff-reschedule.html",
+            appointment=row,
+            form_data=form_data,
+            errors=errors,
+            error_message=error_message,
+            success_message=None,
+            today_str=today_str,
+            user_name=session.get("user_name"),
         )
-        conn.commit()
-        conn.close()
-
-        return redirect(url_for("staff_dashboard"))
 
     # GET
     return render_template(
@@ -1331,19 +4917,19 @@ def create_prescription(appointment_id):
     if "user_id" not in session or session.get("user_role") != "clinic_staff":
         abort(403)
 
-    conn = get_db_connection()
+    conn = get_db()
     appt = conn.execute(
         """
-        SELECT a.id, a.owner_id, a.pet_id, a.pet_name,
+        SELECT a.id, a.owner_id, a.pet_id, COALESCE(p.name, a.pet_name) AS pet_name,
                a.appointment_date, a.appointment_time, a.reason, a.status,
                u.full_name AS owner_name
         FROM appointments a
         JOIN users u ON a.owner_id = u.id
+        LEFT JOIN pets p ON p.id = a.pet_id
         WHERE a.id = ?
         """,
         (appointment_id,),
     ).fetchone()
-    conn.close()
 
     if not appt:
         abort(404)
@@ -1394,8 +4980,7 @@ def create_prescription(appointment_id):
                 user_name=session.get("user_name"),
             )
 
-        conn = get_db_connection()
-        conn.execute(
+        db_execute(
             """
             INSERT INTO prescriptions (
                 pet_id, appointment_id, medical_record_id,
@@ -1414,8 +4999,6 @@ def create_prescription(appointment_id):
                 instructions,
             ),
         )
-        conn.commit()
-        conn.close()
 
         return redirect(url_for("staff_dashboard"))
 
@@ -1438,62 +5021,268 @@ def pet_prescriptions(pet_id):
     if session.get("user_role") != "pet_owner":
         abort(403)
 
-    conn = get_db_connection()
+    conn = get_db()
     pet = conn.execute(
         """
-        SELECT id, owner_id, name, species, breed, age, sex, notes
-        FROM pets
-        WHERE id = ?
+        SELECT p.id, p.owner_id, p.name, p.species, p.breed, p.age, p.sex, p.notes,
+               cs.version, cs.modified_at
+        FROM pets p
+        LEFT JOIN change_stamps cs ON cs.scope = 'pet' AND cs.entity_id = p.id
+        WHERE p.id = ?
         """,
         (pet_id,),
     ).fetchone()
 
     if not pet or pet["owner_id"] != session["user_id"]:
-        conn.close()
         abort(404)
 
-    rows = conn.execute(
+    not_modified = check_conditional(
+        conn, "pet", pet_id, stamp=(pet["version"], pet["modified_at"])
+    )
+    if not_modified is not None:
+        return not_modified
+
+    size, after, before = read_page_args()
+
+    def load():
+        page = keyset_page(
+            conn,
+            """
+            SELECT p.id, p.drug_name, p.dosage, p.frequency, p.duration,
+                   p.instructions, p.created_at,
+                   a.appointment_date, a.appointment_time,
+                   s.full_name AS staff_name
+            FROM prescriptions p
+            LEFT JOIN appointments a ON p.appointment_id = a.id
+            JOIN users s ON p.staff_id = s.id
+            WHERE p.pet_id = ?
+            """,
+            (pet_id,),
+            "p.created_at", "p.id", size, after, before,
+        )
+        return {"prescriptions": page["rows"], "page": page}
+
+    # Lignes historiques : même version que l'ETag ci-dessus
+    prescriptions_table = cached_fragment(
+        "pet-prescriptions-table.html", "pet", pet_id, load, request.query_string,
+        version=(pet["version"], pet["modified_at"]),
+    )
+
+    return render_template(
+        "pet-prescriptions.html",
+        user_name=session.get("user_name"),
+        pet=pet,
+        prescriptions_table=prescriptions_table,
+    )
+
+
+# ---------- PET TIMELINE ----------
+# Chronologie d'un animal : rendez-vous, factures, dossiers et ordonnances
+# fusionnés par date, une seule requête par page. Chaque branche du UNION ALL
+# lit son index dans l'ordre et s'arrête à size + 1 lignes ; SQLite fusionne
+# les branches (MERGE) au lieu de tout trier.
+# La clé id * 4 + type départage les égalités de date et sert de curseur.
+# `at` est en heure locale de la clinique partout : les rendez-vous sont saisis
+# ainsi, les horodatages CURRENT_TIMESTAMP (UTC) sont convertis avec 'localtime'.
+
+TIMELINE_KINDS = ("appointment", "invoice", "record", "prescription")   # key % 4
+
+# (sql, colonnes du keyset, ordre, borne indexable du curseur) ; WHERE pet_id = ?
+# en premier paramètre. La borne porte sur la colonne brute de l'index : à un
+# jour près pour les horodatages UTC, le keyset sur `at` fait le reste.
+TIMELINE_ARMS = (
+    (
+        """
+        SELECT a.appointment_date || ' ' || a.appointment_time || ':00' AS at,
+               a.id * 4 AS key, a.id, a.id AS appointment_id, NULL AS staff_id,
+               a.reason AS title, NULL AS detail, a.status, NULL AS amount,
+               NULL AS weight, NULL AS temperature
+        FROM appointments a
+        WHERE a.pet_id = ?
+        """,
+        ("a.appointment_date || ' ' || a.appointment_time || ':00'", "a.id"),
+        "a.appointment_date %(dir)s, a.appointment_time %(dir)s, a.id %(dir)s",
+        ("a.appointment_date", "substr(?, 1, 10)", "substr(?, 1, 10)"),
+    ),
+    (
+        """
+        SELECT datetime(inv.issued_at, 'localtime') AS at,
+               inv.id * 4 + 1 AS key, inv.id, inv.appointment_id, NULL AS staff_id,
+               inv.notes AS title, inv.paid_at AS detail, inv.status, inv.total_amount AS amount,
+               NULL AS weight, NULL AS temperature
+        FROM appointments a
+        JOIN invoices inv ON inv.appointment_id = a.id
+        WHERE a.pet_id = ?
+        """,
+        ("datetime(inv.issued_at, 'localtime')", "inv.id"),
+        "inv.issued_at %(dir)s, inv.id %(dir)s",
+        ("inv.issued_at", "datetime(?, '+1 day')", "datetime(?, '-1 day')"),
+    ),
+    (
         """
-        SELECT p.id, p.drug_name, p.dosage, p.frequency, p.duration,
-               p.instructions, p.created_at,
-               a.appointment_date, a.appointment_time,
-               s.full_name AS staff_name
+        SELECT datetime(mr.created_at, 'localtime') AS at,
+               mr.id * 4 + 2 AS key, mr.id, mr.appointment_id, mr.staff_id,
+               mr.diagnosis AS title, mr.notes AS detail, NULL AS status, NULL AS amount,
+               mr.weight, mr.temperature
+        FROM medical_records mr
+        WHERE mr.pet_id = ?
+        """,
+        ("datetime(mr.created_at, 'localtime')", "mr.id"),
+        "mr.created_at %(dir)s, mr.id %(dir)s",
+        ("mr.created_at", "datetime(?, '+1 day')", "datetime(?, '-1 day')"),
+    ),
+    (
+        """
+        SELECT datetime(p.created_at, 'localtime') AS at,
+               p.id * 4 + 3 AS key, p.id, p.appointment_id, p.staff_id,
+               p.drug_name || ' ' || p.dosage AS title,
+               trim(coalesce(p.frequency, '') || ' ' || coalesce(p.duration, '') || ' '
+                    || coalesce(p.instructions, '')) AS detail,
+               NULL AS status, NULL AS amount, NULL AS weight, NULL AS temperature
         FROM prescriptions p
-        LEFT JOIN appointments a ON p.appointment_id = a.id
-        JOIN users s ON p.staff_id = s.id
         WHERE p.pet_id = ?
-        ORDER BY p.created_at DESC
         """,
-        (pet_id,),
+        ("datetime(p.created_at, 'localtime')", "p.id"),
+        "p.created_at %(dir)s, p.id %(dir)s",
+        ("p.created_at", "datetime(?, '+1 day')", "datetime(?, '-1 day')"),
+    ),
+)
+
+
+def timeline_page(conn, pet_id, size, after=None, before=None):
+    """One page of the pet's timeline, newest first, same shape as keyset_page.
+
+    Rows carry at, key, kind, id, appointment_id, title, detail, status,
+    amount, weight, temperature and staff_name.
+    """
+    cursor = before if before is not None else after
+    if before is not None:
+        op, order = ">", "ASC"
+    else:
+        op, order = "<", "DESC"
+
+    arms, params = [], []
+    for kind, (sql, (at_column, id_column), arm_order, bound_sql) in enumerate(TIMELINE_ARMS):
+        params.append(pet_id)
+        if cursor is not None:
+            at, key = cursor
+            # id * 4 + kind < key  <=>  id < ceil((key - kind) / 4)
+            # id * 4 + kind > key  <=>  id > floor((key - kind) / 4)
+            bound = (key - kind + 3) // 4 if op == "<" else (key - kind) // 4
+            sql += " AND (%s, %s) %s (?, ?)" % (at_column, id_column, op)
+            params += [at, bound]
+            column, older, newer = bound_sql
+            sql += " AND %s %s= %s" % (column, op, older if op == "<" else newer)
+            params.append(at)
+        arms.append(
+            "SELECT * FROM (%s ORDER BY %s LIMIT ?)" % (sql, arm_order % {"dir": order})
+        )
+        params.append(size + 1)
+
+    params.append(size + 1)
+    rows = conn.execute(
+        """
+        SELECT t.*, s.full_name AS staff_name
+        FROM (%s ORDER BY at %s, key %s LIMIT ?) t
+        LEFT JOIN users s ON s.id = t.staff_id
+        ORDER BY t.at %s, t.key %s
+        """ % (" UNION ALL ".join(arms), order, order, order, order),
+        params,
     ).fetchall()
-    conn.close()
+
+    more = len(rows) > size
+    rows = [dict(row, kind=TIMELINE_KINDS[row["key"] % 4]) for row in rows[:size]]
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+
+    return {
+        "rows": rows,
+        "next": encode_cursor(rows[-1]["at"], rows[-1]["key"]) if rows and has_next else None,
+        "prev": encode_cursor(rows[0]["at"], rows[0]["key"]) if rows and has_prev else None,
+        "size": size,
+    }
+
+
+def timeline_pet(conn, pet_id):
+    """The pet if the current user may see its timeline (owner or staff), else None."""
+    pet = conn.execute(
+        "SELECT id, owner_id, name, species, breed, age, sex FROM pets WHERE id = ?",
+        (pet_id,),
+    ).fetchone()
+    if pet is None:
+        return None
+    if session.get("user_role") == "pet_owner" and pet["owner_id"] == session["user_id"]:
+        return pet
+    if session.get("user_role") == "clinic_staff":
+        return pet
+    return None
+
+
+@app.route("/pets/<int:pet_id>/timeline")
+def pet_timeline(pet_id):
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") not in ("pet_owner", "clinic_staff"):
+        abort(403)
+
+    conn = get_db()
+    pet = timeline_pet(conn, pet_id)
+    if pet is None:
+        abort(404)
+
+    size, after, before = read_page_args()
+    page = timeline_page(conn, pet_id, size, after, before)
 
     return render_template(
-        "pet-prescriptions.html",
+        "pet-timeline.html",
         user_name=session.get("user_name"),
+        user_role=session.get("user_role"),
         pet=pet,
-        prescriptions=rows,
+        events=page["rows"],
+        page=page,
     )
 
 
+@app.route("/api/pets/<int:pet_id>/timeline")
+def api_pet_timeline(pet_id):
+    """?size=&after=&before= -> {"events", "next", "prev"} (cursors as in the page)."""
+    if "user_id" not in session:
+        return jsonify({"error": "authentication required"}), 401
+    if session.get("user_role") not in ("pet_owner", "clinic_staff"):
+        return jsonify({"error": "forbidden"}), 403
+
+    conn = get_db()
+    if timeline_pet(conn, pet_id) is None:
+        return jsonify({"error": "pet not found"}), 404
+
+    size, after, before = read_page_args()
+    page = timeline_page(conn, pet_id, size, after, before)
+    for row in page["rows"]:
+        del row["key"], row["staff_id"]
+    return jsonify({"events": page["rows"], "next": page["next"], "prev": page["prev"]})
+
+
 # ---------- CREATE INVOICE ----------
 @app.route("/staff/appointments/<int:appointment_id>/invoice/new", methods=["GET", "POST"])
 def create_invoice(appointment_id):
     if "user_id" not in session or session.get("user_role") != "clinic_staff":
         abort(403)
 
-    conn = get_db_connection()
+    conn = get_db()
     appt = conn.execute(
         """
-        SELECT a.id, a.owner_id, a.pet_name, a.appointment_date, a.appointment_time,
-               u.full_name AS owner_name
+        SELECT a.id, a.owner_id, COALESCE(p.name, a.pet_name) AS pet_name,
+               a.appointment_date, a.appointment_time, u.full_name AS owner_name
         FROM appointments a
         JOIN users u ON a.owner_id = u.id
+        LEFT JOIN pets p ON p.id = a.pet_id
         WHERE a.id = ?
         """,
         (appointment_id,),
     ).fetchone()
-    conn.close()
 
     if not appt:
         abort(404)
@@ -1545,30 +5334,35 @@ def create_invoice(appointment_id):
                 user_name=session.get("user_name"),
             )
 
-        conn = get_db_connection()
         paid_at = None
         if status == "paid":
             paid_at = dt.datetime.now().isoformat(timespec="seconds")
 
-        conn.execute(
-            """
-            INSERT INTO invoices (
-                owner_id, appointment_id, total_amount,
-                status, issued_at, paid_at, notes
-            )
-            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
-            """,
-            (
-                appt["owner_id"],
-                appt["id"],
-                total_amount,
-                status,
-                paid_at,
-                notes,
-            ),
+        values = (
+            appt["owner_id"],
+            appt["id"],
+            total_amount,
+            status,
+            paid_at,
+            notes,
         )
-        conn.commit()
-        conn.close()
+
+        def insert(conn):
+            invoice_id = conn.execute(
+                """
+                INSERT INTO invoices (
+                    owner_id, appointment_id, total_amount,
+                    status, issued_at, paid_at, notes
+                )
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
+                """,
+                values,
+            ).lastrowid
+            # L'avis au propriétaire part d'un worker, après la réponse
+            enqueue(conn, "invoice_issued", {"invoice_id": invoice_id})
+
+        db_write(insert)
+        dashboard_cache.invalidate("admin")
 
         return redirect(url_for("staff_dashboard"))
 
@@ -1583,6 +5377,23 @@ def create_invoice(appointment_id):
     )
 
 # ---------- OWNER INVOICES ----------
+def load_owner_invoices(conn, owner_id, size, after=None, before=None):
+    page = keyset_page(
+        conn,
+        """
+        SELECT inv.id, inv.total_amount, inv.status, inv.issued_at, inv.paid_at,
+               a.appointment_date, a.appointment_time, COALESCE(p.name, a.pet_name) AS pet_name
+        FROM invoices inv
+        LEFT JOIN appointments a ON inv.appointment_id = a.id
+        LEFT JOIN pets p ON p.id = a.pet_id
+        WHERE inv.owner_id = ?
+        """,
+        (owner_id,),
+        "inv.issued_at", "inv.id", size, after, before,
+    )
+    return {"invoices": page["rows"], "page": page}
+
+
 @app.route("/owner/invoices")
 def owner_invoices():
     if "user_id" not in session:
@@ -1590,27 +5401,49 @@ def owner_invoices():
     if session.get("user_role") != "pet_owner":
         abort(403)
 
-    conn = get_db_connection()
-    rows = conn.execute(
-        """
-        SELECT inv.id, inv.total_amount, inv.status, inv.issued_at, inv.paid_at,
-               a.appointment_date, a.appointment_time, a.pet_name
-        FROM invoices inv
-        LEFT JOIN appointments a ON inv.appointment_id = a.id
-        WHERE inv.owner_id = ?
-        ORDER BY inv.issued_at DESC
-        """,
-        (session["user_id"],),
-    ).fetchall()
-    conn.close()
+    conn = get_db()
+    not_modified = check_conditional(conn, "owner_invoices", session["user_id"])
+    if not_modified is not None:
+        return not_modified
+
+    size, after, before = read_page_args()
 
     return render_template(
         "owner-invoices.html",
         user_name=session.get("user_name"),
-        invoices=rows,
+        **load_owner_invoices(conn, session["user_id"], size, after, before),
+    )
+
+
+# ---------- ADMIN SLOW QUERIES ----------
+
+@app.route("/admin/slow-queries")
+def admin_slow_queries():
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if session.get("user_role") != "admin":
+        abort(403)
+
+    return render_template(
+        "admin-slow-queries.html",
+        user_name=session.get("user_name"),
+        threshold_ms=app.config["SLOW_QUERY_MS"],
+        target=app.config["SLOW_QUERY_LOG"],
+        offenders=slow_query_report(),
     )
 
 
+# ---------- METRICS ENDPOINT ----------
+
+@app.route("/metrics")
+def metrics():
+    token = app.config["METRICS_TOKEN"]
+    if not (token and request.headers.get("Authorization") == "Bearer " + token):
+        if "user_id" not in session or session.get("user_role") != "admin":
+            abort(403)
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ---------- LOGOUT ----------
 
 @app.route("/logout")
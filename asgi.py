@@ -0,0 +1,299 @@
+"""ASGI entry point for the pet clinic.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+The read-heavy pages (owner dashboard, staff dashboard, my pets, owner
+invoices) are served by coroutines: the session lookup, the SQL and the
+template rendering are awaited on AsyncDB's bounded thread pool, so thousands of open connections share a handful of
+threads. They are timed into the same route_metrics series as
+MetricsMiddleware, under their Flask endpoint name, which the slow-query
+log also uses. Every other request (forms, redirects, error pages, static
+files) is handed to the regular Flask app through asgiref's WsgiToAsgi.
+Lifespan events are answered here: startup checks the schema version
+(ensure_schema), shutdown stops AsyncDB's threads and closes their
+connections.
+"""
+import asyncio
+import contextvars
+import datetime as dt
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import Response, render_template, session as flask_session
+from flask.ctx import RequestContext
+
+import app as clinic
+
+flask_app = clinic.app
+flask_app.config.setdefault("ASYNC_DB_WORKERS", 8)        # threads SQLite + rendu
+flask_app.config.setdefault("ASYNC_DB_MAX_PENDING", 1024)  # tâches en file avant attente
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+# Compteurs de la requête en cours (même liste que MetricsMiddleware), posés
+# dans _request_metrics du thread qui exécute chaque appel AsyncDB
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class AsyncDB:
+    """Await blocking SQLite calls on a bounded pool of threads.
+
+    Each worker thread keeps one connection for its whole life, so the
+    async path needs no pool checkout per query.
+    """
+
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-db")
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._max_pending = max_pending
+        self._pending = None
+        self.stats = {"calls": 0, "waits": 0}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            clinic.ensure_schema()
+            conn = self._local.conn = clinic._connect()
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Wait for the running calls, stop the threads and close their connections."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    async def _submit(self, fn):
+        stats = _request_stats.get()
+        if stats is not None:
+            fn = _charged_to(stats, fn)
+        if self._pending is None:
+            self._pending = asyncio.Semaphore(self._max_pending)
+        if self._pending.locked():
+            self.stats["waits"] += 1
+        async with self._pending:
+            self.stats["calls"] += 1
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn)
+
+    async def run(self, fn, *args):
+        """fn(conn, *args) on a worker thread with that thread's connection."""
+        return await self._submit(lambda: fn(self._connection(), *args))
+
+    async def call(self, fn, *args):
+        """fn(*args) on a worker thread (CPU work such as template rendering)."""
+        return await self._submit(lambda: fn(*args))
+
+
+def _charged_to(stats, fn):
+    """fn with the SQL and template time of its thread counted in stats."""
+    def charged():
+        clinic._request_metrics.stats = stats
+        try:
+            return fn()
+        finally:
+            clinic._request_metrics.stats = None
+    return charged
+
+
+db = AsyncDB(flask_app.config["ASYNC_DB_WORKERS"], flask_app.config["ASYNC_DB_MAX_PENDING"])
+
+
+def build_environ(scope):
+    """Minimal WSGI environ for a GET scope (session cookie, url_for, args)."""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin1").upper().replace("-", "_")
+        value = raw_value.decode("latin1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        if name in environ:
+            value = environ[name] + "," + value
+        environ[name] = value
+    return environ
+
+
+def _open_session(environ):
+    """Session for this request after the role check, or None to defer to Flask."""
+    with flask_app.request_context(environ):
+        sess = flask_session._get_current_object()
+        if not clinic.sync_session_user(sess) or sess.modified:
+            return None  # session à réécrire : Flask s'en charge
+        if flask_app.session_interface.needs_touch(flask_app, sess):
+            return None  # expiration à repousser : idem
+        return sess
+
+
+# ---------- ASYNC VIEWS ----------
+# Mêmes données et mêmes templates que les routes Flask (load_* dans app.py).
+
+def _pet_owner_dashboard(conn, environ, session, today):
+    with RequestContext(flask_app, environ, session=session):
+        return render_template(
+            "pet-owner-dashboard.html",
+            user_name=session.get("user_name"),
+            today_str=today,
+            appointments=clinic.pet_owner_appointments(conn, session["user_id"], today),
+        )
+
+
+async def pet_owner_dashboard(environ, session):
+    today = dt.date.today().isoformat()
+    return await db.run(_pet_owner_dashboard, environ, session, today)
+
+
+def _staff_dashboard(conn, environ, session, today):
+    with RequestContext(flask_app, environ, session=session):
+        return render_template(
+            "staff-dashboard.html",
+            user_name=session.get("user_name"),
+            today_str=today,
+            batch_message=clinic.batch_status_message(),
+            appointments=clinic.staff_appointments(conn, today),
+        )
+
+
+async def staff_dashboard(environ, session):
+    today = dt.date.today().isoformat()
+    return await db.run(_staff_dashboard, environ, session, today)
+
+
+def _conditional_page(conn, environ, session, scope, template, load):
+    """Owner page, or a bodiless 304 when the client's copy is current."""
+    with RequestContext(flask_app, environ, session=session):
+        not_modified = clinic.check_conditional(conn, scope, session["user_id"])
+        if not_modified is not None:
+            return not_modified
+        body = render_template(template, user_name=session.get("user_name"), **load(conn))
+        return clinic.add_validators(Response(body, mimetype="text/html"))
+
+
+async def my_pets(environ, session):
+    owner_id = session["user_id"]
+    return await db.run(
+        _conditional_page, environ, session, "owner_pets", "my-pets.html",
+        lambda conn: clinic.load_my_pets(conn, owner_id),
+    )
+
+
+async def owner_invoices(environ, session):
+    owner_id = session["user_id"]
+    return await db.run(
+        _conditional_page, environ, session, "owner_invoices", "owner-invoices.html",
+        lambda conn: clinic.load_owner_invoices(conn, owner_id, *clinic.read_page_args()),
+    )
+
+
+# path -> (rôle requis, coroutine)
+ASYNC_VIEWS = {
+    "/dashboard/pet-owner": ("pet_owner", pet_owner_dashboard),
+    "/dashboard/staff": ("clinic_staff", staff_dashboard),
+    "/owner/pets": ("pet_owner", my_pets),
+    "/owner/invoices": ("pet_owner", owner_invoices),
+}
+# Nom d'endpoint Flask de chaque chemin : mêmes séries sur /metrics et dans le slow-query log
+_url_adapter = flask_app.url_map.bind("localhost")
+ASYNC_ENDPOINTS = {path: _url_adapter.match(path, "GET")[0] for path in ASYNC_VIEWS}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Schéma vérifié (ou migré) avant la première requête
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, clinic.ensure_schema)
+            except clinic.SchemaOutOfDate as exc:
+                await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # shutdown() bloque jusqu'à la fin des appels en cours : hors de la boucle
+            await asyncio.get_running_loop().run_in_executor(None, db.close)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def serve_async_view(environ, route, send):
+    """Answer from the async view; False when the request must go to Flask."""
+    session = await db.call(_open_session, environ)
+    role, view = route
+    # Seul le cas nominal est servi ici ; redirections et 403 restent à Flask
+    if session is None or "user_id" not in session or session.get("user_role") != role:
+        return False
+    response = await view(environ, session)
+    if isinstance(response, str):
+        response = Response(response, mimetype="text/html")
+    response.vary.add("Cookie")
+    body = response.get_data()
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [
+            (name.lower().encode("latin1"), value.encode("latin1"))
+            for name, value in response.headers.to_wsgi_list()
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+    return response.status_code
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    route = None
+    if scope["type"] == "http" and scope["method"] == "GET":
+        route = ASYNC_VIEWS.get(scope["path"])
+
+    if route is not None:
+        environ = build_environ(scope)
+        if not flask_app.config["METRICS_ENABLED"] and flask_app.config["SLOW_QUERY_MS"] is None:
+            if await serve_async_view(environ, route, send):
+                return
+        else:
+            # Même mesure que MetricsMiddleware ; une requête renvoyée à Flask y est comptée
+            endpoint = ASYNC_ENDPOINTS[scope["path"]]
+            stats = [0, 0.0, 0, 0.0, endpoint]
+            token = _request_stats.set(stats)
+            started = time.perf_counter()
+            try:
+                status = await serve_async_view(environ, route, send)
+            except BaseException:
+                status = 500
+                raise
+            finally:
+                _request_stats.reset(token)
+                if status and flask_app.config["METRICS_ENABLED"]:
+                    clinic.route_metrics.observe(
+                        endpoint, str(status), time.perf_counter() - started, stats
+                    )
+            if status:
+                return
+
+    await wsgi_application(scope, receive, send)
@@ -0,0 +1,157 @@
+"""Owner dashboard under many concurrent clients: threaded WSGI vs asgi.py.
+
+Usage (from the project root, needs uvicorn):
+
+    python benchmarks/bench_asgi.py --clients 500 --requests 10
+
+Both servers run as subprocesses on the same seeded database (passed via
+PET_CLINIC_DB).  Every client opens one connection per request (the
+werkzeug server does not keep-alive) and fetches /dashboard/pet-owner with
+a signed session cookie; the script
+reports throughput, p50/p99 latency and failed requests for each server.
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as clinic  # noqa: E402
+
+PATH = "/dashboard/pet-owner"
+
+SERVERS = {
+    "wsgi": [sys.executable, "-c",
+             "import logging, sys, app; from werkzeug.serving import run_simple; "
+             "logging.getLogger('werkzeug').setLevel(logging.WARNING); "
+             "run_simple('127.0.0.1', int(sys.argv[1]), app.app, threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:application",
+             "--host", "127.0.0.1", "--log-level", "warning", "--port"],
+}
+
+
+def prepare(owners, appointments):
+    path = os.path.join(tempfile.mkdtemp(), "bench_asgi.db")
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()
+    conn = clinic._connect(path)
+    conn.executemany(
+        "INSERT INTO users (full_name, email, password_hash, role, is_approved) "
+        "VALUES (?, ?, 'x', 'pet_owner', 1)",
+        (("Owner %d" % i, "owner%d@bench.test" % i) for i in range(owners)),
+    )
+    owner_id = conn.execute("SELECT MIN(id) FROM users WHERE role='pet_owner'").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, reason, status) "
+        "VALUES (?, 'Rex', ?, '10:00', 'checkup', 'confirmed')",
+        ((owner_id + i % owners, "2025-%02d-%02d" % (i % 12 + 1, i % 28 + 1))
+         for i in range(appointments)),
+    )
+    conn.commit()
+    conn.close()
+    return path, session_cookie({"user_id": owner_id, "user_name": "Owner 0", "user_role": "pet_owner"})
+
+
+def session_cookie(data):
+    """Cookie value for an already logged-in session (the servers share the SQLite store)."""
+    if clinic.get_session_store() is None:
+        serializer = clinic.ClinicSessionInterface.cookie_interface.get_signing_serializer(clinic.app)
+        return serializer.dumps(data)
+    sid = secrets.token_urlsafe(32)
+    with clinic.app.app_context():
+        clinic.get_session_store().save(sid, data, data["user_id"], time.time() + 3600)
+    return sid
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(kind, db_path):
+    port = free_port()
+    env = dict(os.environ, PET_CLINIC_DB=db_path)
+    proc = subprocess.Popen(SERVERS[kind] + [str(port)], cwd=ROOT, env=env)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("%s server did not start" % kind)
+
+
+async def fetch(port, request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return response.startswith((b"HTTP/1.1 200", b"HTTP/1.0 200"))
+
+
+async def client(port, request, count, latencies, failures):
+    for _ in range(count):
+        t0 = time.perf_counter()
+        try:
+            ok = await fetch(port, request)
+        except OSError:
+            ok = False
+        latencies.append(time.perf_counter() - t0)
+        if not ok:
+            failures.append(1)
+
+
+async def load(port, cookie, clients, per_client):
+    request = ("GET %s HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: session=%s\r\n"
+               "Connection: close\r\n\r\n"
+               % (PATH, cookie)).encode()
+    latencies, failures = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(port, request, per_client, latencies, failures)
+                           for _ in range(clients)))
+    return time.perf_counter() - t0, sorted(latencies), sum(failures)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--owners", type=int, default=1_000)
+    parser.add_argument("--appointments", type=int, default=20_000)
+    parser.add_argument("--only", choices=sorted(SERVERS))
+    args = parser.parse_args()
+
+    db_path, cookie = prepare(args.owners, args.appointments)
+    for kind in [args.only] if args.only else ("wsgi", "asgi"):
+        proc, port = start(kind, db_path)
+        try:
+            elapsed, latencies, failed = asyncio.run(load(port, cookie, args.clients, args.requests))
+        finally:
+            proc.terminate()
+            proc.wait()
+        print("%-5s req/s %8.0f   p50 %7.1f ms   p99 %7.1f ms   failed %d"
+              % (kind, len(latencies) / elapsed, percentile(latencies, 0.50) * 1000,
+                 percentile(latencies, 0.99) * 1000, failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Bandwidth and CPU saved by ETag / Last-Modified on the owner pages.
+
+Usage (from the project root):
+
+    python benchmarks/bench_conditional.py --scale 10k --rounds 50 --requests 20
+
+Builds a synthetic database (benchmarks/datagen.py), logs in as the owner
+of the pet with the longest history, then alternates short runs of plain
+refreshes and refreshes that send back the ETag of the previous response.
+Bytes are the status line, headers and body as sent on the wire; CPU is
+process time per request, median of the paired rounds.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+from datagen import build, scale_value  # noqa: E402
+
+
+def pick_pet(path):
+    conn = clinic._connect(path)
+    try:
+        return conn.execute(
+            """
+            SELECT p.id, p.owner_id, u.full_name
+            FROM pets p
+            JOIN users u ON u.id = p.owner_id
+            JOIN medical_records mr ON mr.pet_id = p.id
+            GROUP BY p.id
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+            """
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def wire_size(response):
+    head = "HTTP/1.1 %s\r\n" % response.status + "".join(
+        "%s: %s\r\n" % item for item in response.headers.items()
+    )
+    return len(head) + 2 + len(response.get_data())
+
+
+def run(client, path, requests, etag):
+    headers = {"If-None-Match": etag} if etag else {}
+    size = 0
+    t0 = time.process_time()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+        size = wire_size(response)
+        response.close()
+    return (time.process_time() - t0) / requests, size, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a number of appointments")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_conditional.db")
+    build(path, scale_value(args.scale))
+    pet_id, owner_id, owner_name = pick_pet(path)
+
+    client = clinic.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(user_id=owner_id, user_name=owner_name, user_role="pet_owner")
+
+    pages = (
+        "/owner/pets",
+        "/owner/invoices",
+        "/owner/pets/%d/history" % pet_id,
+        "/owner/pets/%d/prescriptions" % pet_id,
+    )
+    print("%-32s %10s %10s %10s %10s %8s" % ("page", "200 bytes", "304 bytes", "200 ms", "304 ms", "cpu"))
+    for page in pages:
+        etag = client.get(page).headers["ETag"]
+        run(client, page, 20, None)  # chauffe
+        full, cond = [], []
+        for _ in range(args.rounds):
+            full.append(run(client, page, args.requests, None))
+            cond.append(run(client, page, args.requests, etag))
+        assert cond[-1][2] == 304, cond[-1]
+        ratio = statistics.median(c[0] / f[0] for f, c in zip(full, cond))
+        print("%-32s %10d %10d %10.3f %10.3f %+7.1f%%" % (
+            page, full[-1][1], cond[-1][1],
+            statistics.median(f[0] for f in full) * 1000,
+            statistics.median(c[0] for c in cond) * 1000,
+            (ratio - 1) * 100,
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Login latency under a login rush: inline hashing vs the hashing pool.
+
+Usage (from the project root):
+
+    python benchmarks/bench_hashing.py --seconds 10 --logins 16 --readers 8
+
+`--logins` threads keep posting /login while `--readers` threads load the
+owner dashboard.  The "inline" run hashes on the request thread
+(PASSWORD_HASH_WORKERS = 0); the "pool" run goes through PasswordHasher
+with `--workers` threads.  p50/p99 are reported for both kinds of request,
+along with the logins answered 503 and any other failed request.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import app as clinic  # noqa: E402
+
+LOGIN = {"email": "rush@bench.test", "password": "bench-password", "role": "pet_owner"}
+
+
+def prepare():
+    clinic.app.config["DATABASE"] = os.path.join(tempfile.mkdtemp(), "bench_hashing.db")
+    clinic.init_db()
+    conn = clinic._connect()
+    conn.execute(
+        "INSERT INTO users (full_name, email, password_hash, role, is_approved) "
+        "VALUES ('Rush', ?, ?, 'pet_owner', 1)",
+        (LOGIN["email"], generate_password_hash(LOGIN["password"], clinic.app.config["PASSWORD_HASH_METHOD"])),
+    )
+    owner_id = conn.execute("SELECT id FROM users WHERE email = ?", (LOGIN["email"],)).fetchone()[0]
+    conn.executemany(
+        "INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, reason, status) "
+        "VALUES (?, 'Rex', ?, '10:00', 'checkup', 'confirmed')",
+        ((owner_id, "2025-%02d-%02d" % (i % 12 + 1, i % 28 + 1)) for i in range(50)),
+    )
+    conn.commit()
+    conn.close()
+    return owner_id
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def run(workers, seconds, logins, readers, owner_id):
+    clinic.app.config["PASSWORD_HASH_WORKERS"] = workers
+    stop = threading.Event()
+    results = {"login": [], "page": [], "busy": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def login_loop():
+        client = clinic.app.test_client()
+        times, busy, errors = [], 0, 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            status = client.post("/login", data=LOGIN).status_code
+            times.append(time.perf_counter() - t0)
+            busy += status == 503
+            errors += status not in (302, 503)
+        with lock:
+            results["login"] += times
+            results["busy"] += busy
+            results["errors"] += errors
+
+    def page_loop():
+        client = clinic.app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(user_id=owner_id, user_name="Rush", user_role="pet_owner")
+        times, errors = [], 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            status = client.get("/dashboard/pet-owner").status_code
+            times.append(time.perf_counter() - t0)
+            errors += status != 200
+        with lock:
+            results["page"] += times
+            results["errors"] += errors
+
+    threads = [threading.Thread(target=login_loop) for _ in range(logins)]
+    threads += [threading.Thread(target=page_loop) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=clinic.app.config["PASSWORD_HASH_WORKERS"] or 2)
+    args = parser.parse_args()
+
+    owner_id = prepare()
+    for name, workers in (("inline", 0), ("pool", args.workers)):
+        r = run(workers, args.seconds, args.logins, args.readers, owner_id)
+        print("%-6s logins %5d  p50 %7.1f ms  p99 %7.1f ms  503s %4d | pages %6d  p50 %6.1f ms  p99 %7.1f ms | errors %d"
+              % (name, len(r["login"]), percentile(r["login"], 0.5), percentile(r["login"], 0.99),
+                 r["busy"], len(r["page"]), percentile(r["page"], 0.5), percentile(r["page"], 0.99), r["errors"]))
+    print("hasher:", clinic.get_hasher().snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Seed a large database and check that every hot route query uses an index.
+
+Usage (from the project root):
+
+    python benchmarks/bench_indexes.py                 # 1M appointments
+    python benchmarks/bench_indexes.py --appointments 200000 --keep /tmp/big.db
+
+The script exits with a non-zero status if one of the EXPLAIN QUERY PLAN
+checks fails (full table scan or temporary B-tree used for sorting).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+
+
+# (route, SQL, params) -- the same statements the routes in app.py issue.
+ROUTE_QUERIES = [
+    (
+        "staff_dashboard",
+        """
+        SELECT a.id, a.pet_id, a.appointment_date, a.appointment_time,
+               a.reason, a.status, u.full_name AS owner_name
+        FROM appointments a
+        JOIN users u ON a.owner_id = u.id
+        WHERE a.appointment_date = ?
+        ORDER BY a.appointment_time
+        """,
+        ("2025-06-15",),
+    ),
+    (
+        "pet_owner_dashboard",
+        """
+        SELECT id, pet_id, appointment_date, appointment_time, reason, status
+        FROM appointments
+        WHERE owner_id = ?
+        ORDER BY appointment_date, appointment_time
+        """,
+        (42,),
+    ),
+    (
+        "owner_invoices",
+        """
+        SELECT inv.id, inv.total_amount, inv.status, inv.issued_at, inv.paid_at,
+               a.appointment_date, a.appointment_time, COALESCE(p.name, a.pet_name) AS pet_name
+        FROM invoices inv
+        LEFT JOIN appointments a ON inv.appointment_id = a.id
+        LEFT JOIN pets p ON p.id = a.pet_id
+        WHERE inv.owner_id = ?
+        ORDER BY inv.issued_at DESC, inv.id DESC LIMIT 26
+        """,
+        (42,),
+    ),
+    (
+        "pet_medical_history",
+        """
+        SELECT mr.id,
+               mr.weight, mr.temperature, mr.diagnosis, mr.notes, mr.created_at,
+               a.appointment_date, a.appointment_time,
+               s.full_name AS staff_name
+        FROM medical_records mr
+        LEFT JOIN appointments a ON mr.appointment_id = a.id
+        JOIN users s ON mr.staff_id = s.id
+        WHERE mr.pet_id = ?
+        ORDER BY mr.created_at DESC, mr.id DESC LIMIT 26
+        """,
+        (42,),
+    ),
+    (
+        "pet_prescriptions",
+        """
+        SELECT p.id, p.drug_name, p.dosage, p.frequency, p.duration,
+               p.instructions, p.created_at,
+               a.appointment_date, a.appointment_time,
+               s.full_name AS staff_name
+        FROM prescriptions p
+        LEFT JOIN appointments a ON p.appointment_id = a.id
+        JOIN users s ON p.staff_id = s.id
+        WHERE p.pet_id = ?
+        ORDER BY p.created_at DESC, p.id DESC LIMIT 26
+        """,
+        (42,),
+    ),
+    (
+        "my_pets",
+        """
+        SELECT id, name, species, breed, age, sex, notes, created_at
+        FROM pets
+        WHERE owner_id = ?
+        ORDER BY created_at DESC
+        """,
+        (42,),
+    ),
+    (
+        "admin_users (role filter)",
+        """
+        SELECT id, full_name, email, role, is_approved, created_at
+        FROM users
+        WHERE 1=1 AND role = ?
+        ORDER BY created_at DESC, id DESC LIMIT 26
+        """,
+        ("pet_owner",),
+    ),
+    (
+        "dashboard (pending staff)",
+        """
+        SELECT id, full_name, email, created_at
+        FROM users
+        WHERE role='clinic_staff' AND is_approved=0
+        ORDER BY created_at DESC
+        """,
+        (),
+    ),
+    (
+        "dashboard (counts)",
+        "SELECT COUNT(*) AS c FROM users WHERE role='clinic_staff' AND is_approved=1",
+        (),
+    ),
+]
+
+
+def seed(conn, appointments, owners, staff):
+    rnd = random.Random(1234)
+    start = time.perf_counter()
+
+    conn.executemany(
+        "INSERT INTO users (full_name, email, password_hash, role, is_approved) "
+        "VALUES (?, ?, 'x', ?, ?)",
+        [("Owner %d" % i, "owner%d@bench.local" % i, "pet_owner", 1) for i in range(owners)]
+        + [("Staff %d" % i, "staff%d@bench.local" % i, "clinic_staff", i % 5 != 0)
+           for i in range(staff)],
+    )
+    staff_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role='clinic_staff'")]
+    owner_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role='pet_owner'")]
+
+    conn.executemany(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, ?, 'dog')",
+        [(owner_ids[i % len(owner_ids)], "Pet %d" % i) for i in range(owners * 2)],
+    )
+    pets = conn.execute("SELECT id, owner_id, name FROM pets").fetchall()
+
+    statuses = ("pending", "confirmed", "rescheduled", "cancelled")
+
+    def appointment_rows():
+        for _ in range(appointments):
+            pet = pets[rnd.randrange(len(pets))]
+            day = "%04d-%02d-%02d" % (rnd.randint(2020, 2026), rnd.randint(1, 12), rnd.randint(1, 28))
+            yield (
+                pet[1], pet[0], pet[2], day,
+                "%02d:%02d" % (rnd.randint(8, 18), rnd.choice((0, 15, 30, 45))),
+                "check-up", rnd.choice(statuses),
+            )
+
+    conn.executemany(
+        "INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, "
+        "appointment_time, reason, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        appointment_rows(),
+    )
+
+    side = appointments // 10
+    conn.executemany(
+        "INSERT INTO medical_records (pet_id, appointment_id, staff_id, diagnosis) "
+        "VALUES (?, ?, ?, 'ok')",
+        ((pets[rnd.randrange(len(pets))][0], rnd.randint(1, appointments),
+          rnd.choice(staff_ids)) for _ in range(side)),
+    )
+    conn.executemany(
+        "INSERT INTO prescriptions (pet_id, appointment_id, staff_id, drug_name, dosage) "
+        "VALUES (?, ?, ?, 'Amoxicillin', '1 tab')",
+        ((pets[rnd.randrange(len(pets))][0], rnd.randint(1, appointments),
+          rnd.choice(staff_ids)) for _ in range(side)),
+    )
+    conn.executemany(
+        "INSERT INTO invoices (owner_id, appointment_id, total_amount, status) "
+        "VALUES (?, ?, ?, 'paid')",
+        ((rnd.choice(owner_ids), rnd.randint(1, appointments), rnd.randint(20, 400))
+         for _ in range(side)),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return time.perf_counter() - start
+
+
+def plan_problems(conn, sql, params):
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            problems.append(detail)
+        if "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return plan, problems
+
+
+def time_query(conn, sql, params, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=1_000_000)
+    parser.add_argument("--owners", type=int, default=20_000)
+    parser.add_argument("--staff", type=int, default=50)
+    parser.add_argument("--keep", help="keep the seeded database at this path")
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), "bench.db")
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()
+
+    conn = clinic._connect(path)
+    print("seeding %d appointments into %s ..." % (args.appointments, path))
+    print("seeded in %.1fs" % seed(conn, args.appointments, args.owners, args.staff))
+
+    failures = 0
+    for route, sql, params in ROUTE_QUERIES:
+        plan, problems = plan_problems(conn, sql, params)
+        ms = time_query(conn, sql, params)
+        status = "FAIL" if problems else "ok"
+        print("%-28s %8.3f ms  %s" % (route, ms, status))
+        for detail in plan:
+            print("    " + detail)
+        failures += bool(problems)
+
+    conn.close()
+    if not args.keep:
+        os.remove(path)
+    if failures:
+        print("%d route queries are not served by an index" % failures)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
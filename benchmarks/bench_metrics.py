@@ -0,0 +1,88 @@
+"""Cost of the /metrics instrumentation on the busiest pages.
+
+Usage (from the project root):
+
+    python benchmarks/bench_metrics.py --rounds 200 --requests 30
+
+Alternates short runs with METRICS_ENABLED off and on (the pool is
+emptied in between so connections are reopened with the matching
+factory).  Pairing many short rounds keeps CPU frequency drift out of the
+comparison; the overhead is the median of the per-round on/off ratios.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+
+PAGES = ("/dashboard/pet-owner", "/owner/pets", "/owner/invoices")
+
+
+def prepare(appointments):
+    clinic.app.config["DATABASE"] = os.path.join(tempfile.mkdtemp(), "bench_metrics.db")
+    clinic.init_db()
+    conn = clinic._connect()
+    conn.execute(
+        "INSERT INTO users (full_name, email, password_hash, role, is_approved) "
+        "VALUES ('Owner', 'owner@bench.test', 'x', 'pet_owner', 1)"
+    )
+    owner_id = conn.execute("SELECT id FROM users WHERE email = 'owner@bench.test'").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, reason, status) "
+        "VALUES (?, 'Rex', ?, '10:00', 'checkup', 'confirmed')",
+        ((owner_id, "2025-%02d-%02d" % (i % 12 + 1, i % 28 + 1)) for i in range(appointments)),
+    )
+    conn.executemany(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, ?, 'dog')",
+        ((owner_id, "Pet %d" % i) for i in range(10)),
+    )
+    conn.executemany(
+        "INSERT INTO invoices (owner_id, total_amount, status) VALUES (?, 40, 'paid')",
+        ((owner_id,) for _ in range(40)),
+    )
+    conn.commit()
+    conn.close()
+    return owner_id
+
+
+def run(enabled, requests, owner_id):
+    clinic.app.config["METRICS_ENABLED"] = enabled
+    clinic.get_pool().close_all()
+    client = clinic.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(user_id=owner_id, user_name="Owner", user_role="pet_owner")
+    t0 = time.process_time()
+    for i in range(requests):
+        client.get(PAGES[i % len(PAGES)])
+    return (time.process_time() - t0) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--appointments", type=int, default=200)
+    args = parser.parse_args()
+
+    owner_id = prepare(args.appointments)
+    run(True, 50, owner_id)  # chauffe
+    timings = {False: [], True: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            timings[enabled].append(run(enabled, args.requests, owner_id))
+
+    off = statistics.median(timings[False])
+    on = statistics.median(timings[True])
+    ratio = statistics.median(b / a for a, b in zip(timings[False], timings[True]))
+    print("metrics off  %.3f ms/request" % (off * 1000))
+    print("metrics on   %.3f ms/request" % (on * 1000))
+    print("overhead     %+.2f%% (median of paired rounds)" % ((ratio - 1) * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Per-page latency of keyset pagination vs OFFSET as the history grows.
+
+Usage (from the project root):
+
+    python benchmarks/bench_pagination.py --sizes 1000 10000 100000 1000000
+
+For each size, one owner gets that many invoices.  The script times the
+first page, a page reached by walking the cursor halfway down, and the
+same deep page fetched with LIMIT/OFFSET.  Keyset timings should stay flat.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+
+INVOICES_SQL = """
+    SELECT inv.id, inv.total_amount, inv.status, inv.issued_at, inv.paid_at,
+           a.appointment_date, a.appointment_time, a.pet_name
+    FROM invoices inv
+    LEFT JOIN appointments a ON inv.appointment_id = a.id
+    WHERE inv.owner_id = ?
+"""
+
+
+def seed(conn, owner_id, count):
+    conn.execute("DELETE FROM invoices")
+    conn.executemany(
+        "INSERT INTO invoices (owner_id, total_amount, status, issued_at) "
+        "VALUES (?, ?, 'paid', datetime('2020-01-01', ? || ' minutes'))",
+        ((owner_id, 10 + i % 90, i) for i in range(count)),
+    )
+    conn.commit()
+
+
+def timed(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--page-size", type=int, default=25)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_pages.db")
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()
+    conn = clinic._connect(path)
+    owner_id = conn.execute("SELECT id FROM users LIMIT 1").fetchone()[0]
+    size = args.page_size
+
+    print("%10s %14s %14s %14s" % ("rows", "first page", "deep keyset", "deep OFFSET"))
+    for count in args.sizes:
+        seed(conn, owner_id, count)
+        first_ms, page = timed(lambda: clinic.keyset_page(
+            conn, INVOICES_SQL, (owner_id,), "inv.issued_at", "inv.id", size))
+
+        # Curseur de la page située au milieu de l'historique
+        middle = count // 2
+        row = conn.execute(
+            "SELECT issued_at, id FROM invoices WHERE owner_id = ? "
+            "ORDER BY issued_at DESC, id DESC LIMIT 1 OFFSET ?",
+            (owner_id, middle),
+        ).fetchone()
+        cursor = (row[0], row[1])
+        deep_ms, _ = timed(lambda: clinic.keyset_page(
+            conn, INVOICES_SQL, (owner_id,), "inv.issued_at", "inv.id", size, after=cursor))
+        offset_ms, _ = timed(lambda: conn.execute(
+            INVOICES_SQL + " ORDER BY inv.issued_at DESC, inv.id DESC LIMIT ? OFFSET ?",
+            (owner_id, size, middle),
+        ).fetchall())
+        print("%10d %11.3f ms %11.3f ms %11.3f ms" % (count, first_ms, deep_ms, offset_ms))
+
+    conn.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Dashboard rows with the stored pet_name vs pet_id resolved through pet_cache.
+
+Usage (from the project root):
+
+    python benchmarks/bench_pet_names.py --scale 100k
+    python benchmarks/bench_pet_names.py --db /tmp/clinic_1m.db
+
+Runs the staff dashboard query (one busy day) and the owner dashboard
+query (a sample of owners) two ways on the same data:
+
+  stored   the pre-0014 statements, pet_name read from each row, with the
+           0003 covering indexes put back on a copy of the database
+  cache    the current statements (pet_id only) + appointment_pet_names(),
+           with a cold pet_cache (a new one for every call) and a warm one
+
+Row size is the average bytes of the values fetched per row (text as
+UTF-8, 8 per number).
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+from datagen import build, scale_value  # noqa: E402
+
+STORED = {
+    "staff_dashboard": """
+        SELECT a.id, a.pet_name, a.appointment_date, a.appointment_time,
+               a.reason, a.status, u.full_name AS owner_name
+        FROM appointments a
+        JOIN users u ON a.owner_id = u.id
+        WHERE a.appointment_date = ?
+        ORDER BY a.appointment_time
+    """,
+    "owner_dashboard": """
+        SELECT pet_name, appointment_date, appointment_time, reason, status
+        FROM appointments
+        WHERE owner_id = ?
+        ORDER BY appointment_date, appointment_time
+    """,
+}
+
+CACHED = {
+    "staff_dashboard": """
+        SELECT a.id, a.pet_id, a.appointment_date, a.appointment_time,
+               a.reason, a.status, u.full_name AS owner_name
+        FROM appointments a
+        JOIN users u ON a.owner_id = u.id
+        WHERE a.appointment_date = ?
+        ORDER BY a.appointment_time
+    """,
+    "owner_dashboard": """
+        SELECT id, pet_id, appointment_date, appointment_time, reason, status
+        FROM appointments
+        WHERE owner_id = ?
+        ORDER BY appointment_date, appointment_time
+    """,
+}
+
+# Index de 0003, avant 0014
+STORED_INDEXES = """
+DROP INDEX IF EXISTS idx_appointments_date_time;
+CREATE INDEX idx_appointments_date_time
+ON appointments (appointment_date, appointment_time, owner_id, status, pet_name, reason);
+DROP INDEX IF EXISTS idx_appointments_owner_date_time;
+CREATE INDEX idx_appointments_owner_date_time
+ON appointments (owner_id, appointment_date, appointment_time, status, pet_name, reason);
+"""
+
+
+def row_bytes(rows):
+    total = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, str):
+                total += len(value.encode("utf-8"))
+            elif value is not None:
+                total += 8
+    return total / max(len(rows), 1)
+
+
+def run_stored(conn, sql, params):
+    return conn.execute(sql, params).fetchall()
+
+
+def run_cached(conn, sql, params, cold):
+    warm_cache = clinic.pet_cache
+    if cold:
+        clinic.pet_cache = clinic.LRUCache(warm_cache.size, warm_cache.ttl)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        clinic.appointment_pet_names(conn, rows)
+    finally:
+        clinic.pet_cache = warm_cache
+    return rows
+
+
+def measure(variants, param_sets, rounds):
+    """{label: (p50 ms, p95 ms, row bytes)}; variants alternate within each round."""
+    timings = {label: [] for label, _ in variants}
+    sizes = {}
+    for _ in range(rounds):
+        for label, fn in variants:
+            for params in param_sets:
+                t0 = time.perf_counter()
+                rows = fn(params)
+                timings[label].append((time.perf_counter() - t0) * 1000)
+            sizes[label] = row_bytes(rows)
+    return {
+        label: (statistics.median(t), sorted(t)[max(int(len(t) * 0.95) - 1, 0)], sizes[label])
+        for label, t in timings.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="existing database (from datagen.py)")
+    parser.add_argument("--scale", default="100k", help="generated when --db is not given")
+    parser.add_argument("--owners", type=int, default=200, help="owners sampled for the owner dashboard")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = args.db
+    if path is None:
+        path = os.path.join(workdir, "bench_pet_names.db")
+        build(path, scale_value(args.scale))
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()
+
+    stored_path = os.path.join(workdir, "stored.db")
+    shutil.copyfile(path, stored_path)
+    stored_conn = clinic._connect(stored_path)
+    stored_conn.executescript(STORED_INDEXES)
+    conn = clinic._connect(path)
+
+    busy_day = conn.execute(
+        "SELECT day FROM appointment_counts_daily GROUP BY day ORDER BY SUM(appointment_count) DESC LIMIT 1"
+    ).fetchone()[0]
+    owner_ids = [r[0] for r in conn.execute("SELECT DISTINCT owner_id FROM appointments")]
+    owners = [(o,) for o in random.Random(1234).sample(owner_ids, min(args.owners, len(owner_ids)))]
+    cases = (
+        ("staff_dashboard", [(busy_day,)]),
+        ("owner_dashboard", owners),
+    )
+
+    print("%-16s %-7s %9s %9s %10s" % ("query", "names", "p50 ms", "p95 ms", "row bytes"))
+    for name, param_sets in cases:
+        variants = (
+            ("stored", lambda p: run_stored(stored_conn, STORED[name], p)),
+            ("cold", lambda p: run_cached(conn, CACHED[name], p, cold=True)),
+            ("warm", lambda p: run_cached(conn, CACHED[name], p, cold=False)),
+        )
+        measure(variants, param_sets, 1)  # chauffe
+        results = measure(variants, param_sets, args.rounds)
+        for label, _ in variants:
+            print("%-16s %-7s %9.3f %9.3f %10.1f" % ((name, label) + results[label]))
+    print("pet_cache: %s" % clinic.pet_cache.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""Load test of the application routes with a scripted owner / staff / admin mix.
+
+Usage (from the project root):
+
+    python benchmarks/bench_routes.py --scale 10k --sessions 200
+    python benchmarks/bench_routes.py --scale 100k --http wsgi --concurrency 32
+    python benchmarks/bench_routes.py --db /tmp/clinic.db --url http://127.0.0.1:5000
+    python benchmarks/bench_routes.py --scale 10k --baseline benchmarks/baseline.json
+    python benchmarks/bench_routes.py --scale 10k --save-baseline benchmarks/baseline.json
+
+The database comes from datagen.py (--scale), or an existing one (--db).
+Each virtual session picks a role by MIX weight and runs that role's
+SCRIPTS once, so every route in SCRIPTS is hit on every run: all the
+routes of the app except the CSV/NDJSON upload of the appointment import
+(POST, multipart), whose cost depends on the file.  By default requests
+go through Flask's test client in-process.  --http starts the WSGI or ASGI
+server (see bench_asgi.py), and --url targets a running server that uses
+the same --db; both drive real HTTP from --concurrency threads.
+
+The report gives count, errors, req/s and p50/p95/p99 per route.  With
+--baseline, the script exits 1 when a route's p95 is more than
+--tolerance slower than the stored value (and by at least
+--min-delta-ms; routes with fewer than --min-count samples are skipped),
+and 2 when any request failed.  benchmarks/baseline.json was recorded
+with the first command above; record your own on the machine that runs
+the comparison.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as clinic  # noqa: E402
+import datagen  # noqa: E402
+from bench_asgi import session_cookie, start  # noqa: E402
+
+# rôle -> poids dans le mélange de sessions
+MIX = {"pet_owner": 60, "clinic_staff": 25, "admin": 10, "anonymous": 5}
+
+# (endpoint, méthode, chemin, formulaire) ; les {champs} viennent du contexte de session
+SCRIPTS = {
+    "pet_owner": [
+        ("pet_owner_dashboard", "GET", "/dashboard/pet-owner", None),
+        ("my_pets", "GET", "/owner/pets", None),
+        ("pet_medical_history", "GET", "/owner/pets/{pet_id}/history", None),
+        ("pet_prescriptions", "GET", "/owner/pets/{pet_id}/prescriptions", None),
+        ("owner_invoices", "GET", "/owner/invoices", None),
+        ("pet_timeline", "GET", "/pets/{pet_id}/timeline", None),
+        ("api_pet_timeline", "GET", "/api/pets/{pet_id}/timeline", None),
+        ("api_availability", "GET", "/api/availability?date={visit_day}&days=7", None),
+        ("book_appointment", "GET", "/appointments/book", None),
+        ("book_appointment", "POST", "/appointments/book",
+         {"pet_id": "{pet_id}", "appointment_date": "{visit_day}", "appointment_time": "{slot}", "reason": "bench"}),
+        ("add_pet", "GET", "/owner/pets/add", None),
+        ("add_pet", "POST", "/owner/pets/add", {"name": "Bench {token}", "species": "dog"}),
+        ("edit_pet", "GET", "/owner/pets/{pet_id}/edit", None),
+        ("edit_pet", "POST", "/owner/pets/{pet_id}/edit", {"name": "{pet_name}", "species": "dog"}),
+        ("delete_pet", "POST", "/owner/pets/0/delete", None),
+    ],
+    "clinic_staff": [
+        ("staff_dashboard", "GET", "/dashboard/staff", None),
+        ("staff_schedule_view", "GET", "/staff/schedule?from={visit_day}", None),
+        ("api_staff_schedule", "GET", "/api/staff/schedule?from={visit_day}", None),
+        ("staff_search", "GET", "/staff/search?q={search_term}", None),
+        ("api_staff_search", "GET", "/api/staff/search?q={search_prefix}", None),
+        ("pet_timeline", "GET", "/pets/{any_pet_id}/timeline", None),
+        ("import_appointments_view", "GET", "/staff/appointments/import", None),
+        ("create_medical_record", "GET", "/staff/appointments/{appointment_id}/record", None),
+        ("create_medical_record", "POST", "/staff/appointments/{appointment_id}/record",
+         {"weight": "12.5", "temperature": "38.4", "diagnosis": "Healthy", "notes": "bench"}),
+        ("create_prescription", "GET", "/staff/appointments/{appointment_id}/prescription/new", None),
+        ("create_prescription", "POST", "/staff/appointments/{appointment_id}/prescription/new",
+         {"drug_name": "Amoxicillin", "dosage": "250 mg", "frequency": "twice a day", "duration": "7 days"}),
+        ("create_invoice", "GET", "/staff/appointments/{appointment_id}/invoice/new", None),
+        ("create_invoice", "POST", "/staff/appointments/{appointment_id}/invoice/new",
+         {"total_amount": "85", "status": "unpaid"}),
+        ("update_appointment_status", "POST", "/staff/appointments/{appointment_id}/status",
+         {"status": "confirmed"}),
+        ("batch_appointment_status", "POST", "/staff/appointments/status",
+         {"status": "confirmed", "appointment_ids": "{appointment_id}"}),
+        ("reschedule_appointment", "GET", "/staff/appointments/{appointment_id}/reschedule", None),
+        ("reschedule_appointment", "POST", "/staff/appointments/{appointment_id}/reschedule",
+         {"appointment_date": "{visit_day}", "appointment_time": "{slot}", "reason": "bench"}),
+    ],
+    "admin": [
+        ("dashboard", "GET", "/dashboard", None),
+        ("admin_users", "GET", "/admin/users", None),
+        ("admin_users", "GET", "/admin/users?role_filter=clinic_staff&approval_filter=approved", None),
+        ("update_user_role", "POST", "/admin/users/{owner_id}/role", {"role": "pet_owner"}),
+        ("approve_staff", "POST", "/admin/staff/{pending_staff_id}/approve", None),
+        ("reject_staff", "POST", "/admin/staff/0/reject", None),
+        ("admin_reports", "GET", "/admin/reports?month={month}", None),
+        ("admin_export", "GET", "/admin/export/invoices.csv?from={month}-01&to={month}-28", None),
+        ("admin_export", "GET", "/admin/export/appointments.ndjson?from={month}-01&to={month}-28", None),
+        ("admin_slow_queries", "GET", "/admin/slow-queries", None),
+        ("metrics", "GET", "/metrics", None),
+    ],
+    "anonymous": [
+        ("index", "GET", "/", None),
+        ("static", "GET", "/static/css/style.css", None),
+        ("register", "GET", "/register", None),
+        ("register", "POST", "/register",
+         {"fullName": "Bench {token}", "email": "new-{token}@bench.local", "password": "bench-password",
+          "confirmPassword": "bench-password", "userRole": "pet_owner", "terms": "on"}),
+        ("login", "GET", "/login", None),
+        ("login", "POST", "/login",
+         {"email": datagen.BENCH_OWNER, "password": datagen.BENCH_PASSWORD, "role": "pet_owner"}),
+        ("logout", "GET", "/logout", None),
+    ],
+}
+
+
+class Contexts:
+    """Logged-in sessions and the ids their scripts need, built once from the database."""
+
+    def __init__(self, per_role=50, seed=1234):
+        rnd = random.Random(seed)
+        conn = clinic._connect()
+        today = clinic.dt.date.today()
+        self.open_days = [day.isoformat() for day, _ in datagen.open_days(
+            today + clinic.dt.timedelta(days=1), today + clinic.dt.timedelta(days=60))]
+        self.month = today.strftime("%Y-%m")
+        self.pending_staff = [r[0] for r in conn.execute(
+            "SELECT id FROM users WHERE role='clinic_staff' AND is_approved=0")] or [0]
+        self.appointments = [r[0] for r in conn.execute(
+            "SELECT id FROM appointments WHERE appointment_date >= ? AND status != 'cancelled' "
+            "ORDER BY appointment_date LIMIT 2000", (today.isoformat(),))]
+        owners = conn.execute(
+            "SELECT u.id, u.full_name, p.id AS pet_id, p.name AS pet_name FROM users u "
+            "JOIN pets p ON p.owner_id = u.id WHERE u.role = 'pet_owner' GROUP BY u.id "
+            "ORDER BY random() LIMIT ?", (per_role,)).fetchall()
+        staff = conn.execute(
+            "SELECT id, full_name FROM users WHERE role='clinic_staff' AND is_approved=1 LIMIT ?",
+            (per_role,)).fetchall()
+        admin = conn.execute("SELECT id, full_name FROM users WHERE role='admin' LIMIT 1").fetchone()
+        # Recherche staff : noms d'animaux réels, en entier et tels que tapés (typeahead)
+        self.pet_names = [o["pet_name"] for o in owners]
+        conn.close()
+
+        def cookie(user, role):
+            return session_cookie({"user_id": user["id"], "user_name": user["full_name"], "user_role": role})
+
+        self.sessions = {
+            "pet_owner": [dict(cookie=cookie(o, "pet_owner"), owner_id=o["id"], pet_id=o["pet_id"],
+                               pet_name=o["pet_name"]) for o in owners],
+            "clinic_staff": [dict(cookie=cookie(s, "clinic_staff")) for s in staff],
+            "admin": [dict(cookie=cookie(admin, "admin"), owner_id=owners[0]["id"])],
+            "anonymous": [dict(cookie=None)],
+        }
+        self._rnd = rnd
+
+    def pick(self, role, rnd):
+        ctx = dict(rnd.choice(self.sessions[role]))
+        search_term = rnd.choice(self.pet_names)
+        ctx.update(
+            visit_day=rnd.choice(self.open_days),
+            slot="%02d:%s" % (rnd.randint(8, 17), rnd.choice(("00", "30"))),
+            appointment_id=rnd.choice(self.appointments) if self.appointments else 0,
+            pending_staff_id=rnd.choice(self.pending_staff),
+            any_pet_id=rnd.choice(self.sessions["pet_owner"])["pet_id"],
+            search_term=search_term,
+            search_prefix=search_term[:3],
+            month=self.month,
+            token="%d-%d" % (os.getpid(), rnd.getrandbits(48)),
+        )
+        return ctx
+
+
+def checked_status(status, location, logged_in):
+    """For a logged-in session, a redirect to the login page is a rejected session: count it as a 401."""
+    if logged_in and 300 <= status < 400 and location and urllib.parse.urlsplit(location).path == "/login":
+        return 401
+    return status
+
+
+class TestClientDriver:
+    def __init__(self, cookie):
+        self.client = clinic.app.test_client()
+        self.logged_in = bool(cookie)
+        if cookie:
+            self.client.set_cookie("session", cookie)
+
+    def request(self, method, path, form):
+        response = self.client.open(path, method=method, data=form)
+        response.get_data()
+        response.close()
+        return checked_status(response.status_code, response.headers.get("Location"), self.logged_in)
+
+
+class HttpDriver:
+    def __init__(self, base_url, cookie):
+        parts = urllib.parse.urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.cookie = cookie
+
+    def request(self, method, path, form):
+        headers = {"Connection": "close"}
+        if self.cookie:
+            headers["Cookie"] = "session=" + self.cookie
+        body = None
+        if form is not None or method == "POST":
+            body = urllib.parse.urlencode(form or {})
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return checked_status(response.status, response.getheader("Location"), bool(self.cookie))
+        finally:
+            conn.close()
+
+
+def fill(value, ctx):
+    if isinstance(value, dict):
+        return {k: fill(v, ctx) for k, v in value.items()}
+    return value.format(**ctx) if value is not None else None
+
+
+def run(contexts, make_driver, sessions, concurrency, seed):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    remaining = [sessions]
+    roles, weights = zip(*MIX.items())
+
+    def worker(n):
+        rnd = random.Random(seed + n)
+        mine = defaultdict(list)
+        failed = defaultdict(int)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            role = rnd.choices(roles, weights)[0]
+            ctx = contexts.pick(role, rnd)
+            driver = make_driver(ctx["cookie"])
+            for endpoint, method, path, form in SCRIPTS[role]:
+                label = "%s %s" % (endpoint, method)
+                t0 = time.perf_counter()
+                try:
+                    status = driver.request(method, fill(path, ctx), fill(form, ctx))
+                except OSError:
+                    status = 599
+                mine[label].append(time.perf_counter() - t0)
+                if status >= 400:
+                    failed[label] += 1
+        with lock:
+            for label, values in mine.items():
+                latencies[label] += values
+            for label, count in failed.items():
+                errors[label] += count
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def summarize(elapsed, latencies, errors):
+    report = {}
+    for label, values in sorted(latencies.items()):
+        values.sort()
+        report[label] = {
+            "count": len(values),
+            "errors": errors.get(label, 0),
+            "rps": len(values) / elapsed,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+        }
+    return report
+
+
+def compare(report, baseline, tolerance, min_delta_ms, min_count):
+    regressions = []
+    for label, base in baseline["routes"].items():
+        current = report.get(label)
+        if current is None or min(current["count"], base["count"]) < min_count:
+            continue  # trop peu de mesures pour un p95 stable
+        if current["p95"] > base["p95"] * (1 + tolerance) and current["p95"] - base["p95"] >= min_delta_ms:
+            regressions.append((label, base["p95"], current["p95"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="datagen scale when --db is not given")
+    parser.add_argument("--db", help="use this database instead of generating one")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--http", choices=("wsgi", "asgi"), help="start this server and load it over HTTP")
+    parser.add_argument("--url", help="load a running server (it must use --db)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", help="baseline JSON to compare p95 against")
+    parser.add_argument("--save-baseline", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    parser.add_argument("--min-count", type=int, default=20, help="skip routes with fewer samples")
+    args = parser.parse_args()
+
+    if args.url and not args.db:
+        parser.error("--url needs --db (the server's database)")
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_routes.db")
+        print("generating %s appointments ..." % args.scale)
+        datagen.build(path, datagen.scale_value(args.scale), args.seed)
+    clinic.app.config["DATABASE"] = path
+    clinic.app.config["SESSION_BACKEND"] = "sqlite"
+
+    contexts = Contexts(seed=args.seed)
+    server = None
+    if args.http:
+        server, port = start(args.http, path)
+        base_url = "http://127.0.0.1:%d" % port
+    else:
+        base_url = args.url
+    mode = args.http or ("url" if args.url else "test-client")
+
+    try:
+        if base_url:
+            make_driver = lambda cookie: HttpDriver(base_url, cookie)  # noqa: E731
+        else:
+            make_driver = TestClientDriver
+        elapsed, latencies, errors = run(contexts, make_driver, args.sessions, args.concurrency, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = summarize(elapsed, latencies, errors)
+    total = sum(r["count"] for r in report.values())
+    print("%-34s %6s %6s %8s %8s %8s %8s" % ("route", "count", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+    for label, r in report.items():
+        print("%-34s %6d %6d %8.1f %8.2f %8.2f %8.2f"
+              % (label, r["count"], r["errors"], r["rps"], r["p50"], r["p95"], r["p99"]))
+    print("%d requests in %.1fs (%.1f req/s, mode %s)" % (total, elapsed, total / elapsed, mode))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump({"scale": args.db or args.scale, "mode": mode,
+                       "routes": {label: {"count": r["count"], "p50": round(r["p50"], 3), "p95": round(r["p95"], 3)}
+                                  for label, r in report.items()}},
+                      fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print("baseline written to %s" % args.save_baseline)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if (baseline.get("scale"), baseline.get("mode")) != (args.db or args.scale, mode):
+            print("warning: baseline was recorded with scale %s / mode %s"
+                  % (baseline.get("scale"), baseline.get("mode")))
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms, args.min_count)
+        for label, before, after in regressions:
+            print("REGRESSION %-34s p95 %.2f ms -> %.2f ms" % (label, before, after))
+        if regressions:
+            status = 1
+    if any(r["errors"] for r in report.values()):
+        print("some requests failed")
+        status = status or 2
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
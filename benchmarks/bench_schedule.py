@@ -0,0 +1,111 @@
+"""Latency of the staff schedule (/staff/schedule) on a synthetic database.
+
+Usage (from the project root):
+
+    python benchmarks/datagen.py --scale 1m --out /tmp/clinic_1m.db
+    python benchmarks/bench_schedule.py --db /tmp/clinic_1m.db --days 7
+
+Times, for windows of --days starting on the busiest dates:
+
+  query    load_staff_days() alone: range scan + per-day grouping + pet names
+  first    the streamed page up to its first day (what the browser gets first)
+  cold     the whole page, day fragments rendered (empty fragment_cache)
+  warm     the whole page again, every day served from fragment_cache
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+from datagen import build, scale_value  # noqa: E402
+
+
+def windows(conn, days, count):
+    """Start dates of the `count` busiest windows of `days` days."""
+    rows = conn.execute(
+        """
+        SELECT day, SUM(appointment_count) OVER (
+                   ORDER BY day ROWS BETWEEN CURRENT ROW AND ? FOLLOWING) AS total
+        FROM (SELECT day, SUM(appointment_count) AS appointment_count
+              FROM appointment_counts_daily GROUP BY day)
+        ORDER BY total DESC
+        LIMIT ?
+        """,
+        (days - 1, count),
+    ).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+def schedule_page(conn, first, last, today, stop_after_first=False):
+    with clinic.app.test_request_context("/staff/schedule"):
+        days = clinic.staff_schedule(conn, first, last, today)
+        for n, (day, markup) in enumerate(days):
+            str(markup)
+            if stop_after_first:
+                break
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print("%-6s p50 %7.2f ms  p95 %7.2f ms  max %7.2f ms" % (name, statistics.median(timings), p95, timings[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="existing database (from datagen.py)")
+    parser.add_argument("--scale", default="100k", help="generated when --db is not given")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--windows", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_schedule.db")
+        build(path, scale_value(args.scale))
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()
+    conn = clinic._connect(path)
+
+    starts = windows(conn, args.days, args.windows)
+    print("%d windows of %d days, %d-%d appointments each" % (
+        len(starts), args.days, min(s[1] for s in starts), max(s[1] for s in starts)))
+    ranges = []
+    for start, _ in starts:
+        last = (clinic.dt.date.fromisoformat(start) + clinic.dt.timedelta(days=args.days - 1)).isoformat()
+        ranges.append((start, last))
+    today = clinic.dt.date.today().isoformat()
+
+    timings = {"query": [], "first": [], "cold": [], "warm": []}
+    for _ in range(args.rounds):
+        for first, last in ranges:
+            t0 = time.perf_counter()
+            for _day in clinic.load_staff_days(conn, first, last):
+                pass
+            timings["query"].append((time.perf_counter() - t0) * 1000)
+
+            clinic.fragment_cache.invalidate()
+            t0 = time.perf_counter()
+            schedule_page(conn, first, last, today, stop_after_first=True)
+            timings["first"].append((time.perf_counter() - t0) * 1000)
+
+            clinic.fragment_cache.invalidate()
+            t0 = time.perf_counter()
+            schedule_page(conn, first, last, today)
+            timings["cold"].append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            schedule_page(conn, first, last, today)
+            timings["warm"].append((time.perf_counter() - t0) * 1000)
+    for name, values in timings.items():
+        report(name, values)
+
+
+if __name__ == "__main__":
+    main()
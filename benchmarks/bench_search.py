@@ -0,0 +1,100 @@
+"""Latency of the staff search (FTS5) on a synthetic database.
+
+Usage (from the project root):
+
+    python benchmarks/datagen.py --scale 1m --out /tmp/clinic_1m.db
+    python benchmarks/bench_search.py --db /tmp/clinic_1m.db --target-p95-ms 50
+
+Without --db a database is generated at --scale.  Each query is run the
+way the typeahead sends it, one keystroke at a time ("am", "amo", ...),
+with the suggestion limit, then once with the full-page limit.  Exits
+with status 1 when a p95 is over its target.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+from datagen import build, scale_value  # noqa: E402
+
+
+def sample_queries(conn, count, seed=1234):
+    """Owner and pet names, diagnoses and drugs actually present in the data."""
+    rnd = random.Random(seed)
+    max_pet = conn.execute("SELECT MAX(id) FROM pets").fetchone()[0]
+    max_user = conn.execute("SELECT MAX(id) FROM users").fetchone()[0]
+    queries = ["healthy", "amoxicillin", "meloxicam 1.5", "twice a day"]
+    while len(queries) < count:
+        if rnd.random() < 0.5:
+            row = conn.execute("SELECT name FROM pets WHERE id >= ? LIMIT 1", (rnd.randint(1, max_pet),)).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT full_name FROM users WHERE id >= ? AND role = 'pet_owner' LIMIT 1",
+                (rnd.randint(1, max_user),),
+            ).fetchone()
+        if row:
+            queries.append(row[0])
+    return queries
+
+
+def keystrokes(query):
+    """'amox' -> ['am', 'amo', 'amox'], as typed into the search box."""
+    return [query[:n] for n in range(2, len(query) + 1) if query[n - 1] != " "]
+
+
+def timed(conn, text, limit):
+    t0 = time.perf_counter()
+    clinic.search(conn, text, limit)
+    return (time.perf_counter() - t0) * 1000
+
+
+def report(name, timings, target):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    status = "ok" if target is None or p95 <= target else "OVER"
+    print("%-10s n=%-6d p50 %7.2f ms  p95 %7.2f ms  max %7.2f ms  %s" % (
+        name, len(timings), statistics.median(timings), p95, timings[-1], status))
+    return status == "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="existing database (from datagen.py)")
+    parser.add_argument("--scale", default="100k", help="generated when --db is not given")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--target-p95-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+        build(path, scale_value(args.scale))
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()  # applique la migration de l'index si besoin
+    conn = clinic._connect(path)
+    rows = conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0]
+    print("%s: %d indexed rows" % (path, rows))
+
+    queries = sample_queries(conn, args.queries)
+    for text in queries[:20]:
+        clinic.search(conn, text, 8)  # chauffe du cache de pages
+    typeahead = [
+        timed(conn, prefix, clinic.app.config["SEARCH_SUGGEST_LIMIT"])
+        for text in queries for prefix in keystrokes(text)
+    ]
+    full = [timed(conn, text, clinic.app.config["SEARCH_LIMIT"]) for text in queries]
+
+    ok = report("typeahead", typeahead, args.target_p95_ms)
+    ok = report("search", full, args.target_p95_ms) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
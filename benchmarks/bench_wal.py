@@ -0,0 +1,127 @@
+"""Read throughput under concurrent writes: rollback journal vs WAL + writer queue.
+
+Usage (from the project root):
+
+    python benchmarks/bench_wal.py --seconds 5 --readers 8 --writers 4
+
+Readers run the staff_dashboard query on their own connections while the
+writer threads keep inserting appointments.  The "rollback" run writes on
+plain connections with journal_mode=DELETE; the "wal" run uses the app's
+WAL configuration and funnels every write through DbWriter.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3  # noqa: E402
+
+import app as clinic  # noqa: E402
+
+READ_SQL = """
+    SELECT a.id, a.pet_name, a.appointment_date, a.appointment_time,
+           a.reason, a.status, u.full_name AS owner_name
+    FROM appointments a
+    JOIN users u ON a.owner_id = u.id
+    WHERE a.appointment_date = ?
+    ORDER BY a.appointment_time
+"""
+
+WRITE_SQL = """
+    INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date,
+                              appointment_time, reason, status)
+    VALUES (1, NULL, 'Bench', ?, '10:00', 'load', 'pending')
+"""
+
+
+def prepare(journal_mode, rows):
+    path = os.path.join(tempfile.mkdtemp(), "bench_%s.db" % journal_mode.lower())
+    clinic.app.config["DATABASE"] = path
+    clinic.app.config["DB_JOURNAL_MODE"] = journal_mode
+    clinic.init_db()
+    conn = clinic._connect(path)
+    conn.executemany(WRITE_SQL, (("2025-06-%02d" % (i % 28 + 1),) for i in range(rows)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def run(mode, seconds, readers, writers, rows):
+    path = prepare("WAL" if mode == "wal" else "DELETE", rows)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    writer = clinic.DbWriter(path) if mode == "wal" else None
+
+    def reader():
+        conn = clinic._connect(path)
+        n = locked = 0
+        while not stop.is_set():
+            try:
+                conn.execute(READ_SQL, ("2025-06-15",)).fetchall()
+                n += 1
+            except sqlite3.OperationalError:
+                locked += 1
+        conn.close()
+        with lock:
+            counts["reads"] += n
+            counts["locked"] += locked
+
+    def write_loop():
+        conn = None if writer else clinic._connect(path)
+        n = locked = 0
+        while not stop.is_set():
+            try:
+                if writer:
+                    writer.submit(lambda c: c.execute(WRITE_SQL, ("2025-06-15",)))
+                else:
+                    conn.execute(WRITE_SQL, ("2025-06-15",))
+                    conn.commit()
+                n += 1
+            except sqlite3.OperationalError:
+                locked += 1
+        if conn is not None:
+            conn.close()
+        with lock:
+            counts["writes"] += n
+            counts["locked"] += locked
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=write_loop) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    if writer:
+        writer.stop()
+    return {k: v / seconds if k != "locked" else v for k, v in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("rollback", "wal"):
+        results[mode] = run(mode, args.seconds, args.readers, args.writers, args.rows)
+        r = results[mode]
+        print("%-9s reads/s %9.0f   writes/s %7.0f   lock errors %d"
+              % (mode, r["reads"], r["writes"], r["locked"]))
+
+    if results["rollback"]["reads"]:
+        print("read throughput gain: x%.2f"
+              % (results["wal"]["reads"] / results["rollback"]["reads"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Synthetic clinic data at 10k / 100k / 1M appointments.
+
+Usage (from the project root):
+
+    python benchmarks/datagen.py --scale 100k --out /tmp/clinic_100k.db
+
+The scale is the number of appointments; owners, pets, staff, medical
+records, prescriptions and invoices are derived from it.  Appointments are
+spread from two years ago to two months ahead on open slots, so today's
+staff dashboard and the availability API have realistic data.  The same
+seed always produces the same database.
+
+Two accounts get a real password hash for the login step of the load mix:
+BENCH_OWNER and BENCH_STAFF, both with BENCH_PASSWORD.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import app as clinic  # noqa: E402
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+BENCH_OWNER = "owner@bench.local"
+BENCH_STAFF = "staff@bench.local"
+BENCH_PASSWORD = "bench-password"
+
+STATUSES = ("pending", "confirmed", "confirmed", "confirmed", "rescheduled", "cancelled")
+SPECIES = ("dog", "cat", "rabbit", "bird")
+REASONS = ("check-up", "vaccination", "limping", "skin rash", "dental cleaning")
+DRUGS = (("Amoxicillin", "250 mg"), ("Meloxicam", "1.5 mg/ml"), ("Prednisolone", "5 mg"))
+
+
+def scale_value(text):
+    """'10k', '100k', '1m' or a plain number of appointments."""
+    text = text.lower()
+    return SCALES[text] if text in SCALES else int(text)
+
+
+def open_days(first, last):
+    day = first
+    while day <= last:
+        slots = clinic.day_slots(day)
+        if slots:
+            yield day, [clinic.minutes_to_time(m) for m in slots]
+        day += dt.timedelta(days=1)
+
+
+def generate(conn, appointments, seed=1234):
+    """Fill an empty, migrated database; returns a summary dict."""
+    rnd = random.Random(seed)
+    owners = max(appointments // 20, 50)
+    staff = max(appointments // 2000, 5)
+    today = dt.date.today()
+    password_hash = generate_password_hash(BENCH_PASSWORD, clinic.app.config["PASSWORD_HASH_METHOD"])
+
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO users (full_name, email, password_hash, role, is_approved, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [("Bench Owner", BENCH_OWNER, password_hash, "pet_owner", 1, "2023-01-01 08:00:00"),
+         ("Bench Staff", BENCH_STAFF, password_hash, "clinic_staff", 1, "2023-01-01 08:00:00")]
+        + [("Owner %d" % i, "owner%d@bench.local" % i, "x", "pet_owner", 1,
+            "2023-%02d-%02d 09:00:00" % (i % 12 + 1, i % 28 + 1)) for i in range(owners)]
+        + [("Staff %d" % i, "staff%d@bench.local" % i, "x", "clinic_staff", int(i >= 3),
+            "2024-01-%02d 09:00:00" % (i % 28 + 1)) for i in range(staff)],
+    )
+    owner_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role='pet_owner'")]
+    staff_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM users WHERE role='clinic_staff' AND is_approved=1")]
+
+    conn.executemany(
+        "INSERT INTO pets (owner_id, name, species, age, sex) VALUES (?, ?, ?, ?, ?)",
+        ((owner_id, "Pet %d-%d" % (owner_id, n), rnd.choice(SPECIES), rnd.randint(1, 15), rnd.choice("MF"))
+         for owner_id in owner_ids for n in range(rnd.randint(1, 3))),
+    )
+    pets = conn.execute("SELECT id, owner_id, name FROM pets").fetchall()
+
+    days = list(open_days(today - dt.timedelta(days=730), today + dt.timedelta(days=60)))
+    capacity = len(staff_ids) * clinic.app.config["SLOT_CAPACITY_PER_STAFF"]
+
+    def appointment_rows():
+        # Remplit les jours au hasard sans dépasser la capacité d'un créneau
+        taken = {}
+        for _ in range(appointments):
+            while True:
+                day, slots = days[rnd.randrange(len(days))]
+                slot = rnd.choice(slots)
+                if taken.get((day, slot), 0) < capacity:
+                    break
+            taken[(day, slot)] = taken.get((day, slot), 0) + 1
+            pet = pets[rnd.randrange(len(pets))]
+            status = rnd.choice(STATUSES) if day >= today else rnd.choice(("confirmed", "cancelled"))
+            yield (pet[1], pet[0], pet[2], day.isoformat(), slot, rnd.choice(REASONS), status)
+
+    conn.executemany(
+        "INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, "
+        "appointment_time, reason, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        appointment_rows(),
+    )
+    past = conn.execute(
+        "SELECT id, pet_id, owner_id, appointment_date, appointment_time FROM appointments "
+        "WHERE appointment_date < ? AND status = 'confirmed'", (today.isoformat(),)
+    ).fetchall()
+    rnd.shuffle(past)
+
+    visits = past[: appointments // 3]
+    conn.executemany(
+        "INSERT INTO medical_records (pet_id, appointment_id, staff_id, weight, temperature, "
+        "diagnosis, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((a[1], a[0], rnd.choice(staff_ids), round(rnd.uniform(2, 40), 1), round(rnd.uniform(37.5, 39.5), 1),
+          "Healthy", "%s %s:00" % (a[3], a[4])) for a in visits),
+    )
+    conn.executemany(
+        "INSERT INTO prescriptions (pet_id, appointment_id, staff_id, drug_name, dosage, "
+        "frequency, duration, created_at) VALUES (?, ?, ?, ?, ?, 'twice a day', '7 days', ?)",
+        ((a[1], a[0], rnd.choice(staff_ids)) + rnd.choice(DRUGS) + ("%s %s:00" % (a[3], a[4]),)
+         for a in visits[: appointments // 4]),
+    )
+    conn.executemany(
+        "INSERT INTO invoices (owner_id, appointment_id, total_amount, status, issued_at, paid_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((a[2], a[0], rnd.randint(30, 400), status, "%s %s:00" % (a[3], a[4]),
+          "%s %s:00" % (a[3], a[4]) if status == "paid" else None)
+         for a, status in ((a, rnd.choice(("paid", "paid", "unpaid", "cancelled")))
+                           for a in past[: appointments // 2])),
+    )
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA synchronous = %s" % clinic.app.config["DB_SYNCHRONOUS"])
+    return {
+        table: conn.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0]
+        for table in ("users", "pets", "appointments", "medical_records", "prescriptions", "invoices")
+    }
+
+
+def build(path, appointments, seed=1234):
+    """Create, migrate and fill the database at `path`."""
+    clinic.app.config["DATABASE"] = path
+    clinic.init_db()
+    conn = clinic._connect(path)
+    conn.isolation_level = None
+    try:
+        return generate(conn, appointments, seed)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a number of appointments")
+    parser.add_argument("--out", required=True, help="database file to create")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        parser.error("%s already exists" % args.out)
+    started = time.perf_counter()
+    counts = build(args.out, scale_value(args.scale), args.seed)
+    for table, count in counts.items():
+        print("%-16s %9d" % (table, count))
+    print("generated in %.1fs" % (time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+-- Schéma initial : tables de base de la clinique.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('pet_owner','clinic_staff','admin')),
+    is_approved INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    pet_name TEXT NOT NULL,
+    appointment_date TEXT NOT NULL,  -- YYYY-MM-DD
+    appointment_time TEXT NOT NULL,  -- HH:MM
+    reason TEXT,
+    status TEXT NOT NULL CHECK(status IN ('pending','confirmed','rescheduled','cancelled')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(owner_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS pets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    species TEXT,
+    breed TEXT,
+    age INTEGER,
+    sex TEXT,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(owner_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS medical_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pet_id INTEGER NOT NULL,
+    appointment_id INTEGER,
+    staff_id INTEGER NOT NULL,
+    weight REAL,
+    temperature REAL,
+    diagnosis TEXT NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(pet_id) REFERENCES pets(id),
+    FOREIGN KEY(appointment_id) REFERENCES appointments(id),
+    FOREIGN KEY(staff_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS prescriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pet_id INTEGER NOT NULL,
+    appointment_id INTEGER,
+    medical_record_id INTEGER,
+    staff_id INTEGER NOT NULL,
+    drug_name TEXT NOT NULL,
+    dosage TEXT NOT NULL,
+    frequency TEXT,
+    duration TEXT,
+    instructions TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(pet_id) REFERENCES pets(id),
+    FOREIGN KEY(appointment_id) REFERENCES appointments(id),
+    FOREIGN KEY(medical_record_id) REFERENCES medical_records(id),
+    FOREIGN KEY(staff_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    appointment_id INTEGER,
+    total_amount REAL NOT NULL,
+    status TEXT NOT NULL CHECK(status IN ('unpaid','paid','cancelled')),
+    issued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    paid_at TIMESTAMP,
+    notes TEXT,
+    FOREIGN KEY(owner_id) REFERENCES users(id),
+    FOREIGN KEY(appointment_id) REFERENCES appointments(id)
+);
@@ -0,0 +1,13 @@
+"""Lier chaque rendez-vous à un animal (appointments.pet_id).
+
+Les anciennes bases ont été créées avant la colonne ; on ne l'ajoute que si
+elle manque, au lieu de tenter l'ALTER TABLE à chaque démarrage.
+"""
+
+
+def upgrade(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(appointments)")}
+    if "pet_id" not in columns:
+        conn.execute(
+            "ALTER TABLE appointments ADD COLUMN pet_id INTEGER REFERENCES pets(id)"
+        )
@@ -0,0 +1,33 @@
+-- Index composites (couvrants quand c'est possible) pour les requêtes
+-- les plus fréquentes des routes.
+
+-- staff_dashboard : WHERE appointment_date = ? ORDER BY appointment_time
+CREATE INDEX IF NOT EXISTS idx_appointments_date_time
+ON appointments (appointment_date, appointment_time,
+                 owner_id, status, pet_name, reason);
+
+-- pet_owner_dashboard : WHERE owner_id = ? ORDER BY date, time
+CREATE INDEX IF NOT EXISTS idx_appointments_owner_date_time
+ON appointments (owner_id, appointment_date, appointment_time,
+                 status, pet_name, reason);
+
+-- owner_invoices : WHERE owner_id = ? ORDER BY issued_at DESC
+CREATE INDEX IF NOT EXISTS idx_invoices_owner_issued
+ON invoices (owner_id, issued_at, appointment_id,
+             total_amount, status, paid_at);
+
+-- pet_medical_history : WHERE pet_id = ? ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS idx_medical_records_pet_created
+ON medical_records (pet_id, created_at);
+
+-- pet_prescriptions : WHERE pet_id = ? ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS idx_prescriptions_pet_created
+ON prescriptions (pet_id, created_at);
+
+-- my_pets / book_appointment : WHERE owner_id = ? ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS idx_pets_owner_created
+ON pets (owner_id, created_at);
+
+-- dashboard : COUNT(*) par rôle + liste du staff en attente
+CREATE INDEX IF NOT EXISTS idx_users_role_approved_created
+ON users (role, is_approved, created_at);
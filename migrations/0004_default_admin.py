@@ -0,0 +1,16 @@
+"""Compte administrateur par défaut (à changer après la première connexion)."""
+
+from werkzeug.security import generate_password_hash
+
+
+def upgrade(conn):
+    cur = conn.execute("SELECT id FROM users WHERE role='admin' LIMIT 1")
+    if cur.fetchone() is None:
+        conn.execute(
+            """
+            INSERT INTO users (full_name, email, password_hash, role, is_approved)
+            VALUES (?, ?, ?, ?, 1)
+            """,
+            ("System Admin", "admin@petclinic.local",
+             generate_password_hash("admin123"), "admin"),
+        )
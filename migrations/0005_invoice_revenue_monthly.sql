@@ -0,0 +1,49 @@
+-- Cumul mensuel des factures par statut, tenu à jour par triggers, pour que
+-- le tableau de bord admin lise le chiffre du mois sans parcourir invoices.
+
+CREATE TABLE IF NOT EXISTS invoice_revenue_monthly (
+    month TEXT NOT NULL,            -- YYYY-MM (issued_at, UTC)
+    status TEXT NOT NULL,
+    total_amount REAL NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, status)
+);
+
+INSERT INTO invoice_revenue_monthly (month, status, total_amount, invoice_count)
+SELECT strftime('%Y-%m', issued_at), status, SUM(total_amount), COUNT(*)
+FROM invoices
+GROUP BY 1, 2;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_revenue_insert
+AFTER INSERT ON invoices
+BEGIN
+    INSERT INTO invoice_revenue_monthly (month, status, total_amount, invoice_count)
+    VALUES (strftime('%Y-%m', NEW.issued_at), NEW.status, NEW.total_amount, 1)
+    ON CONFLICT (month, status) DO UPDATE SET
+        total_amount = total_amount + excluded.total_amount,
+        invoice_count = invoice_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_revenue_delete
+AFTER DELETE ON invoices
+BEGIN
+    UPDATE invoice_revenue_monthly
+    SET total_amount = total_amount - OLD.total_amount,
+        invoice_count = invoice_count - 1
+    WHERE month = strftime('%Y-%m', OLD.issued_at) AND status = OLD.status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_revenue_update
+AFTER UPDATE OF total_amount, status, issued_at ON invoices
+BEGIN
+    UPDATE invoice_revenue_monthly
+    SET total_amount = total_amount - OLD.total_amount,
+        invoice_count = invoice_count - 1
+    WHERE month = strftime('%Y-%m', OLD.issued_at) AND status = OLD.status;
+
+    INSERT INTO invoice_revenue_monthly (month, status, total_amount, invoice_count)
+    VALUES (strftime('%Y-%m', NEW.issued_at), NEW.status, NEW.total_amount, 1)
+    ON CONFLICT (month, status) DO UPDATE SET
+        total_amount = total_amount + excluded.total_amount,
+        invoice_count = invoice_count + 1;
+END;
@@ -0,0 +1,97 @@
+-- Cumuls pour les rapports admin : chiffre d'affaires par jour et statut,
+-- nombre de rendez-vous par jour et statut. Tenus à jour par triggers ;
+-- `flask reports rebuild` les recalcule, `flask reports check` les vérifie.
+
+CREATE TABLE IF NOT EXISTS invoice_revenue_daily (
+    day TEXT NOT NULL,              -- YYYY-MM-DD (issued_at, UTC)
+    status TEXT NOT NULL,
+    total_amount REAL NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+);
+
+CREATE TABLE IF NOT EXISTS appointment_counts_daily (
+    day TEXT NOT NULL,              -- appointment_date
+    status TEXT NOT NULL,
+    appointment_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+);
+
+INSERT INTO invoice_revenue_daily (day, status, total_amount, invoice_count)
+SELECT date(issued_at), status, SUM(total_amount), COUNT(*)
+FROM invoices
+GROUP BY 1, 2;
+
+INSERT INTO appointment_counts_daily (day, status, appointment_count)
+SELECT appointment_date, status, COUNT(*)
+FROM appointments
+GROUP BY 1, 2;
+
+-- Factures : cumul journalier
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_revenue_daily_insert
+AFTER INSERT ON invoices
+BEGIN
+    INSERT INTO invoice_revenue_daily (day, status, total_amount, invoice_count)
+    VALUES (date(NEW.issued_at), NEW.status, NEW.total_amount, 1)
+    ON CONFLICT (day, status) DO UPDATE SET
+        total_amount = total_amount + excluded.total_amount,
+        invoice_count = invoice_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_revenue_daily_delete
+AFTER DELETE ON invoices
+BEGIN
+    UPDATE invoice_revenue_daily
+    SET total_amount = total_amount - OLD.total_amount,
+        invoice_count = invoice_count - 1
+    WHERE day = date(OLD.issued_at) AND status = OLD.status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_revenue_daily_update
+AFTER UPDATE OF total_amount, status, issued_at ON invoices
+BEGIN
+    UPDATE invoice_revenue_daily
+    SET total_amount = total_amount - OLD.total_amount,
+        invoice_count = invoice_count - 1
+    WHERE day = date(OLD.issued_at) AND status = OLD.status;
+
+    INSERT INTO invoice_revenue_daily (day, status, total_amount, invoice_count)
+    VALUES (date(NEW.issued_at), NEW.status, NEW.total_amount, 1)
+    ON CONFLICT (day, status) DO UPDATE SET
+        total_amount = total_amount + excluded.total_amount,
+        invoice_count = invoice_count + 1;
+END;
+
+-- Rendez-vous : nombre par jour et statut
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_counts_insert
+AFTER INSERT ON appointments
+BEGIN
+    INSERT INTO appointment_counts_daily (day, status, appointment_count)
+    VALUES (NEW.appointment_date, NEW.status, 1)
+    ON CONFLICT (day, status) DO UPDATE SET
+        appointment_count = appointment_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_counts_delete
+AFTER DELETE ON appointments
+BEGIN
+    UPDATE appointment_counts_daily
+    SET appointment_count = appointment_count - 1
+    WHERE day = OLD.appointment_date AND status = OLD.status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_counts_update
+AFTER UPDATE OF status, appointment_date ON appointments
+WHEN OLD.status IS NOT NEW.status OR OLD.appointment_date IS NOT NEW.appointment_date
+BEGIN
+    UPDATE appointment_counts_daily
+    SET appointment_count = appointment_count - 1
+    WHERE day = OLD.appointment_date AND status = OLD.status;
+
+    INSERT INTO appointment_counts_daily (day, status, appointment_count)
+    VALUES (NEW.appointment_date, NEW.status, 1)
+    ON CONFLICT (day, status) DO UPDATE SET
+        appointment_count = appointment_count + 1;
+END;
@@ -0,0 +1,17 @@
+-- Index pour la pagination par curseur sur (date, id).
+-- admin_users pagine sur (created_at, id), avec ou sans filtre de rôle.
+-- owner_invoices : l'index couvrant de 0003 place des colonnes entre
+-- issued_at et l'id implicite, ce qui force un tri partiel ; une page ne
+-- lit que size + 1 lignes, un index exact (owner_id, issued_at, id) suffit.
+-- medical_records et prescriptions sont déjà servis par les index de 0003.
+
+CREATE INDEX IF NOT EXISTS idx_users_created
+ON users (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_users_role_created
+ON users (role, created_at);
+
+DROP INDEX IF EXISTS idx_invoices_owner_issued;
+
+CREATE INDEX IF NOT EXISTS idx_invoices_owner_issued_id
+ON invoices (owner_id, issued_at);
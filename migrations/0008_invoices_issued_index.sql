@@ -0,0 +1,4 @@
+-- Export comptable : factures de toute la clinique sur une plage de dates.
+
+CREATE INDEX IF NOT EXISTS idx_invoices_issued
+ON invoices (issued_at);
@@ -0,0 +1,15 @@
+-- Sessions côté serveur (SESSION_BACKEND = "sqlite") : le cookie ne porte
+-- plus qu'un identifiant aléatoire, les données restent ici.
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER,
+    data TEXT NOT NULL,              -- JSON
+    expires_at REAL NOT NULL         -- epoch, secondes
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_user
+ON sessions (user_id);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_expires
+ON sessions (expires_at);
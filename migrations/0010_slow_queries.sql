@@ -0,0 +1,16 @@
+-- Journal des requêtes lentes (SLOW_QUERY_MS, SLOW_QUERY_LOG = "table").
+-- Les valeurs des paramètres ne sont jamais stockées, seulement leur type.
+
+CREATE TABLE IF NOT EXISTS slow_queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    logged_at TEXT NOT NULL,         -- UTC
+    endpoint TEXT,
+    duration_ms REAL NOT NULL,
+    normalized_sql TEXT NOT NULL,
+    sql_text TEXT NOT NULL,
+    params_shape TEXT,
+    query_plan TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_slow_queries_normalized
+ON slow_queries (normalized_sql, duration_ms);
@@ -0,0 +1,174 @@
+-- Tampons de modification par entité pour les GET conditionnels
+-- (ETag / Last-Modified) des vues propriétaire. Tenus à jour par triggers :
+-- toute écriture, quelle que soit la route, incrémente la version.
+--   owner_pets     (owner_id) : /owner/pets
+--   owner_invoices (owner_id) : /owner/invoices
+--   pet            (pet_id)   : /owner/pets/<id>/history et /prescriptions
+-- Une entité sans ligne est à la version 0 (inchangée depuis cette migration).
+
+CREATE TABLE IF NOT EXISTS change_stamps (
+    scope TEXT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    modified_at INTEGER NOT NULL,   -- epoch, secondes
+    PRIMARY KEY (scope, entity_id)
+) WITHOUT ROWID;
+
+-- Animaux : liste du propriétaire et en-tête des pages de l'animal
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_stamp_insert
+AFTER INSERT ON pets
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_pets', NEW.owner_id, 1, strftime('%s', 'now')),
+           ('pet', NEW.id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_stamp_update
+AFTER UPDATE ON pets
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_pets', OLD.owner_id, 1, strftime('%s', 'now')),
+           ('pet', NEW.id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'owner_pets', NEW.owner_id, 1, strftime('%s', 'now')
+    WHERE NEW.owner_id != OLD.owner_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_stamp_delete
+AFTER DELETE ON pets
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_pets', OLD.owner_id, 1, strftime('%s', 'now')),
+           ('pet', OLD.id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+-- Factures du propriétaire
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_stamp_insert
+AFTER INSERT ON invoices
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_invoices', NEW.owner_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_stamp_update
+AFTER UPDATE ON invoices
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_invoices', OLD.owner_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'owner_invoices', NEW.owner_id, 1, strftime('%s', 'now')
+    WHERE NEW.owner_id != OLD.owner_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_invoices_stamp_delete
+AFTER DELETE ON invoices
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_invoices', OLD.owner_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+-- Dossiers médicaux et ordonnances de l'animal
+
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_stamp_insert
+AFTER INSERT ON medical_records
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('pet', NEW.pet_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_stamp_update
+AFTER UPDATE ON medical_records
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('pet', OLD.pet_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'pet', NEW.pet_id, 1, strftime('%s', 'now')
+    WHERE NEW.pet_id != OLD.pet_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_stamp_delete
+AFTER DELETE ON medical_records
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('pet', OLD.pet_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prescriptions_stamp_insert
+AFTER INSERT ON prescriptions
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('pet', NEW.pet_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prescriptions_stamp_update
+AFTER UPDATE ON prescriptions
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('pet', OLD.pet_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'pet', NEW.pet_id, 1, strftime('%s', 'now')
+    WHERE NEW.pet_id != OLD.pet_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prescriptions_stamp_delete
+AFTER DELETE ON prescriptions
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('pet', OLD.pet_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+-- Rendez-vous : date, heure et nom de l'animal sont affichés dans les
+-- factures et dans l'historique de l'animal
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_stamp_update
+AFTER UPDATE OF appointment_date, appointment_time, pet_name ON appointments
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_invoices', NEW.owner_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'pet', NEW.pet_id, 1, strftime('%s', 'now')
+    WHERE NEW.pet_id IS NOT NULL
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
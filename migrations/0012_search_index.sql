@@ -0,0 +1,124 @@
+-- Index plein texte (FTS5) pour la recherche staff : animaux, propriétaires,
+-- dossiers médicaux et ordonnances. Tenu à jour par triggers.
+-- rowid = id * 4 + type (0 animal, 1 propriétaire, 2 dossier, 3 ordonnance),
+-- ce qui permet de retrouver la ligne d'une entité sans parcourir l'index.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    name,                   -- nom de l'animal / du propriétaire, médicament
+    body,                   -- espèce, race, e-mail, diagnostic, notes, posologie
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+-- Le nom pèse plus que le reste du texte dans le classement
+INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(10.0, 1.0)');
+
+INSERT INTO search_index (rowid, name, body)
+SELECT id * 4, name, trim(coalesce(species, '') || ' ' || coalesce(breed, '')) FROM pets;
+
+INSERT INTO search_index (rowid, name, body)
+SELECT id * 4 + 1, full_name, email FROM users WHERE role = 'pet_owner';
+
+INSERT INTO search_index (rowid, name, body)
+SELECT id * 4 + 2, '', trim(diagnosis || ' ' || coalesce(notes, '')) FROM medical_records;
+
+INSERT INTO search_index (rowid, name, body)
+SELECT id * 4 + 3, drug_name,
+       trim(dosage || ' ' || coalesce(frequency, '') || ' ' || coalesce(instructions, ''))
+FROM prescriptions;
+
+-- Animaux
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_search_insert
+AFTER INSERT ON pets
+BEGIN
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4, NEW.name, trim(coalesce(NEW.species, '') || ' ' || coalesce(NEW.breed, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_search_update
+AFTER UPDATE OF name, species, breed ON pets
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4;
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4, NEW.name, trim(coalesce(NEW.species, '') || ' ' || coalesce(NEW.breed, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_search_delete
+AFTER DELETE ON pets
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4;
+END;
+
+-- Propriétaires (seuls les comptes pet_owner sont indexés)
+
+CREATE TRIGGER IF NOT EXISTS trg_users_search_insert
+AFTER INSERT ON users
+WHEN NEW.role = 'pet_owner'
+BEGIN
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4 + 1, NEW.full_name, NEW.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_search_update
+AFTER UPDATE OF full_name, email, role ON users
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 1;
+    INSERT INTO search_index (rowid, name, body)
+    SELECT NEW.id * 4 + 1, NEW.full_name, NEW.email
+    WHERE NEW.role = 'pet_owner';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_search_delete
+AFTER DELETE ON users
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 1;
+END;
+
+-- Dossiers médicaux
+
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_search_insert
+AFTER INSERT ON medical_records
+BEGIN
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4 + 2, '', trim(NEW.diagnosis || ' ' || coalesce(NEW.notes, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_search_update
+AFTER UPDATE OF diagnosis, notes ON medical_records
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 2;
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4 + 2, '', trim(NEW.diagnosis || ' ' || coalesce(NEW.notes, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medical_records_search_delete
+AFTER DELETE ON medical_records
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 2;
+END;
+
+-- Ordonnances
+
+CREATE TRIGGER IF NOT EXISTS trg_prescriptions_search_insert
+AFTER INSERT ON prescriptions
+BEGIN
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4 + 3, NEW.drug_name,
+            trim(NEW.dosage || ' ' || coalesce(NEW.frequency, '') || ' ' || coalesce(NEW.instructions, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prescriptions_search_update
+AFTER UPDATE OF drug_name, dosage, frequency, instructions ON prescriptions
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 3;
+    INSERT INTO search_index (rowid, name, body)
+    VALUES (NEW.id * 4 + 3, NEW.drug_name,
+            trim(NEW.dosage || ' ' || coalesce(NEW.frequency, '') || ' ' || coalesce(NEW.instructions, '')));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prescriptions_search_delete
+AFTER DELETE ON prescriptions
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 3;
+END;
@@ -0,0 +1,11 @@
+-- Index de la chronologie d'un animal (/pets/<id>/timeline).
+-- Chaque branche du UNION ALL lit au plus size + 1 lignes dans l'ordre
+-- (date, id) décroissant ; dossiers et ordonnances ont déjà leur index (0003).
+
+-- appointments : WHERE pet_id = ? ORDER BY date, time DESC
+CREATE INDEX IF NOT EXISTS idx_appointments_pet_date_time
+ON appointments (pet_id, appointment_date, appointment_time);
+
+-- invoices : rattachées à l'animal par leur rendez-vous
+CREATE INDEX IF NOT EXISTS idx_invoices_appointment
+ON invoices (appointment_id, issued_at);
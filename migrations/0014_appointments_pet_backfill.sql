@@ -0,0 +1,49 @@
+-- Rattacher les anciens rendez-vous à leur animal (appointments.pet_id).
+-- Les lignes d'avant 0002 n'ont que pet_name : on prend l'animal du même
+-- propriétaire portant ce nom, seulement s'il n'y en a qu'un.
+-- Le nom affiché vient ensuite de pets (pet_cache) ; pet_name ne sert plus
+-- que pour les rendez-vous sans animal (ambigus ou animal supprimé).
+
+UPDATE appointments
+SET pet_id = (
+    SELECT MIN(p.id)
+    FROM pets p
+    WHERE p.owner_id = appointments.owner_id
+      AND lower(p.name) = lower(appointments.pet_name)
+    HAVING COUNT(*) = 1
+)
+WHERE pet_id IS NULL;
+
+-- Animal supprimé depuis : la ligne garde son nom, sans lien
+UPDATE appointments
+SET pet_id = NULL
+WHERE pet_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM pets p WHERE p.id = appointments.pet_id);
+
+-- Index couvrants des dashboards (0003) : pet_id à la place de pet_name,
+-- le nom est résolu par pet_cache.
+
+DROP INDEX IF EXISTS idx_appointments_date_time;
+
+CREATE INDEX IF NOT EXISTS idx_appointments_date_time
+ON appointments (appointment_date, appointment_time,
+                 owner_id, status, pet_id, reason);
+
+DROP INDEX IF EXISTS idx_appointments_owner_date_time;
+
+CREATE INDEX IF NOT EXISTS idx_appointments_owner_date_time
+ON appointments (owner_id, appointment_date, appointment_time,
+                 status, pet_id, reason);
+
+-- /owner/invoices affiche le nom courant de l'animal : un renommage change
+-- la page (ETag de 0011).
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_stamp_invoices_rename
+AFTER UPDATE OF name ON pets
+WHEN NEW.name IS NOT OLD.name
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_invoices', NEW.owner_id, 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
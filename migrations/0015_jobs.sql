@@ -0,0 +1,37 @@
+-- File de tâches durable (JOB QUEUE dans app.py) : rappels, notifications,
+-- reconstructions de rapports, exécutés par `flask jobs work`.
+-- Une tâche réclamée reste 'queued' : son run_at est repoussé de la durée de
+-- visibilité et locked_by désigne le worker. Si le worker meurt, la tâche
+-- redevient visible à run_at et un autre la reprend.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',     -- JSON
+    priority INTEGER NOT NULL DEFAULT 10,   -- la plus petite passe d'abord
+    run_at REAL NOT NULL,                   -- epoch, secondes
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'done', 'failed')),
+    locked_by TEXT,
+    dedupe_key TEXT,                        -- remplace la tâche en attente de même clé
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+
+-- Tâches dues : seules les lignes 'queued' sont indexées
+CREATE INDEX IF NOT EXISTS idx_jobs_due
+ON jobs (run_at, priority)
+WHERE status = 'queued';
+
+-- enqueue(..., dedupe_key=) : tâche en attente de même clé
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe
+ON jobs (dedupe_key)
+WHERE status = 'queued' AND dedupe_key IS NOT NULL;
+
+-- Tâches terminées : purge, comptes par statut
+CREATE INDEX IF NOT EXISTS idx_jobs_finished
+ON jobs (status, finished_at)
+WHERE finished_at IS NOT NULL;
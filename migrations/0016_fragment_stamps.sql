@@ -0,0 +1,85 @@
+-- Versions des fragments mis en cache (FRAGMENT CACHE dans app.py) pour les
+-- tableaux de rendez-vous, dans change_stamps comme celles de 0011 :
+--   owner_appointments (owner_id)  : tableaux du dashboard propriétaire
+--   staff_day          (AAAAMMJJ)  : tableau d'un jour, dashboard staff et planning
+-- Les triggers changent la version dans la transaction de l'écriture, donc
+-- tous les process (workers, ASGI, `flask appointments import`) la voient.
+
+-- Rendez-vous
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_fragment_stamp_insert
+AFTER INSERT ON appointments
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_appointments', NEW.owner_id, 1, strftime('%s', 'now')),
+           ('staff_day', CAST(replace(NEW.appointment_date, '-', '') AS INTEGER), 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_fragment_stamp_update
+AFTER UPDATE ON appointments
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_appointments', OLD.owner_id, 1, strftime('%s', 'now')),
+           ('staff_day', CAST(replace(OLD.appointment_date, '-', '') AS INTEGER), 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'owner_appointments', NEW.owner_id, 1, strftime('%s', 'now')
+    WHERE NEW.owner_id != OLD.owner_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT 'staff_day', CAST(replace(NEW.appointment_date, '-', '') AS INTEGER), 1, strftime('%s', 'now')
+    WHERE NEW.appointment_date != OLD.appointment_date
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_fragment_stamp_delete
+AFTER DELETE ON appointments
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    VALUES ('owner_appointments', OLD.owner_id, 1, strftime('%s', 'now')),
+           ('staff_day', CAST(replace(OLD.appointment_date, '-', '') AS INTEGER), 1, strftime('%s', 'now'))
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+-- Animaux : les tableaux affichent le nom courant (pet_cache)
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_fragment_stamp_rename
+AFTER UPDATE OF name ON pets
+WHEN OLD.name IS NOT NEW.name
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT DISTINCT 'owner_appointments', owner_id, 1, strftime('%s', 'now')
+    FROM appointments WHERE pet_id = NEW.id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT DISTINCT 'staff_day', CAST(replace(appointment_date, '-', '') AS INTEGER), 1, strftime('%s', 'now')
+    FROM appointments WHERE pet_id = NEW.id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pets_fragment_stamp_delete
+AFTER DELETE ON pets
+BEGIN
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT DISTINCT 'owner_appointments', owner_id, 1, strftime('%s', 'now')
+    FROM appointments WHERE pet_id = OLD.id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+
+    INSERT INTO change_stamps (scope, entity_id, version, modified_at)
+    SELECT DISTINCT 'staff_day', CAST(replace(appointment_date, '-', '') AS INTEGER), 1, strftime('%s', 'now')
+    FROM appointments WHERE pet_id = OLD.id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET
+        version = version + 1, modified_at = excluded.modified_at;
+END;
@@ -0,0 +1,71 @@
+// Book Appointment : affiche les créneaux libres du jour choisi
+
+document.addEventListener('DOMContentLoaded', function() {
+    const dateInput = document.getElementById('appointment_date');
+    const timeInput = document.getElementById('appointment_time');
+    const slotList = document.getElementById('slotList');
+
+    if (!dateInput || !timeInput || !slotList) {
+        return;
+    }
+
+    const availabilityUrl = slotList.dataset.availabilityUrl;
+
+    function renderSlots(day) {
+        slotList.innerHTML = '';
+
+        if (!day.open) {
+            slotList.textContent = 'The clinic is closed on this day.';
+            return;
+        }
+        if (day.free.length === 0) {
+            slotList.textContent = 'No free slots left on this day.';
+            return;
+        }
+
+        day.free.forEach(function(time) {
+            const button = document.createElement('button');
+            button.type = 'button';
+            button.className = 'btn-table btn-small slot-button';
+            if (time === timeInput.value) {
+                button.classList.add('slot-selected');
+            }
+            button.textContent = time;
+            button.addEventListener('click', function() {
+                timeInput.value = time;
+                slotList.querySelectorAll('.slot-selected').forEach(function(el) {
+                    el.classList.remove('slot-selected');
+                });
+                button.classList.add('slot-selected');
+            });
+            slotList.appendChild(button);
+        });
+    }
+
+    function loadSlots() {
+        if (!dateInput.value) {
+            slotList.innerHTML = '';
+            return;
+        }
+
+        fetch(availabilityUrl + '?date=' + encodeURIComponent(dateInput.value) + '&days=1', {
+            credentials: 'same-origin'
+        })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                renderSlots(data.days[0]);
+            })
+            .catch(function() {
+                // Pas bloquant : le serveur revalide le créneau à l'envoi
+                slotList.textContent = '';
+            });
+    }
+
+    dateInput.addEventListener('change', loadSlots);
+    loadSlots();
+});
@@ -0,0 +1,61 @@
+// Staff Search : suggestions pendant la frappe (/api/staff/search)
+
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.getElementById('searchInput');
+    const list = document.getElementById('searchSuggestions');
+
+    if (!input || !list) {
+        return;
+    }
+
+    const suggestUrl = input.dataset.suggestUrl;
+    let timer = null;
+    let controller = null;
+
+    function render(results) {
+        list.innerHTML = '';
+        results.forEach(function(result) {
+            const item = document.createElement('li');
+            const label = document.createElement('strong');
+            label.textContent = result.label;
+            item.appendChild(label);
+            item.appendChild(document.createTextNode(' (' + result.kind + ') ' + result.detail));
+            list.appendChild(item);
+        });
+    }
+
+    function suggest() {
+        const q = input.value.trim();
+        if (q.length < 2) {
+            list.innerHTML = '';
+            return;
+        }
+        // Seule la dernière frappe compte
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+
+        fetch(suggestUrl + '?q=' + encodeURIComponent(q), {
+            credentials: 'same-origin',
+            signal: controller.signal
+        })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                render(data.results);
+            })
+            .catch(function() {
+                // Requête annulée ou erreur : le formulaire reste utilisable
+            });
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(suggest, 150);
+    });
+});
@@ -0,0 +1,56 @@
+import os
+import sys
+import datetime as dt
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+
+PASSWORD = "secret123"
+
+
+@pytest.fixture(params=[True, False], ids=["writer-queue", "direct"])
+def db(request, tmp_path):
+    """Fresh migrated database; every test runs with and without the writer thread."""
+    clinic.app.config["DATABASE"] = str(tmp_path / "clinic.db")
+    clinic.app.config["DB_WRITER_QUEUE"] = request.param
+    clinic.init_db()
+    for cache in (
+        clinic.user_cache, clinic.pet_cache, clinic.fragment_cache, clinic.dashboard_cache,
+        clinic.schedule_cache, clinic.schedule_index,
+    ):
+        cache.invalidate()
+    conn = clinic._connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def add_user(db):
+    def add(email, role, name="Test User"):
+        cur = db.execute(
+            "INSERT INTO users (full_name, email, password_hash, role, is_approved) VALUES (?, ?, ?, ?, 1)",
+            (name, email, generate_password_hash(PASSWORD), role),
+        )
+        db.commit()
+        return cur.lastrowid
+    return add
+
+
+@pytest.fixture
+def login():
+    def login(email, role):
+        client = clinic.app.test_client()
+        response = client.post("/login", data={"email": email, "password": PASSWORD, "role": role})
+        assert response.status_code == 302
+        return client
+    return login
+
+
+@pytest.fixture
+def next_monday():
+    day = dt.date.today() + dt.timedelta(days=14)
+    return day - dt.timedelta(days=day.weekday())
@@ -0,0 +1,159 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import app as clinic
+import asgi
+
+
+def test_lifespan_shutdown_closes_async_db(db, monkeypatch):
+    async_db = asgi.AsyncDB(2, 8)
+    monkeypatch.setattr(asgi, "db", async_db)
+
+    async def scenario():
+        assert await async_db.run(lambda conn: conn.execute("SELECT 1").fetchone()[0]) == 1
+        connections = list(async_db._connections)
+        assert connections
+
+        messages = asyncio.Queue()
+        sent = []
+        for event in ("lifespan.startup", "lifespan.shutdown"):
+            messages.put_nowait({"type": event})
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await asgi.application({"type": "lifespan"}, messages.get, send)
+        return connections, sent
+
+    connections, sent = asyncio.run(scenario())
+
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert async_db._executor._shutdown
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_session_due_for_a_new_expiry_is_left_to_flask(db, add_user, login):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    login("owner@example.test", "pet_owner")
+    sid = db.execute("SELECT id FROM sessions WHERE user_id = ?", (owner_id,)).fetchone()[0]
+    scope = {
+        "type": "http", "method": "GET", "path": "/dashboard/pet-owner", "query_string": b"",
+        "headers": [(b"cookie", ("session=%s" % sid).encode())],
+    }
+
+    session = asgi._open_session(asgi.build_environ(scope))
+    assert session is not None and session["user_id"] == owner_id
+
+    db.execute("UPDATE sessions SET expires_at = expires_at - 3600 WHERE id = ?", (sid,))
+    db.commit()
+    assert asgi._open_session(asgi.build_environ(scope)) is None
+
+
+def asgi_request(path, sid=None):
+    headers = [(b"cookie", ("session=%s" % sid).encode())] if sid else []
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": headers,
+             "http_version": "1.1", "scheme": "http", "server": ("localhost", 80), "root_path": ""}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await asgi.application(scope, receive, send)
+
+    asyncio.run(run())
+    return sent
+
+
+def asgi_get(path, sid=None):
+    return asgi_request(path, sid)[0]["status"]
+
+
+def test_async_views_feed_route_metrics(db, add_user, login, monkeypatch):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    login("owner@example.test", "pet_owner")
+    sid = db.execute("SELECT id FROM sessions WHERE user_id = ?", (owner_id,)).fetchone()[0]
+    monkeypatch.setattr(asgi, "db", asgi.AsyncDB(2, 8))
+    clinic.route_metrics.reset()
+
+    assert asgi_get("/owner/pets", sid) == 200
+    assert asgi_get("/dashboard/pet-owner", sid) == 200
+    assert asgi_get("/owner/pets") == 302  # sans session : servi par Flask
+
+    routes = clinic.route_metrics.snapshot()
+    assert routes["my_pets"]["statuses"] == {"200": 1, "302": 1}
+    assert routes["my_pets"]["sql_queries"] > 0
+    assert routes["my_pets"]["template_seconds"] > 0
+    assert routes["pet_owner_dashboard"]["statuses"] == {"200": 1}
+    assert 'clinic_requests_total{endpoint="my_pets",status="200"} 1' in clinic.render_metrics()
+    asgi.db.close()
+
+
+def test_async_views_name_their_endpoint_in_the_slow_query_log(db, add_user, login, monkeypatch):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    login("owner@example.test", "pet_owner")
+    sid = db.execute("SELECT id FROM sessions WHERE user_id = ?", (owner_id,)).fetchone()[0]
+    monkeypatch.setattr(asgi, "db", asgi.AsyncDB(2, 8))
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_MS", 0.0)
+    endpoints = []
+    monkeypatch.setattr(
+        clinic.get_slow_query_log(), "record",
+        lambda conn, sql, parameters, seconds: endpoints.append(clinic._request_metrics.stats[4]),
+    )
+
+    assert asgi_get("/owner/invoices", sid) == 200
+    assert endpoints and set(endpoints) == {"owner_invoices"}
+    asgi.db.close()
+
+
+@pytest.mark.parametrize("role, path", [
+    ("pet_owner", "/dashboard/pet-owner"),
+    ("pet_owner", "/owner/pets"),
+    ("pet_owner", "/owner/invoices"),
+    ("clinic_staff", "/dashboard/staff"),
+])
+def test_async_views_render_the_flask_page(db, add_user, login, monkeypatch, role, path):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    pet_id = db.execute(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, 'Rex', 'dog')", (owner_id,)
+    ).lastrowid
+    db.execute(
+        "INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)"
+        " VALUES (?, ?, 'Rex', date('now'), '10:00', 'pending')",
+        (owner_id, pet_id),
+    )
+    db.execute(
+        "INSERT INTO invoices (owner_id, total_amount, status) VALUES (?, 42.0, 'unpaid')", (owner_id,)
+    )
+    db.commit()
+    user_id = owner_id if role == "pet_owner" else add_user("staff@example.test", role)
+    email = db.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+    client = login(email, role)
+    sid = db.execute("SELECT id FROM sessions WHERE user_id = ?", (user_id,)).fetchone()[0]
+    monkeypatch.setattr(asgi, "db", asgi.AsyncDB(2, 8))
+
+    expected = client.get(path)
+    sent = asgi_request(path, sid)
+    assert sent[0]["status"] == expected.status_code == 200
+    assert sent[1]["body"] == expected.get_data()
+    assert b"Rex" in sent[1]["body"] or b"42.00" in sent[1]["body"]
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-type"] == expected.headers["Content-Type"].encode()
+    assert b"Cookie" in headers[b"vary"]
+    asgi.db.close()
+
+
+def test_async_view_leaves_wrong_role_to_flask(db, add_user, login, monkeypatch):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    login("owner@example.test", "pet_owner")
+    sid = db.execute("SELECT id FROM sessions WHERE user_id = ?", (owner_id,)).fetchone()[0]
+    monkeypatch.setattr(asgi, "db", asgi.AsyncDB(2, 8))
+    assert asgi_get("/dashboard/staff", sid) == 403
+    asgi.db.close()
@@ -0,0 +1,74 @@
+import gzip
+import json
+import os
+
+import pytest
+from flask import url_for
+
+import app as clinic
+
+CSS = b"body { color: #333; }\n" * 200
+
+
+@pytest.fixture
+def static(tmp_path, monkeypatch):
+    """Throwaway static folder; the built manifest is forgotten afterwards."""
+    folder = tmp_path / "static"
+    (folder / "css").mkdir(parents=True)
+    (folder / "css" / "style.css").write_bytes(CSS)
+    (folder / "robots.bin").write_bytes(b"\x00\x01")
+    monkeypatch.setattr(clinic.app, "static_folder", str(folder))
+    monkeypatch.setattr(clinic, "_assets_manifest", None)
+    monkeypatch.setattr(clinic, "_render_stamp", None)
+    return folder
+
+
+def test_no_build_keeps_plain_static_urls(static):
+    with clinic.app.test_request_context():
+        assert url_for("static", filename="css/style.css") == "/static/css/style.css"
+    response = clinic.app.test_client().get("/static/css/style.css")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+    response.close()
+
+
+def test_build_fingerprints_and_serves_with_long_cache(static):
+    manifest = clinic.build_assets()
+    built = manifest["css/style.css"]
+    assert built.startswith("dist/css/style.") and built.endswith(".css")
+    assert json.loads((static / "dist" / "manifest.json").read_text()) == manifest
+    # Variante compressée seulement quand elle est plus petite
+    assert gzip.decompress((static / (built + ".gz")).read_bytes()) == CSS
+    assert not os.path.exists(static / (manifest["robots.bin"] + ".gz"))
+
+    with clinic.app.test_request_context():
+        assert url_for("static", filename="css/style.css") == "/static/" + built
+
+    client = clinic.app.test_client()
+    plain = client.get("/static/" + built)
+    assert plain.status_code == 200 and plain.get_data() == CSS
+    assert plain.content_encoding is None
+    assert plain.cache_control.max_age == clinic.app.config["ASSETS_MAX_AGE"]
+    assert plain.cache_control.immutable and plain.cache_control.public
+    assert "Accept-Encoding" in plain.headers["Vary"]
+    plain.close()
+
+    packed = client.get("/static/" + built, headers={"Accept-Encoding": "gzip"})
+    assert packed.content_encoding == "gzip"
+    assert packed.mimetype == "text/css"
+    assert gzip.decompress(packed.get_data()) == CSS
+    packed.close()
+
+    manifest_response = client.get("/static/dist/manifest.json")
+    assert "immutable" not in manifest_response.headers.get("Cache-Control", "")
+    manifest_response.close()
+
+
+def test_rebuild_after_change_keeps_the_old_copy(static):
+    old = clinic.build_assets()["css/style.css"]
+    (static / "css" / "style.css").write_bytes(CSS + b"a { color: red; }\n")
+    new = clinic.build_assets()["css/style.css"]
+    assert new != old
+    assert os.path.exists(static / old) and os.path.exists(static / new)
+    with clinic.app.test_request_context():
+        assert url_for("static", filename="css/style.css") == "/static/" + new
@@ -0,0 +1,62 @@
+import app as clinic
+
+
+def owner_client(add_user, login, email="owner@example.test"):
+    owner_id = add_user(email, "pet_owner")
+    return owner_id, login(email, "pet_owner")
+
+
+def test_matching_etag_gets_a_bodiless_304(db, add_user, login):
+    _, owner = owner_client(add_user, login)
+    first = owner.get("/owner/pets")
+    assert first.status_code == 200
+    assert first.headers["ETag"].startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = owner.get("/owner/pets", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+    since = owner.get("/owner/pets", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert since.status_code == 304
+
+
+def test_write_through_a_route_changes_the_etag(db, add_user, login):
+    _, owner = owner_client(add_user, login)
+    first = owner.get("/owner/pets")
+
+    response = owner.post("/owner/pets/add", data={"name": "Rex", "species": "dog"})
+    assert response.status_code == 302
+
+    after = owner.get("/owner/pets", headers={"If-None-Match": first.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != first.headers["ETag"]
+    assert b"Rex" in after.data
+
+
+def test_invoice_written_elsewhere_changes_only_its_owner(db, add_user, login):
+    owner_id, owner = owner_client(add_user, login)
+    other_id, other = owner_client(add_user, login, "other@example.test")
+    mine = owner.get("/owner/invoices")
+    theirs = other.get("/owner/invoices")
+
+    db.execute(
+        "INSERT INTO invoices (owner_id, total_amount, status) VALUES (?, 99.5, 'unpaid')", (owner_id,)
+    )
+    db.commit()
+
+    after = owner.get("/owner/invoices", headers={"If-None-Match": mine.headers["ETag"]})
+    assert after.status_code == 200 and b"99.5" in after.data
+    untouched = other.get("/owner/invoices", headers={"If-None-Match": theirs.headers["ETag"]})
+    assert untouched.status_code == 304
+
+
+def test_validators_are_off_when_disabled(db, add_user, login, monkeypatch):
+    _, owner = owner_client(add_user, login)
+    etag = owner.get("/owner/pets").headers["ETag"]
+    monkeypatch.setitem(clinic.app.config, "CONDITIONAL_GET", False)
+
+    response = owner.get("/owner/pets", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
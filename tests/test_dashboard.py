@@ -0,0 +1,58 @@
+import re
+
+import app as clinic
+
+
+def metric(html, label):
+    match = re.search(r'<h3>%s</h3>\s*<div class="metric-value">([^<]*)</div>' % label, html)
+    return match.group(1).strip()
+
+
+def add_invoice(db, owner_id, amount, status, shift="+0 days"):
+    db.execute(
+        "INSERT INTO invoices (owner_id, total_amount, status, issued_at) VALUES (?, ?, ?, datetime('now', ?))",
+        (owner_id, amount, status, shift),
+    )
+    db.commit()
+
+
+def test_monthly_revenue_reads_the_rollup_without_cancelled_invoices(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    add_invoice(db, owner_id, 40.0, "paid")
+    add_invoice(db, owner_id, 25.5, "unpaid")
+    add_invoice(db, owner_id, 99.0, "cancelled")
+    add_invoice(db, owner_id, 70.0, "paid", "-2 months")
+
+    with clinic.app.app_context():
+        stats = clinic.load_dashboard_stats()
+    assert stats["monthly_revenue"] == 65.5
+    assert stats["total_pet_owners"] == 1
+
+
+def test_dashboard_counts_are_cached_until_a_staff_write(db, add_user, login):
+    add_user("admin@example.test", "admin")
+    add_user("owner@example.test", "pet_owner")
+    add_user("staff@example.test", "clinic_staff")
+    pending_id = db.execute(
+        "INSERT INTO users (full_name, email, password_hash, role, is_approved)"
+        " VALUES ('New Staff', 'new@example.test', 'x', 'clinic_staff', 0)"
+    ).lastrowid
+    db.commit()
+    admin = login("admin@example.test", "admin")
+
+    page = admin.get("/dashboard").get_data(as_text=True)
+    assert "new@example.test" in page
+    assert metric(page, "Total Pet Owners") == "1"
+    assert metric(page, "Clinic Staff") == "1"
+    assert metric(page, "Pending Staff") == "1"
+
+    # Écriture hors des routes : le chiffre en cache est servi jusqu'au TTL
+    add_user("other@example.test", "pet_owner")
+    assert metric(admin.get("/dashboard").get_data(as_text=True), "Total Pet Owners") == "1"
+
+    assert admin.post("/admin/staff/%d/approve" % pending_id).status_code == 302
+    page = admin.get("/dashboard").get_data(as_text=True)
+    assert "new@example.test" not in page
+    assert metric(page, "Total Pet Owners") == "2"
+    assert metric(page, "Clinic Staff") == "2"
+    assert metric(page, "Pending Staff") == "0"
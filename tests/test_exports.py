@@ -0,0 +1,74 @@
+import gzip
+import json
+
+import pytest
+
+
+@pytest.fixture
+def admin(db, add_user, login):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    for day in ("2026-03-01", "2026-03-02", "2026-03-03", "2026-03-04"):
+        db.execute(
+            """
+            INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, status)
+            VALUES (?, 'Rex', ?, '10:00', 'pending')
+            """,
+            (owner_id, day),
+        )
+        db.execute(
+            "INSERT INTO invoices (owner_id, total_amount, status, issued_at) VALUES (?, 10.0, 'paid', ?)",
+            (owner_id, day + " 23:30:00"),
+        )
+    db.commit()
+    add_user("boss@example.test", "admin")
+    return login("boss@example.test", "admin")
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_bounds_are_inclusive_on_both_ends(admin):
+    query = {"from": "2026-03-02", "to": "2026-03-03", "gzip": "0"}
+    appointments = admin.get("/admin/export/appointments.ndjson", query_string=query)
+    assert [row["appointment_date"] for row in ndjson(appointments)] == ["2026-03-02", "2026-03-03"]
+
+    # issued_at est un horodatage : la fin de journée du `to` est incluse
+    invoices = admin.get("/admin/export/invoices.ndjson", query_string=query)
+    assert [row["issued_at"] for row in ndjson(invoices)] == [
+        "2026-03-02 23:30:00", "2026-03-03 23:30:00",
+    ]
+
+
+def test_open_bounds_and_last_representable_day(admin):
+    everything = admin.get("/admin/export/appointments.csv", query_string={"gzip": "0"})
+    assert everything.status_code == 200
+    assert everything.get_data(as_text=True).count("\n") == 5  # en-tête + 4 lignes
+
+    for to in ("9999-12-31", "9999-12-30"):
+        response = admin.get("/admin/export/invoices.csv", query_string={"from": "2026-03-04", "to": to, "gzip": "0"})
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).count("\n") == 2
+
+
+@pytest.mark.parametrize("query", [
+    {"from": "2026-03-04", "to": "2026-03-01"},
+    {"from": "March 1st"},
+    {"to": "2026-02-30"},
+    {"from": "9999-12-31", "to": "9999-12-31"},
+])
+def test_bad_bounds_are_rejected(admin, query):
+    assert admin.get("/admin/export/appointments.csv", query_string=query).status_code == 400
+
+
+def test_gzip_stream_decodes_to_the_plain_body(admin):
+    plain = admin.get("/admin/export/invoices.csv", query_string={"gzip": "0"})
+    packed = admin.get("/admin/export/invoices.csv", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.data) == plain.data
+
+
+def test_export_is_admin_only(admin, login):
+    owner = login("owner@example.test", "pet_owner")
+    assert owner.get("/admin/export/invoices.csv").status_code == 403
+    assert admin.get("/admin/export/users.csv").status_code == 404
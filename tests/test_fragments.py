@@ -0,0 +1,72 @@
+import app as clinic
+
+
+def test_pet_history_follows_change_stamps_across_processes(db, add_user, login):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    staff_id = add_user("vet@example.test", "clinic_staff")
+    pet_id = db.execute(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, 'Rex', 'dog')", (owner_id,)
+    ).lastrowid
+    db.commit()
+    owner = login("owner@example.test", "pet_owner")
+
+    for path, table, values in (
+        ("/owner/pets/%d/history", "medical_records (pet_id, staff_id, diagnosis)", "?, ?, 'Amoxicillin'"),
+        ("/owner/pets/%d/prescriptions", "prescriptions (pet_id, staff_id, drug_name, dosage)", "?, ?, 'Amoxicillin', '1/day'"),
+    ):
+        first = owner.get(path % pet_id)
+        assert first.status_code == 200 and b"Amoxicillin" not in first.data
+
+        # Écriture d'un autre process : rien n'est invalidé dans celui-ci
+        db.execute("INSERT INTO %s VALUES (%s)" % (table, values), (pet_id, staff_id))
+        db.commit()
+
+        second = owner.get(path % pet_id, headers={"If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 200
+        assert second.headers["ETag"] != first.headers["ETag"]
+        assert b"Amoxicillin" in second.data
+
+
+def test_owner_and_staff_tables_follow_writes_from_other_processes(db, add_user, login, next_monday):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    add_user("vet@example.test", "clinic_staff")
+    pet_id = db.execute(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, 'Rex', 'dog')", (owner_id,)
+    ).lastrowid
+    db.commit()
+    owner = login("owner@example.test", "pet_owner")
+    staff = login("vet@example.test", "clinic_staff")
+    day = next_monday.isoformat()
+    schedule = "/staff/schedule?from=%s&to=%s" % (day, day)
+
+    assert b"Rex" not in owner.get("/dashboard/pet-owner").data
+    assert b"Rex" not in staff.get(schedule).data
+
+    # `flask appointments import` ou un autre worker : seule la base change
+    appointment_id = db.execute(
+        """
+        INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)
+        VALUES (?, ?, 'Rex', ?, '10:00', 'pending')
+        """,
+        (owner_id, pet_id, day),
+    ).lastrowid
+    db.commit()
+    assert b"Rex" in owner.get("/dashboard/pet-owner").data
+    assert b"Rex" in staff.get(schedule).data
+    assert b"Confirmed" not in owner.get("/dashboard/pet-owner").data
+
+    db.execute("UPDATE appointments SET status = 'confirmed' WHERE id = ?", (appointment_id,))
+    db.commit()
+    assert b"Confirmed" in owner.get("/dashboard/pet-owner").data
+    assert b"Confirmed" in staff.get(schedule).data
+
+    db.execute("UPDATE pets SET name = 'Max' WHERE id = ?", (pet_id,))
+    db.commit()
+    clinic.pet_cache.invalidate(pet_id)  # PET_CACHE_TTL écoulé dans ce process
+    assert b"Max" in owner.get("/dashboard/pet-owner").data
+    assert b"Max" in staff.get(schedule).data
+
+    db.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+    db.commit()
+    assert b"Max" not in owner.get("/dashboard/pet-owner").data
+    assert b"Max" not in staff.get(schedule).data
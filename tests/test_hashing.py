@@ -0,0 +1,54 @@
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import app as clinic
+from conftest import PASSWORD
+
+
+def stored_hash(db, email):
+    return db.execute("SELECT password_hash FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+
+def test_login_rehashes_an_outdated_hash_once(db, add_user, login):
+    add_user("owner@example.test", "pet_owner")
+    old = generate_password_hash(PASSWORD, "pbkdf2:sha256:1000")
+    db.execute("UPDATE users SET password_hash = ? WHERE email = ?", (old, "owner@example.test"))
+    db.commit()
+    hasher = clinic.get_hasher()
+    rehashes = hasher.snapshot()["rehashes"]
+
+    login("owner@example.test", "pet_owner")
+    new = stored_hash(db, "owner@example.test")
+    assert new != old
+    assert new.startswith(clinic.app.config["PASSWORD_HASH_METHOD"] + "$")
+    assert check_password_hash(new, PASSWORD)
+    assert hasher.snapshot()["rehashes"] == rehashes + 1
+
+    # Déjà aux bons paramètres : pas de nouveau hachage
+    login("owner@example.test", "pet_owner")
+    assert stored_hash(db, "owner@example.test") == new
+    assert hasher.snapshot()["rehashes"] == rehashes + 1
+
+
+def test_wrong_password_keeps_the_outdated_hash(db, add_user):
+    add_user("owner@example.test", "pet_owner")
+    old = generate_password_hash(PASSWORD, "pbkdf2:sha256:1000")
+    db.execute("UPDATE users SET password_hash = ? WHERE email = ?", (old, "owner@example.test"))
+    db.commit()
+
+    response = clinic.app.test_client().post(
+        "/login", data={"email": "owner@example.test", "password": "wrong", "role": "pet_owner"},
+    )
+    assert response.status_code == 200
+    assert stored_hash(db, "owner@example.test") == old
+
+
+def test_new_settings_shut_the_old_pool_down(monkeypatch):
+    first = clinic.get_hasher()
+    assert first.hash("x").startswith(clinic.app.config["PASSWORD_HASH_METHOD"])
+    monkeypatch.setitem(clinic.app.config, "PASSWORD_HASH_WORKERS", first.workers + 1)
+
+    second = clinic.get_hasher()
+    assert second is not first
+    assert first._executor._shutdown
+    assert not second._executor._shutdown
+    assert check_password_hash(second.hash("x"), "x")
@@ -0,0 +1,129 @@
+import io
+import json
+import re
+
+import pytest
+
+import app as clinic
+
+HEADER = "owner_email,pet_name,appointment_date,appointment_time,reason,status\n"
+
+
+@pytest.fixture
+def clinic_data(db, add_user, next_monday):
+    add_user("vet@example.test", "clinic_staff")  # capacité : 1 par créneau
+    for n in (1, 2):
+        owner_id = add_user("owner%d@example.test" % n, "pet_owner")
+        db.execute("INSERT INTO pets (owner_id, name, species) VALUES (?, 'Rex', 'dog')", (owner_id,))
+    db.commit()
+    return next_monday.isoformat()
+
+
+def run_import(lines, chunk_size=None):
+    rows = clinic.read_import_rows(io.StringIO(HEADER + "".join(lines), newline=""), "csv")
+    with clinic.app.test_request_context():
+        return clinic.import_appointments(rows, chunk_size)
+
+
+def booked(db, day):
+    return db.execute(
+        "SELECT appointment_time, status FROM appointments WHERE appointment_date = ? ORDER BY id", (day,)
+    ).fetchall()
+
+
+@pytest.mark.parametrize("chunk_size", [500, 1])
+def test_full_slots_and_duplicates_are_rejected_per_row(db, clinic_data, chunk_size):
+    day = clinic_data
+    report = run_import([
+        "owner1@example.test,Rex,%s,10:00,checkup,confirmed\n" % day,
+        "owner2@example.test,rex,%s,10:00,,pending\n" % day,      # créneau plein
+        "owner2@example.test,Rex,%s,10:00,,cancelled\n" % day,    # annulé : ne prend pas de place
+        "owner1@example.test,Rex,%s,10:00,again,pending\n" % day, # même animal, même créneau
+        "owner2@example.test,Rex,%s,10:30,,\n" % day,
+        "nobody@example.test,Rex,%s,11:00,,\n" % day,
+        "owner1@example.test,Felix,%s,11:00,,\n" % day,
+    ], chunk_size)
+
+    assert report["rows"] == 7
+    assert report["inserted"] == 3
+    assert report["errors"] == [
+        (3, "This time slot is fully booked."),
+        (5, "Duplicate appointment."),
+        (7, "Unknown pet owner nobody@example.test."),
+        (8, "Unknown pet Felix for owner1@example.test."),
+    ]
+    assert [tuple(row) for row in booked(db, day)] == [
+        ("10:00", "confirmed"), ("10:00", "cancelled"), ("10:30", "pending"),
+    ]
+
+
+def test_rows_already_in_the_database_count(db, clinic_data):
+    day = clinic_data
+    run_import(["owner1@example.test,Rex,%s,10:00,,\n" % day])
+
+    report = run_import([
+        "owner1@example.test,Rex,%s,10:00,,\n" % day,
+        "owner2@example.test,Rex,%s,10:00,,\n" % day,
+    ])
+    assert report["inserted"] == 0
+    assert [message for _line, message in report["errors"]] == [
+        "Duplicate appointment.", "This time slot is fully booked.",
+    ]
+    assert len(booked(db, day)) == 1
+
+
+def test_malformed_rows_are_rejected_before_any_lookup(db, clinic_data):
+    day = clinic_data
+    report = run_import([
+        ",Rex,%s,10:00,,\n" % day,
+        "owner1@example.test,Rex,not-a-date,10:00,,\n",
+        "owner1@example.test,Rex,%s,10:10,,\n" % day,
+        "owner1@example.test,Rex,%s,10:00,,lost\n" % day,
+    ])
+    assert report["inserted"] == 0
+    assert [message for _line, message in report["errors"]][:2] == [
+        "owner_email is required.", "Invalid date format.",
+    ]
+    assert report["errors"][3] == (5, "Invalid status.")
+
+
+def test_upload_streams_ndjson_and_refuses_oversized_bodies(db, clinic_data, login, monkeypatch):
+    day = clinic_data
+    staff = login("vet@example.test", "clinic_staff")
+    body = "".join(
+        json.dumps({"owner_email": "owner%d@example.test" % n, "pet_name": "Rex",
+                    "appointment_date": day, "appointment_time": time}) + "\n"
+        for n, time in ((1, "09:00"), (2, "09:30"))
+    ).encode()
+
+    response = staff.post("/staff/appointments/import", data={
+        "file": (io.BytesIO(b"\xef\xbb\xbf" + body), "legacy.ndjson"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert b"2 of 2 rows imported" in response.data
+
+    assert clinic.app.config["MAX_CONTENT_LENGTH"] is not None
+    monkeypatch.setitem(clinic.app.config, "MAX_CONTENT_LENGTH", 1024)
+    response = staff.post("/staff/appointments/import", data={
+        "file": (io.BytesIO(body * 100), "legacy.ndjson"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert len(booked(db, day)) == 2
+
+
+def test_invalid_utf8_stops_after_the_last_complete_chunk(db, clinic_data, login, monkeypatch):
+    day = clinic_data
+    monkeypatch.setitem(clinic.app.config, "IMPORT_CHUNK_SIZE", 1)
+    staff = login("vet@example.test", "clinic_staff")
+    # Plus long que le tampon de décodage : la première ligne est insérée avant l'erreur
+    valid = HEADER + "owner1@example.test,Rex,%s,09:00,,\n" % day + "nobody@example.test,Rex,%s,11:00,,\n" % day * 399
+    body = valid.encode() + b"\xff\xfe broken\n"
+
+    response = staff.post("/staff/appointments/import", data={
+        "file": (io.BytesIO(body), "legacy.csv"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert b"not valid UTF-8" in response.data
+    processed = int(re.search(rb"1 of (\d+) rows imported", response.data).group(1))
+    assert 1 < processed < 400  # jusqu'au dernier bloc décodé
+    assert len(booked(db, day)) == 1
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+import app as clinic
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Register a 'test' job kind that records its payloads and fails while
+    payload["fail"] is true."""
+    seen = []
+
+    def handler(conn, payload):
+        seen.append(payload)
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+
+    monkeypatch.setitem(clinic.JOB_HANDLERS, "test", handler)
+    return seen
+
+
+@pytest.fixture
+def worker(db):
+    # Comme work_jobs : une instruction = une transaction
+    conn = clinic._connect()
+    conn.isolation_level = None
+    with clinic.app.app_context():
+        yield conn
+    conn.close()
+
+
+def add_job(db, payload=None, **kwargs):
+    job_id = clinic.enqueue(db, "test", payload, **kwargs)
+    db.commit()
+    return job_id
+
+
+def job_row(db, job_id):
+    return db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_enqueue_rejects_unknown_kind(db):
+    with pytest.raises(ValueError):
+        clinic.enqueue(db, "no-such-kind")
+
+
+def test_claim_takes_most_urgent_due_job(db, worker, calls):
+    late = add_job(db, {"n": 1}, priority=10)
+    urgent = add_job(db, {"n": 2}, priority=1)
+    add_job(db, {"n": 3}, priority=0, run_at=time.time() + 3600)
+
+    job = clinic.claim_job(worker, "w1")
+    assert job["id"] == urgent and job["attempts"] == 1
+    # Réclamée : cachée aux autres workers jusqu'au délai de visibilité
+    assert clinic.claim_job(worker, "w2")["id"] == late
+    assert clinic.claim_job(worker, "w3") is None
+    assert job_row(db, urgent)["locked_by"] == "w1"
+
+
+def test_run_marks_job_done(db, worker, calls):
+    job_id = add_job(db, {"n": 1})
+    assert clinic.run_next_job(worker, "w1") is True
+    assert calls == [{"n": 1}]
+    row = job_row(db, job_id)
+    assert row["status"] == "done" and row["locked_by"] is None and row["finished_at"]
+    assert clinic.run_next_job(worker, "w1") is False
+
+
+def test_failure_retries_with_backoff(db, worker, calls):
+    clinic.app.config["JOBS_BACKOFF_BASE"] = 30
+    job_id = add_job(db, {"fail": True})
+    before = time.time()
+    assert clinic.run_next_job(worker, "w1") is True
+    row = job_row(db, job_id)
+    assert row["status"] == "queued" and row["locked_by"] is None
+    assert row["attempts"] == 1 and row["last_error"] == "RuntimeError: boom"
+    assert row["run_at"] >= before + 30
+    # Pas due avant la fin du délai
+    assert clinic.run_next_job(worker, "w1") is False
+
+    db.execute("UPDATE jobs SET run_at = 0, payload = '{}' WHERE id = ?", (job_id,))
+    db.commit()
+    assert clinic.run_next_job(worker, "w1") is True
+    row = job_row(db, job_id)
+    assert row["status"] == "done" and row["attempts"] == 2 and row["last_error"] is None
+
+
+def test_backoff_doubles_up_to_max():
+    clinic.app.config["JOBS_BACKOFF_BASE"] = 30
+    clinic.app.config["JOBS_BACKOFF_MAX"] = 3600
+    assert [clinic.job_backoff(n) for n in (1, 2, 3)] == [30, 60, 120]
+    assert clinic.job_backoff(20) == 3600
+
+
+def test_job_fails_after_max_attempts(db, worker, calls, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "JOBS_MAX_ATTEMPTS", 3)
+    job_id = add_job(db, {"fail": True})
+    for _ in range(3):
+        db.execute("UPDATE jobs SET run_at = 0 WHERE id = ?", (job_id,))
+        db.commit()
+        assert clinic.run_next_job(worker, "w1") is True
+    row = job_row(db, job_id)
+    assert row["status"] == "failed" and row["attempts"] == 3 and row["finished_at"]
+    assert len(calls) == 3
+    assert clinic.run_next_job(worker, "w1") is False
+    assert clinic.job_stats(db)["failed"] == 1
+
+
+def test_expired_claim_is_taken_again_and_stale_finish_ignored(db, worker, calls):
+    job_id = add_job(db, {"n": 1})
+    first = clinic.claim_job(worker, "w1")
+    # Le worker w1 a dépassé le délai de visibilité
+    db.execute("UPDATE jobs SET run_at = 0 WHERE id = ?", (job_id,))
+    db.commit()
+    second = clinic.claim_job(worker, "w2")
+    assert second["id"] == job_id and second["attempts"] == 2
+
+    clinic.finish_job(worker, first, "w1", error="late")
+    row = job_row(db, job_id)
+    assert row["locked_by"] == "w2" and row["last_error"] is None
+    clinic.finish_job(worker, second, "w2")
+    assert job_row(db, job_id)["status"] == "done"
+
+
+def test_lost_last_attempt_fails_without_running(db, worker, calls, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "JOBS_MAX_ATTEMPTS", 1)
+    job_id = add_job(db, {"n": 1})
+    clinic.claim_job(worker, "w1")
+    db.execute("UPDATE jobs SET run_at = 0 WHERE id = ?", (job_id,))
+    db.commit()
+    assert clinic.run_next_job(worker, "w2") is True
+    row = job_row(db, job_id)
+    assert row["status"] == "failed" and "visibility timeout" in row["last_error"]
+    assert calls == []
+
+
+def test_dedupe_replaces_waiting_job_only(db, worker, calls):
+    add_job(db, {"n": 1}, dedupe_key="k")
+    second = add_job(db, {"n": 2}, dedupe_key="k")
+    assert [row["payload"] for row in db.execute("SELECT payload FROM jobs")] == ['{"n": 2}']
+    clinic.claim_job(worker, "w1")
+    # Une tâche réclamée n'est pas remplacée
+    third = add_job(db, {"n": 3}, dedupe_key="k")
+    assert job_row(db, second)["locked_by"] == "w1"
+    assert job_row(db, third)["status"] == "queued"
+    assert db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 2
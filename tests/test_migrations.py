@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import app as clinic
+import asgi
+
+
+@pytest.fixture
+def blank_db(tmp_path, monkeypatch):
+    """Empty database file that no migration has touched yet."""
+    monkeypatch.setitem(clinic.app.config, "DATABASE", str(tmp_path / "blank.db"))
+    return clinic.app.config["DATABASE"]
+
+
+def test_every_connection_puts_the_file_in_wal(blank_db):
+    conn = clinic._connect()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        conn.close()
+
+
+def test_pool_refuses_an_old_schema_without_auto_migrate(blank_db, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "DB_AUTO_MIGRATE", False)
+    with pytest.raises(clinic.SchemaOutOfDate):
+        clinic.get_pool()
+    with pytest.raises(clinic.SchemaOutOfDate):
+        clinic.get_writer()
+
+
+def test_first_checkout_migrates_without_init_db(blank_db):
+    # gunicorn app:app : aucun appel à init_db() avant la première requête
+    with clinic.app.app_context():
+        conn = clinic.get_db()
+        assert clinic.current_schema_version(conn) == clinic.latest_migration_version()
+        assert conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
+
+
+def test_lifespan_startup_fails_on_an_old_schema(blank_db, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "DB_AUTO_MIGRATE", False)
+    messages = asyncio.Queue()
+    messages.put_nowait({"type": "lifespan.startup"})
+    sent = []
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(asgi.application({"type": "lifespan"}, messages.get, send))
+    assert sent == ["lifespan.startup.failed"]
@@ -0,0 +1,74 @@
+import base64
+import json
+
+import pytest
+
+import app as clinic
+
+USERS_SQL = "SELECT id, full_name, email, role, is_approved, created_at FROM users WHERE 1=1"
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def page(db, size, after=None, before=None):
+    return clinic.keyset_page(db, USERS_SQL, [], "created_at", "id", size, after, before)
+
+
+def test_cursor_round_trip_walks_every_row_once(db, add_user):
+    for n in range(7):
+        add_user("user%d@example.test" % n, "pet_owner")
+    expected = [
+        row["id"] for row in db.execute("SELECT id FROM users ORDER BY created_at DESC, id DESC")
+    ]
+
+    pages, current = [], page(db, 3)
+    while True:
+        pages.append(current)
+        if current["next"] is None:
+            break
+        current = page(db, 3, after=clinic.decode_cursor(current["next"]))
+    forward = [row["id"] for p in pages for row in p["rows"]]
+    assert forward == expected
+    assert pages[0]["prev"] is None
+
+    # Retour en arrière depuis la dernière page : mêmes pages, même ordre
+    backward = []
+    current = pages[-1]
+    while current["prev"] is not None:
+        current = page(db, 3, before=clinic.decode_cursor(current["prev"]))
+        backward.insert(0, [row["id"] for row in current["rows"]])
+    assert backward == [[row["id"] for row in p["rows"]] for p in pages[:-1]]
+
+
+def test_cursor_encodes_sort_value_and_id():
+    token = clinic.encode_cursor("2026-03-02 09:00:00", 42)
+    assert "=" not in token
+    assert clinic.decode_cursor(token) == ("2026-03-02 09:00:00", 42)
+
+
+@pytest.mark.parametrize("token", [
+    "!!!not-base64",
+    raw_cursor("just a string"),
+    raw_cursor({"a": 1, "b": 2}),
+    raw_cursor([1, 2, 3]),
+    raw_cursor(["2026-03-02", "7"]),
+    raw_cursor(["2026-03-02", True]),
+    raw_cursor([["nested"], 7]),
+    raw_cursor([{"x": 1}, 7]),
+    raw_cursor(["2026-03-02", 2 ** 70]),
+    raw_cursor([2 ** 70, 7]),
+])
+def test_tampered_cursor_is_ignored(token):
+    assert clinic.decode_cursor(token) is None
+
+
+def test_tampered_cursor_serves_the_first_page(db, add_user, login):
+    add_user("boss@example.test", "admin")
+    client = login("boss@example.test", "admin")
+    first = client.get("/admin/users")
+    for token in (raw_cursor([["nested"], 7]), raw_cursor(["x", 2 ** 70]), "%%%"):
+        response = client.get("/admin/users", query_string={"after": token})
+        assert response.status_code == 200
+        assert response.data == first.data
@@ -0,0 +1,81 @@
+import os
+
+import app as clinic
+
+MIGRATION_0014 = os.path.join(
+    os.path.dirname(clinic.__file__), "migrations", "0014_appointments_pet_backfill.sql"
+)
+
+
+def add_pet(db, owner_id, name):
+    pet_id = db.execute(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, ?, 'dog')", (owner_id, name)
+    ).lastrowid
+    db.commit()
+    return pet_id
+
+
+def add_appointment(db, owner_id, pet_id, pet_name, day):
+    appointment_id = db.execute(
+        "INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)"
+        " VALUES (?, ?, ?, ?, '10:00', 'pending')",
+        (owner_id, pet_id, pet_name, day),
+    ).lastrowid
+    db.commit()
+    return appointment_id
+
+
+def test_names_come_from_pets_and_fall_back_to_the_stored_name(db, add_user, monkeypatch):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    pet_id = add_pet(db, owner_id, "Rex")
+    linked = add_appointment(db, owner_id, pet_id, "Old name", "2026-03-02")
+    unlinked = add_appointment(db, owner_id, None, "Ghost", "2026-03-02")
+    rows = db.execute("SELECT id, pet_id FROM appointments").fetchall()
+
+    assert clinic.appointment_pet_names(db, rows) == {linked: "Rex", unlinked: "Ghost"}
+
+    # Deuxième appel servi par pet_cache
+    loads = []
+    monkeypatch.setattr(clinic, "load_pets", lambda conn, ids: loads.append(ids) or {})
+    assert clinic.appointment_pet_names(db, rows)[linked] == "Rex"
+    assert loads == []
+
+
+def test_rename_and_delete_show_on_the_owner_dashboard(db, add_user, login, next_monday):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    pet_id = add_pet(db, owner_id, "Rex")
+    add_appointment(db, owner_id, pet_id, "Rex", next_monday.isoformat())
+    client = login("owner@example.test", "pet_owner")
+    assert b"Rex" in client.get("/dashboard/pet-owner").data
+
+    response = client.post("/owner/pets/%d/edit" % pet_id, data={"name": "Rexy", "species": "dog"})
+    assert response.status_code == 302
+    page = client.get("/dashboard/pet-owner").data
+    assert b"Rexy" in page
+
+    assert client.post("/owner/pets/%d/delete" % pet_id).status_code == 302
+    row = db.execute("SELECT pet_id, pet_name FROM appointments").fetchone()
+    assert row["pet_id"] is None and row["pet_name"] == "Rexy"
+    assert b"Rexy" in client.get("/dashboard/pet-owner").data
+
+
+def test_backfill_links_only_unambiguous_legacy_rows(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    bella = add_pet(db, owner_id, "Bella")
+    add_pet(db, owner_id, "Max")
+    add_pet(db, owner_id, "max")
+    rex = add_pet(db, owner_id, "Rex")
+    unique = add_appointment(db, owner_id, None, "bella", "2026-03-02")
+    ambiguous = add_appointment(db, owner_id, None, "Max", "2026-03-02")
+    orphan = add_appointment(db, owner_id, rex, "Rex", "2026-03-03")
+    # Animal supprimé sans passer par delete_pet (lien pendant)
+    db.execute("PRAGMA foreign_keys = OFF")
+    db.execute("DELETE FROM pets WHERE id = ?", (rex,))
+    db.commit()
+    db.execute("PRAGMA foreign_keys = ON")
+
+    with open(MIGRATION_0014, encoding="utf-8") as f:
+        db.executescript(f.read())
+
+    links = dict(db.execute("SELECT id, pet_id FROM appointments").fetchall())
+    assert links == {unique: bella, ambiguous: None, orphan: None}
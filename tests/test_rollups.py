@@ -0,0 +1,86 @@
+import app as clinic
+
+
+def revenue(db, day):
+    return {
+        row["status"]: (row["total_amount"], row["invoice_count"])
+        for row in db.execute(
+            "SELECT status, total_amount, invoice_count FROM invoice_revenue_daily WHERE day = ?", (day,)
+        )
+    }
+
+
+def counts(db, day):
+    return {
+        row["status"]: row["appointment_count"]
+        for row in db.execute(
+            "SELECT status, appointment_count FROM appointment_counts_daily WHERE day = ?", (day,)
+        )
+    }
+
+
+def test_invoice_triggers_follow_insert_update_delete(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    insert = "INSERT INTO invoices (owner_id, total_amount, status, issued_at) VALUES (?, ?, ?, ?)"
+    first = db.execute(insert, (owner_id, 40.0, "unpaid", "2026-03-02 09:00:00")).lastrowid
+    db.execute(insert, (owner_id, 60.0, "unpaid", "2026-03-02 15:00:00"))
+    db.commit()
+    assert revenue(db, "2026-03-02") == {"unpaid": (100.0, 2)}
+
+    db.execute("UPDATE invoices SET status = 'paid', total_amount = 45.0 WHERE id = ?", (first,))
+    db.commit()
+    assert revenue(db, "2026-03-02") == {"unpaid": (60.0, 1), "paid": (45.0, 1)}
+
+    db.execute("UPDATE invoices SET issued_at = '2026-03-03 10:00:00' WHERE id = ?", (first,))
+    db.commit()
+    assert revenue(db, "2026-03-02") == {"unpaid": (60.0, 1), "paid": (0.0, 0)}
+    assert revenue(db, "2026-03-03") == {"paid": (45.0, 1)}
+
+    db.execute("DELETE FROM invoices WHERE id = ?", (first,))
+    db.commit()
+    assert revenue(db, "2026-03-03") == {"paid": (0.0, 0)}
+    assert clinic.check_rollups(db) == []
+
+
+def test_appointment_triggers_follow_insert_update_delete(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    insert = """
+        INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, status)
+        VALUES (?, 'Rex', ?, '10:00', 'pending')
+    """
+    first = db.execute(insert, (owner_id, "2026-03-02")).lastrowid
+    db.execute(insert, (owner_id, "2026-03-02"))
+    db.commit()
+    assert counts(db, "2026-03-02") == {"pending": 2}
+
+    db.execute("UPDATE appointments SET status = 'confirmed' WHERE id = ?", (first,))
+    db.commit()
+    assert counts(db, "2026-03-02") == {"pending": 1, "confirmed": 1}
+
+    db.execute("UPDATE appointments SET appointment_date = '2026-03-04' WHERE id = ?", (first,))
+    db.commit()
+    assert counts(db, "2026-03-02") == {"pending": 1, "confirmed": 0}
+    assert counts(db, "2026-03-04") == {"confirmed": 1}
+
+    # Mise à jour sans changement de jour ni de statut : pas de double comptage
+    db.execute("UPDATE appointments SET reason = 'checkup' WHERE id = ?", (first,))
+    db.execute("DELETE FROM appointments WHERE id != ?", (first,))
+    db.commit()
+    assert counts(db, "2026-03-02") == {"pending": 0, "confirmed": 0}
+    assert counts(db, "2026-03-04") == {"confirmed": 1}
+    assert clinic.check_rollups(db) == []
+
+
+def test_rebuild_repairs_a_drifted_rollup(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    db.execute(
+        "INSERT INTO invoices (owner_id, total_amount, status, issued_at) VALUES (?, 30.0, 'paid', '2026-03-02 09:00:00')",
+        (owner_id,),
+    )
+    db.execute("UPDATE invoice_revenue_daily SET total_amount = 999")
+    db.commit()
+    assert [m[0] for m in clinic.check_rollups(db)] == ["invoice_revenue_daily"]
+
+    clinic.rebuild_rollups(db)
+    assert clinic.check_rollups(db) == []
+    assert revenue(db, "2026-03-02") == {"paid": (30.0, 1)}
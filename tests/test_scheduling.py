@@ -0,0 +1,171 @@
+import threading
+
+import app as clinic
+
+
+def add_owner(db, add_user, email):
+    owner_id = add_user(email, "pet_owner")
+    pet_id = db.execute(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, 'Rex', 'dog')", (owner_id,)
+    ).lastrowid
+    db.commit()
+    return pet_id
+
+
+def slot_rows(db, day):
+    return db.execute(
+        "SELECT appointment_date, appointment_time, status FROM appointments WHERE appointment_date = ?",
+        (day,),
+    ).fetchall()
+
+
+def test_last_seat_booked_once_from_two_threads(db, add_user, login, next_monday):
+    add_user("vet@example.test", "clinic_staff")  # capacité : 1 par créneau
+    pets = [add_owner(db, add_user, "owner%d@example.test" % n) for n in range(2)]
+    clients = [login("owner%d@example.test" % n, "pet_owner") for n in range(2)]
+    barrier = threading.Barrier(2)
+    statuses = []
+
+    def book(client, pet_id):
+        barrier.wait()
+        response = client.post("/appointments/book", data={
+            "pet_id": pet_id,
+            "appointment_date": next_monday.isoformat(),
+            "appointment_time": "10:00",
+        })
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=book, args=args) for args in zip(clients, pets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200, 302]  # 200 : formulaire réaffiché, créneau plein
+    assert len(slot_rows(db, next_monday.isoformat())) == 1
+
+
+def test_non_canonical_date_and_time_are_stored_canonical(db, add_user, login, next_monday):
+    add_user("vet@example.test", "clinic_staff")
+    pets = [add_owner(db, add_user, "owner%d@example.test" % n) for n in range(2)]
+    first, second = (login("owner%d@example.test" % n, "pet_owner") for n in range(2))
+
+    response = first.post("/appointments/book", data={
+        "pet_id": pets[0],
+        "appointment_date": next_monday.strftime("%Y%m%d"),
+        "appointment_time": "9:00",
+    })
+    assert response.status_code == 302
+    assert [tuple(row) for row in slot_rows(db, next_monday.isoformat())] == [
+        (next_monday.isoformat(), "09:00", "pending"),
+    ]
+
+    # Le même créneau écrit autrement est bien plein, index vidé ou non
+    clinic.schedule_index.invalidate()
+    response = second.post("/appointments/book", data={
+        "pet_id": pets[1],
+        "appointment_date": next_monday.isoformat(),
+        "appointment_time": "09:00:00",
+    })
+    assert response.status_code == 200
+    assert b"fully booked" in response.data
+    assert len(slot_rows(db, next_monday.isoformat())) == 1
+
+
+def test_reschedule_stores_canonical_slot(db, add_user, login, next_monday):
+    add_user("vet@example.test", "clinic_staff")
+    pet_id = add_owner(db, add_user, "owner@example.test")
+    appointment_id = db.execute(
+        """
+        INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)
+        SELECT owner_id, id, name, ?, '10:00', 'pending' FROM pets WHERE id = ?
+        """,
+        (next_monday.isoformat(), pet_id),
+    ).lastrowid
+    db.commit()
+    staff = login("vet@example.test", "clinic_staff")
+
+    response = staff.post("/staff/appointments/%d/reschedule" % appointment_id, data={
+        "appointment_date": next_monday.strftime("%Y%m%d"),
+        "appointment_time": "8:30",
+    })
+    assert response.status_code == 302
+    row = db.execute(
+        "SELECT appointment_date, appointment_time FROM appointments WHERE id = ?", (appointment_id,)
+    ).fetchone()
+    assert tuple(row) == (next_monday.isoformat(), "08:30")
+
+
+def test_reactivating_into_full_slot_is_refused(db, add_user, login, next_monday):
+    add_user("vet@example.test", "clinic_staff")
+    pet_id = add_owner(db, add_user, "owner@example.test")
+    ids = [
+        db.execute(
+            """
+            INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)
+            SELECT owner_id, id, name, ?, '10:00', ? FROM pets WHERE id = ?
+            """,
+            (next_monday.isoformat(), status, pet_id),
+        ).lastrowid
+        for status in ("confirmed", "cancelled")
+    ]
+    db.commit()
+    staff = login("vet@example.test", "clinic_staff")
+
+    response = staff.post("/staff/appointments/%d/status" % ids[1], data={"status": "confirmed"})
+    assert response.status_code == 302
+    assert "conflicts=1" in response.headers["Location"]
+    assert db.execute("SELECT status FROM appointments WHERE id = ?", (ids[1],)).fetchone()[0] == "cancelled"
+
+    # Place libérée : la réactivation passe
+    staff.post("/staff/appointments/%d/status" % ids[0], data={"status": "cancelled"})
+    response = staff.post("/staff/appointments/%d/status" % ids[1], data={"status": "confirmed"})
+    assert "conflicts" not in response.headers["Location"]
+    assert db.execute("SELECT status FROM appointments WHERE id = ?", (ids[1],)).fetchone()[0] == "confirmed"
+
+
+def test_schedule_index_survives_concurrent_invalidate(db, next_monday, monkeypatch):
+    index = clinic.ScheduleIndex()
+    load = index._load
+
+    def load_then_invalidate(start, days):
+        counts = load(start, days)
+        index.invalidate()  # un autre thread vide l'index entre le chargement et la lecture
+        return counts
+
+    monkeypatch.setattr(index, "_load", load_then_invalidate)
+    with clinic.app.app_context():
+        assert index.booked(next_monday.isoformat(), 600) == 0
+        assert len(index.free_slots(next_monday, 3, 1)) == 3
+
+
+def test_index_counts_past_255_per_slot(db, add_user, next_monday, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "SLOT_CAPACITY_PER_STAFF", 300)
+    add_user("vet@example.test", "clinic_staff")
+    owner_id = add_user("owner@example.test", "pet_owner")
+    day = next_monday.isoformat()
+    db.executemany(
+        """
+        INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, status)
+        VALUES (?, 'Rex', ?, '10:00', 'confirmed')
+        """,
+        [(owner_id, day)] * 300,
+    )
+    db.commit()
+
+    with clinic.app.app_context():
+        capacity = clinic.slot_capacity()
+        assert capacity == 300
+        assert clinic.schedule_index.booked(day, clinic.time_to_minutes("10:00")) == 300
+        free = clinic.schedule_index.free_slots(next_monday, 1, capacity)[day]
+        assert "10:00" not in free and "10:30" in free
+
+        clinic.schedule_index.apply(day, "10:00", -1)
+        assert "10:00" in clinic.schedule_index.free_slots(next_monday, 1, capacity)[day]
+
+
+def test_capacity_is_capped_at_the_index_counter_width(db, add_user, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "SLOT_CAPACITY_PER_STAFF", 10 ** 6)
+    add_user("vet@example.test", "clinic_staff")
+    with clinic.app.app_context():
+        assert clinic.slot_capacity() == clinic.SLOT_COUNT_MAX
@@ -0,0 +1,14 @@
+import app as clinic
+
+
+def test_every_hit_gets_its_snippet(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner", name="Ada Owner")
+    for name in ("Amber", "Amigo", "Amadeus"):
+        db.execute("INSERT INTO pets (owner_id, name, species) VALUES (?, ?, 'cat')", (owner_id, name))
+    db.commit()
+
+    results = clinic.search(db, "am", 10)
+
+    assert sorted(r["label"] for r in results if r["kind"] == "pet") == ["Amadeus", "Amber", "Amigo"]
+    for result in results:
+        assert "\x02" in result["snippet"], result
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+import app as clinic
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def backend(request, db, monkeypatch):
+    monkeypatch.setitem(clinic.app.config, "SESSION_BACKEND", request.param)
+    return request.param
+
+
+@pytest.fixture
+def admin(add_user, login):
+    add_user("boss@example.test", "admin")
+    return login("boss@example.test", "admin")
+
+
+def session_row(db, user_id):
+    return db.execute("SELECT id, expires_at FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+
+
+def test_role_change_applies_to_the_open_session(backend, add_user, login, admin):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    owner = login("owner@example.test", "pet_owner")
+    assert owner.get("/dashboard/pet-owner").status_code == 200
+
+    # Premier accès : le rôle est mis en cache dans le LRU
+    assert clinic.user_cache.get(owner_id, clinic.load_user_auth) == ("pet_owner", 1)
+    admin.post("/admin/users/%d/role" % owner_id, data={"role": "admin"})
+
+    assert owner.get("/dashboard/pet-owner").status_code == 403
+    assert owner.get("/dashboard").status_code == 200
+    with owner.session_transaction() as sess:
+        assert sess["user_role"] == "admin"
+
+
+def test_rejected_staff_is_logged_out_everywhere(backend, db, add_user, login, admin):
+    staff_id = add_user("vet@example.test", "clinic_staff")
+    staff = login("vet@example.test", "clinic_staff")
+    assert staff.get("/dashboard/staff").status_code == 200
+
+    admin.post("/admin/staff/%d/reject" % staff_id)
+
+    response = staff.get("/dashboard/staff")
+    assert response.status_code == 302 and "/login" in response.headers["Location"]
+    if backend == "sqlite":
+        assert session_row(db, staff_id) is None
+
+
+def test_change_from_another_process_applies_after_the_lru_entry_expires(backend, db, add_user, login):
+    staff_id = add_user("vet@example.test", "clinic_staff")
+    staff = login("vet@example.test", "clinic_staff")
+    assert staff.get("/dashboard/staff").status_code == 200
+
+    db.execute("UPDATE users SET is_approved = 0 WHERE id = ?", (staff_id,))
+    db.commit()
+    assert staff.get("/dashboard/staff").status_code == 200  # encore dans le LRU
+
+    clinic.user_cache.invalidate(staff_id)  # AUTH_CACHE_TTL écoulé
+    response = staff.get("/dashboard/staff")
+    assert response.status_code == 302 and "/login" in response.headers["Location"]
+
+
+def test_static_files_do_not_read_the_session_store(backend, add_user, login, monkeypatch):
+    add_user("owner@example.test", "pet_owner")
+    owner = login("owner@example.test", "pet_owner")
+    loads = []
+    store = clinic.get_session_store()
+    original = store.load
+    monkeypatch.setattr(store, "load", lambda sid: loads.append(sid) or original(sid))
+
+    response = owner.get("/static/css/style.css")
+    assert response.status_code == 200
+    assert "Cookie" not in response.vary
+    assert "Set-Cookie" not in response.headers
+    assert loads == []
+
+    assert owner.get("/dashboard/pet-owner").status_code == 200
+    assert len(loads) == 1
+
+
+def test_reading_a_session_pushes_its_expiry_back(db, add_user, login):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    owner = login("owner@example.test", "pet_owner")
+    lifetime = clinic.app.permanent_session_lifetime.total_seconds()
+    sid, expires_at = session_row(db, owner_id)
+    assert expires_at == pytest.approx(time.time() + lifetime, abs=5)
+
+    # Session fraîche : simple lecture, aucune écriture
+    response = owner.get("/dashboard/pet-owner")
+    assert "Set-Cookie" not in response.headers
+    assert session_row(db, owner_id)["expires_at"] == expires_at
+
+    # Lue pour la dernière fois il y a une heure : l'expiration est repoussée
+    db.execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (time.time() + lifetime - 3600, sid))
+    db.commit()
+    response = owner.get("/dashboard/pet-owner")
+    assert sid in response.headers["Set-Cookie"]
+    assert session_row(db, owner_id)["expires_at"] == pytest.approx(time.time() + lifetime, abs=5)
+
+    # Expirée côté serveur : retour au formulaire de connexion
+    db.execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (time.time() - 1, sid))
+    db.commit()
+    assert owner.get("/dashboard/pet-owner").status_code == 302
@@ -0,0 +1,75 @@
+import json
+
+import app as clinic
+
+
+def test_normalize_sql_groups_literals_and_in_lists():
+    first = clinic.normalize_sql("SELECT * FROM pets WHERE id IN (?, ?, ?) AND name = 'Rex'\n  LIMIT 10")
+    second = clinic.normalize_sql("SELECT * FROM pets WHERE id IN (?,?) AND name = 'Max' LIMIT 20")
+    assert first == second == "SELECT * FROM pets WHERE id IN (?, ...) AND name = ? LIMIT ?"
+
+
+def test_params_shape_keeps_types_not_values():
+    assert clinic.params_shape(("owner@example.test", 3, None)) == "(str, int, NoneType)"
+    assert clinic.params_shape({"email": "owner@example.test"}) == "{email: str}"
+    assert clinic.params_shape(None) == "executemany"
+
+
+def test_explain_query_plan_only_for_explainable_statements(db):
+    plan = clinic.explain_query_plan(db, "SELECT * FROM pets WHERE owner_id = ?", (1,))
+    assert "pets" in plan
+    assert clinic.explain_query_plan(db, "PRAGMA user_version", ()) is None
+    assert clinic.explain_query_plan(db, "SELECT * FROM no_such_table", ()) is None
+
+
+def test_slow_statements_reach_the_table_without_values(db, add_user, login, monkeypatch):
+    add_user("admin@example.test", "admin")
+    owner_id = add_user("owner@example.test", "pet_owner")
+    client = login("owner@example.test", "pet_owner")
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_LOG", "table")
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_MS", 0.0)
+
+    assert client.get("/owner/pets").status_code == 200
+    clinic.get_slow_query_log().flush()
+    rows = db.execute("SELECT * FROM slow_queries WHERE endpoint = 'my_pets'").fetchall()
+    assert rows
+    assert all(row["query_plan"] for row in rows if row["sql_text"].startswith("SELECT"))
+    assert not any(str(owner_id) in (row["params_shape"] or "") for row in rows)
+    # Les écritures du journal lui-même ne sont pas journalisées
+    assert not db.execute("SELECT 1 FROM slow_queries WHERE sql_text LIKE 'INSERT INTO slow_queries%'").fetchall()
+
+    page = login("admin@example.test", "admin").get("/admin/slow-queries")
+    assert page.status_code == 200
+    assert b"my_pets" in page.data
+
+
+def test_nothing_is_logged_below_the_threshold_or_when_off(db, add_user, login, monkeypatch):
+    add_user("owner@example.test", "pet_owner")
+    client = login("owner@example.test", "pet_owner")
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_LOG", "table")
+
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_MS", None)
+    client.get("/owner/pets")
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_MS", 60000.0)
+    client.get("/owner/pets")
+    clinic.get_slow_query_log().flush()
+    assert db.execute("SELECT COUNT(*) FROM slow_queries").fetchone()[0] == 0
+
+
+def test_file_target_writes_json_lines(db, add_user, login, monkeypatch, tmp_path):
+    add_user("owner@example.test", "pet_owner")
+    client = login("owner@example.test", "pet_owner")
+    path = tmp_path / "slow.jsonl"
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_LOG", str(path))
+    monkeypatch.setitem(clinic.app.config, "SLOW_QUERY_MS", 0.0)
+
+    assert client.get("/owner/invoices").status_code == 200
+    clinic.get_slow_query_log().flush()
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    # La session est ouverte avant le routage : ses requêtes n'ont pas d'endpoint
+    assert {entry["endpoint"] for entry in entries} == {"owner_invoices", None}
+    assert any("FROM invoices" in entry["normalized_sql"] for entry in entries if entry["endpoint"])
+    assert {"duration_ms", "normalized_sql", "params_shape", "query_plan"} <= set(entries[0])
+    with clinic.app.test_request_context():
+        report = clinic.slow_query_report()
+    assert sum(group["calls"] for group in report) == len(entries)
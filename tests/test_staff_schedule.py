@@ -0,0 +1,92 @@
+import datetime as dt
+import json
+
+import pytest
+
+import app as clinic
+
+
+@pytest.fixture
+def staff(add_user, login):
+    add_user("staff@example.test", "clinic_staff")
+    return login("staff@example.test", "clinic_staff")
+
+
+def add_appointment(db, owner_id, day, time, pet_name="Rex"):
+    db.execute(
+        "INSERT INTO appointments (owner_id, pet_name, appointment_date, appointment_time, status)"
+        " VALUES (?, ?, ?, ?, 'pending')",
+        (owner_id, pet_name, day, time),
+    )
+    db.commit()
+
+
+def test_range_scan_yields_every_day_in_order(db, add_user):
+    owner_id = add_user("owner@example.test", "pet_owner", "Alice Owner")
+    add_appointment(db, owner_id, "2026-03-03", "14:00", "Max")
+    add_appointment(db, owner_id, "2026-03-03", "09:00", "Rex")
+    add_appointment(db, owner_id, "2026-03-05", "10:00", "Bella")
+    add_appointment(db, owner_id, "2026-03-09", "10:00", "Outside")
+
+    days = list(clinic.load_staff_days(db, "2026-03-02", "2026-03-06"))
+    assert [day for day, _ in days] == ["2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05", "2026-03-06"]
+    assert [[appt["pet_name"] for appt in appts] for _, appts in days] == [[], ["Rex", "Max"], [], ["Bella"], []]
+    assert days[1][1][0]["owner_name"] == "Alice Owner"
+
+
+def test_api_returns_the_range_as_json(db, add_user, staff):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    add_appointment(db, owner_id, "2026-03-03", "09:00")
+
+    response = staff.get("/api/staff/schedule?from=2026-03-02&to=2026-03-04")
+    assert response.status_code == 200
+    data = json.loads(response.get_data())
+    assert (data["from"], data["to"]) == ("2026-03-02", "2026-03-04")
+    assert [day["date"] for day in data["days"]] == ["2026-03-02", "2026-03-03", "2026-03-04"]
+    (appt,) = data["days"][1]["appointments"]
+    assert set(appt) == set(clinic.SCHEDULE_API_FIELDS)
+    assert appt["pet_name"] == "Rex" and appt["appointment_time"] == "09:00"
+
+
+def test_default_window_and_limits(db, staff):
+    data = json.loads(staff.get("/api/staff/schedule?from=2026-03-02").get_data())
+    assert len(data["days"]) == clinic.app.config["SCHEDULE_DAYS"]
+
+    max_days = clinic.app.config["SCHEDULE_MAX_DAYS"]
+    last = (dt.date(2026, 3, 2) + dt.timedelta(days=max_days)).isoformat()
+    assert staff.get("/api/staff/schedule?from=2026-03-02&to=%s" % last).status_code == 400
+    assert staff.get("/api/staff/schedule?from=2026-03-05&to=2026-03-02").status_code == 400
+    assert staff.get("/api/staff/schedule?from=03/02/2026").status_code == 400
+    assert staff.get("/staff/schedule?from=2026-03-05&to=2026-03-02").status_code == 400
+
+
+@pytest.mark.parametrize("query", [
+    "from=9999-12-31", "from=9999-12-25&to=9999-12-31", "from=0001-01-01&to=0001-01-03",
+])
+def test_ranges_at_the_calendar_edges(db, staff, query):
+    data = json.loads(staff.get("/api/staff/schedule?" + query).get_data())
+    assert data["days"][-1]["date"] == data["to"]
+    page = staff.get("/staff/schedule?" + query)
+    assert page.status_code == 200
+    body = page.get_data(as_text=True)
+    assert ("Previous" in body) == (not query.startswith("from=0001"))
+    assert ("Next" in body) == (not query.startswith("from=9999"))
+
+
+def test_page_follows_writes_to_a_cached_day(db, add_user, staff):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    add_appointment(db, owner_id, "2026-03-03", "09:00", "Rex")
+    assert "Rex" in staff.get("/staff/schedule?from=2026-03-02").get_data(as_text=True)
+
+    # Écriture d'un autre process : la version staff_day du jour change
+    add_appointment(db, owner_id, "2026-03-03", "11:00", "Bella")
+    page = staff.get("/staff/schedule?from=2026-03-02").get_data(as_text=True)
+    assert "Rex" in page and "Bella" in page
+
+
+def test_schedule_is_staff_only(db, add_user, login):
+    add_user("owner@example.test", "pet_owner")
+    owner = login("owner@example.test", "pet_owner")
+    assert owner.get("/staff/schedule").status_code == 403
+    assert owner.get("/api/staff/schedule").status_code == 403
+    assert clinic.app.test_client().get("/api/staff/schedule").status_code == 401
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+import app as clinic
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    """Clinic (and SQLite 'localtime') in UTC-5 for the test."""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def pet_history(db, add_user, new_york):
+    owner_id = add_user("owner@example.test", "pet_owner")
+    staff_id = add_user("vet@example.test", "clinic_staff")
+    pet_id = db.execute(
+        "INSERT INTO pets (owner_id, name, species) VALUES (?, 'Rex', 'dog')", (owner_id,)
+    ).lastrowid
+    # 2 mars, heure de New York (UTC-5) :
+    #   09:00 facture (14:00 UTC), 10:00 rendez-vous, 11:00 dossier (16:00 UTC),
+    #   11:30 ordonnance (16:30 UTC), 12:00 second rendez-vous
+    appointment_id = db.execute(
+        """
+        INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)
+        VALUES (?, ?, 'Rex', '2026-03-02', '10:00', 'confirmed')
+        """,
+        (owner_id, pet_id),
+    ).lastrowid
+    db.execute(
+        """
+        INSERT INTO appointments (owner_id, pet_id, pet_name, appointment_date, appointment_time, status)
+        VALUES (?, ?, 'Rex', '2026-03-02', '12:00', 'pending')
+        """,
+        (owner_id, pet_id),
+    )
+    db.execute(
+        "INSERT INTO invoices (owner_id, appointment_id, total_amount, status, issued_at) VALUES (?, ?, 40, 'paid', '2026-03-02 14:00:00')",
+        (owner_id, appointment_id),
+    )
+    db.execute(
+        "INSERT INTO medical_records (pet_id, staff_id, diagnosis, created_at) VALUES (?, ?, 'Otitis', '2026-03-02 16:00:00')",
+        (pet_id, staff_id),
+    )
+    db.execute(
+        "INSERT INTO prescriptions (pet_id, staff_id, drug_name, dosage, created_at) VALUES (?, ?, 'Drops', '2/day', '2026-03-02 16:30:00')",
+        (pet_id, staff_id),
+    )
+    db.commit()
+    return pet_id
+
+
+EXPECTED = [
+    ("appointment", "2026-03-02 12:00:00"),
+    ("prescription", "2026-03-02 11:30:00"),
+    ("record", "2026-03-02 11:00:00"),
+    ("appointment", "2026-03-02 10:00:00"),
+    ("invoice", "2026-03-02 09:00:00"),
+]
+
+
+def test_kinds_merge_in_clinic_local_time(db, pet_history):
+    page = clinic.timeline_page(db, pet_history, 10)
+    assert [(row["kind"], row["at"]) for row in page["rows"]] == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 2])
+def test_cursor_walk_keeps_the_merged_order(db, pet_history, size):
+    seen, page = [], clinic.timeline_page(db, pet_history, size)
+    while True:
+        seen += [(row["kind"], row["at"]) for row in page["rows"]]
+        if page["next"] is None:
+            break
+        page = clinic.timeline_page(db, pet_history, size, after=clinic.decode_cursor(page["next"]))
+    assert seen == EXPECTED
+
+    back, last = [], len(page["rows"])
+    while page["prev"] is not None:
+        page = clinic.timeline_page(db, pet_history, size, before=clinic.decode_cursor(page["prev"]))
+        back = [(row["kind"], row["at"]) for row in page["rows"]] + back
+    assert back == EXPECTED[:-last]
+
+
+def test_api_returns_the_same_order(db, pet_history, login):
+    owner = login("owner@example.test", "pet_owner")
+    events = owner.get("/api/pets/%d/timeline" % pet_history).get_json()["events"]
+    assert [(event["kind"], event["at"]) for event in events] == EXPECTED